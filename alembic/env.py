@@ -14,8 +14,9 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 # access to the values within the .ini file in use.
 config = context.config
 
-# Interpret the config file for Python logging.
-if config.config_file_name is not None:
+# Interpret the config file for Python logging (not when run from inside
+# the app, whose logging is already set up).
+if config.config_file_name is not None and 'connection' not in config.attributes:
     fileConfig(config.config_file_name)
 
 # Import the metadata from the models
@@ -50,6 +51,14 @@ def run_migrations_offline():
 
 def run_migrations_online():
     """Run migrations in 'online' mode."""
+    # backend.app.schema passes the app's own connection
+    connection = config.attributes.get('connection')
+    if connection is not None:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     configuration = config.get_section(config.config_ini_section)
     configuration['sqlalchemy.url'] = get_url()
     connectable = engine_from_config(
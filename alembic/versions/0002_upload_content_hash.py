@@ -0,0 +1,25 @@
+"""upload content hash
+
+Revision ID: 0002_upload_content_hash
+Revises: 0001_initial
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0002_upload_content_hash'
+down_revision = '0001_initial'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('uploads', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.add_column('uploads', sa.Column('size_bytes', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('uploads') as batch_op:
+        batch_op.drop_column('size_bytes')
+        batch_op.drop_column('content_hash')
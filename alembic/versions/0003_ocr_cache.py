@@ -0,0 +1,36 @@
+"""ocr cache
+
+Revision ID: 0003_ocr_cache
+Revises: 0002_upload_content_hash
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0003_ocr_cache'
+down_revision = '0002_upload_content_hash'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'ocr_cache',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('model', sa.String(length=100), nullable=False),
+        sa.Column('raw_json', sa.Text(), nullable=True),
+        sa.Column('words', sa.Text(), nullable=True),
+        sa.Column('count', sa.Integer(), nullable=True),
+        sa.Column('hits', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('last_hit_at', sa.DateTime(), nullable=True),
+        sa.UniqueConstraint('content_hash', 'model', name='uq_ocr_cache_hash_model')
+    )
+    op.create_index('ix_ocr_cache_last_hit_at', 'ocr_cache', ['last_hit_at'])
+
+
+def downgrade():
+    op.drop_index('ix_ocr_cache_last_hit_at', table_name='ocr_cache')
+    op.drop_table('ocr_cache')
@@ -0,0 +1,37 @@
+"""ocr jobs
+
+Revision ID: 0004_ocr_jobs
+Revises: 0003_ocr_cache
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004_ocr_jobs'
+down_revision = '0003_ocr_cache'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'ocr_jobs',
+        sa.Column('id', sa.String(), primary_key=True),
+        sa.Column('upload_id', sa.String(), sa.ForeignKey('uploads.id', ondelete='CASCADE')),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer(), nullable=True, server_default='0'),
+        sa.Column('worker_id', sa.String(length=100), nullable=True),
+        sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_ocr_jobs_upload_id', 'ocr_jobs', ['upload_id'])
+    op.create_index('ix_ocr_jobs_status_created_at', 'ocr_jobs', ['status', 'created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_ocr_jobs_status_created_at', table_name='ocr_jobs')
+    op.drop_index('ix_ocr_jobs_upload_id', table_name='ocr_jobs')
+    op.drop_table('ocr_jobs')
@@ -0,0 +1,25 @@
+"""upload page progress
+
+Revision ID: 0005_upload_pages
+Revises: 0004_ocr_jobs
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0005_upload_pages'
+down_revision = '0004_ocr_jobs'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('uploads', sa.Column('pages_total', sa.Integer(), nullable=True))
+    op.add_column('uploads', sa.Column('pages_done', sa.Integer(), nullable=True, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('uploads') as batch_op:
+        batch_op.drop_column('pages_done')
+        batch_op.drop_column('pages_total')
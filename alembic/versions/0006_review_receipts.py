@@ -0,0 +1,32 @@
+"""review receipts for idempotent batch progress
+
+Revision ID: 0006_review_receipts
+Revises: 0005_upload_pages
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0006_review_receipts'
+down_revision = '0005_upload_pages'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'review_receipts',
+        sa.Column('user_id', sa.String(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('review_id', sa.String(length=64), primary_key=True),
+        sa.Column('word_id', sa.String(), sa.ForeignKey('words.id', ondelete='CASCADE')),
+        sa.Column('next_review_at', sa.DateTime(), nullable=True),
+        sa.Column('interval_hours', sa.Float(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_review_receipts_created_at', 'review_receipts', ['created_at'])
+
+
+def downgrade():
+    op.drop_index('ix_review_receipts_created_at', table_name='review_receipts')
+    op.drop_table('review_receipts')
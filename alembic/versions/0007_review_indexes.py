@@ -0,0 +1,49 @@
+"""indexes for the review hot path
+
+Revision ID: 0007_review_indexes
+Revises: 0006_review_receipts
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0007_review_indexes'
+down_revision = '0006_review_receipts'
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ('ix_user_words_user_next_review', 'user_words', ['user_id', 'next_review_at'], False),
+    ('uq_user_words_user_word', 'user_words', ['user_id', 'word_id'], True),
+    ('ix_uploads_status', 'uploads', ['status'], False),
+    ('ix_ocr_results_upload_id', 'ocr_results', ['upload_id'], False),
+]
+
+
+def upgrade():
+    # Concurrent first reviews may already have created duplicate
+    # (user_id, word_id) rows; keep the most-reviewed one of each.
+    op.execute(sa.text('''
+        DELETE FROM user_words
+        WHERE EXISTS (
+            SELECT 1 FROM user_words k
+            WHERE k.user_id = user_words.user_id
+              AND k.word_id = user_words.word_id
+              AND (COALESCE(k.review_count, 0) > COALESCE(user_words.review_count, 0)
+                   OR (COALESCE(k.review_count, 0) = COALESCE(user_words.review_count, 0) AND k.id > user_words.id))
+        )
+    '''))
+    if op.get_bind().dialect.name == 'postgresql':
+        # build without blocking writes to live tables
+        with op.get_context().autocommit_block():
+            for name, table, cols, unique in INDEXES:
+                op.create_index(name, table, cols, unique=unique, postgresql_concurrently=True)
+    else:
+        for name, table, cols, unique in INDEXES:
+            op.create_index(name, table, cols, unique=unique)
+
+
+def downgrade():
+    for name, table, _, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,23 @@
+"""user_words.last_performance
+
+Revision ID: 0008_last_performance
+Revises: 0007_review_indexes
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0008_last_performance'
+down_revision = '0007_review_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user_words', sa.Column('last_performance', sa.Float(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('user_words') as batch_op:
+        batch_op.drop_column('last_performance')
@@ -0,0 +1,81 @@
+"""append-only review_events log and user_words history summary
+
+Revision ID: 0009_review_events
+Revises: 0008_last_performance
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0009_review_events'
+down_revision = '0008_last_performance'
+branch_labels = None
+depends_on = None
+
+
+def _month(year, month):
+    return datetime(year + (month - 1) // 12, (month - 1) % 12 + 1, 1)
+
+
+def upgrade():
+    with op.batch_alter_table('user_words') as batch_op:
+        batch_op.add_column(sa.Column('history_reviews', sa.Integer(), nullable=True, server_default='0'))
+        batch_op.add_column(sa.Column('history_lapses', sa.Integer(), nullable=True, server_default='0'))
+        batch_op.add_column(sa.Column('history_performance_sum', sa.Float(), nullable=True, server_default='0'))
+        batch_op.add_column(sa.Column('history_compacted_until', sa.DateTime(), nullable=True))
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # range-partitioned by month; the partition key must be in the PK
+        op.execute('''
+            CREATE TABLE review_events (
+                id VARCHAR NOT NULL,
+                reviewed_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+                user_id VARCHAR NOT NULL,
+                word_id VARCHAR NOT NULL,
+                performance DOUBLE PRECISION,
+                interval_before DOUBLE PRECISION,
+                interval_after DOUBLE PRECISION,
+                review_count INTEGER,
+                PRIMARY KEY (id, reviewed_at)
+            ) PARTITION BY RANGE (reviewed_at)
+        ''')
+        op.execute('CREATE TABLE review_events_default PARTITION OF review_events DEFAULT')
+        # this month and the next three; `python -m backend.app.review_log
+        # partitions` keeps creating them ahead
+        now = datetime.utcnow()
+        for i in range(4):
+            start = _month(now.year, now.month + i)
+            end = _month(now.year, now.month + i + 1)
+            op.execute(
+                f"CREATE TABLE review_events_y{start:%Y}m{start:%m} PARTITION OF review_events "
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{end:%Y-%m-%d}')"
+            )
+    else:
+        op.create_table(
+            'review_events',
+            sa.Column('id', sa.String(), primary_key=True),
+            sa.Column('reviewed_at', sa.DateTime(), primary_key=True),
+            sa.Column('user_id', sa.String(), nullable=False),
+            sa.Column('word_id', sa.String(), nullable=False),
+            sa.Column('performance', sa.Float(), nullable=True),
+            sa.Column('interval_before', sa.Float(), nullable=True),
+            sa.Column('interval_after', sa.Float(), nullable=True),
+            sa.Column('review_count', sa.Integer(), nullable=True),
+        )
+    op.create_index('ix_review_events_user_word_reviewed_at', 'review_events', ['user_id', 'word_id', 'reviewed_at'])
+    op.create_index('ix_review_events_reviewed_at', 'review_events', ['reviewed_at'])
+
+
+def downgrade():
+    op.drop_index('ix_review_events_reviewed_at', table_name='review_events')
+    op.drop_index('ix_review_events_user_word_reviewed_at', table_name='review_events')
+    # partitions go with the parent table
+    op.execute('DROP TABLE review_events CASCADE' if op.get_bind().dialect.name == 'postgresql' else 'DROP TABLE review_events')
+    with op.batch_alter_table('user_words') as batch_op:
+        batch_op.drop_column('history_compacted_until')
+        batch_op.drop_column('history_performance_sum')
+        batch_op.drop_column('history_lapses')
+        batch_op.drop_column('history_reviews')
@@ -0,0 +1,31 @@
+"""extend the due-queue index with id for keyset paging
+
+Revision ID: 0010_plan_keyset_index
+Revises: 0009_review_events
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0010_plan_keyset_index'
+down_revision = '0009_review_events'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # cards added by one upload share next_review_at; with id in the index a
+    # page seek stays an index range scan however many of them tie
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index('ix_user_words_user_next_review_id', 'user_words', ['user_id', 'next_review_at', 'id'],
+                            postgresql_concurrently=True)
+            op.drop_index('ix_user_words_user_next_review', table_name='user_words', postgresql_concurrently=True)
+    else:
+        op.create_index('ix_user_words_user_next_review_id', 'user_words', ['user_id', 'next_review_at', 'id'])
+        op.drop_index('ix_user_words_user_next_review', table_name='user_words')
+
+
+def downgrade():
+    op.create_index('ix_user_words_user_next_review', 'user_words', ['user_id', 'next_review_at'])
+    op.drop_index('ix_user_words_user_next_review_id', table_name='user_words')
@@ -0,0 +1,32 @@
+"""precomputed daily study sessions
+
+Revision ID: 0011_study_sessions
+Revises: 0010_plan_keyset_index
+Create Date: 2026-10-17 00:00:00.000000
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0011_study_sessions'
+down_revision = '0010_plan_keyset_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'study_sessions',
+        sa.Column('user_id', sa.String(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('version', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('built_version', sa.Integer(), nullable=True),
+        sa.Column('session_date', sa.Date(), nullable=True),
+        sa.Column('built_at', sa.DateTime(), nullable=True),
+        sa.Column('card_count', sa.Integer(), nullable=True),
+        sa.Column('complete', sa.Boolean(), nullable=True),
+        sa.Column('items', sa.Text(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table('study_sessions')
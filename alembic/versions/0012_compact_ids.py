@@ -0,0 +1,62 @@
+"""store user_words and review_events ids as native / 16-byte uuids
+
+Revision ID: 0012_compact_ids
+Revises: 0011_study_sessions
+Create Date: 2026-10-17 00:00:00.000000
+"""
+import uuid
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0012_compact_ids'
+down_revision = '0011_study_sessions'
+branch_labels = None
+depends_on = None
+
+TABLES = ('user_words', 'review_events')
+CHUNK = 10000
+
+
+def _convert_sqlite(table, from_type, to_value):
+    # SQLite columns are untyped; rewrite the stored values in chunks. Text
+    # sorts before blobs, so the rows still to convert are always at one end
+    # of the primary key.
+    conn = op.get_bind()
+    t = sa.table(table, sa.column('id'))
+    stmt = t.update().where(t.c.id == sa.bindparam('_old')).values(id=sa.bindparam('_new'))
+    order = 'ASC' if from_type == 'text' else 'DESC'
+    while True:
+        ids = conn.execute(sa.text(
+            f'SELECT id FROM {table} WHERE typeof(id) = :t ORDER BY id {order} LIMIT {CHUNK}'
+        ), {'t': from_type}).scalars().all()
+        if not ids:
+            break
+        conn.execute(stmt, [{'_old': i, '_new': to_value(i)} for i in ids])
+
+
+def _to_bytes(value):
+    return uuid.UUID(value).bytes
+
+
+def _to_text(value):
+    return str(uuid.UUID(bytes=value))
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in TABLES:
+            op.execute(f'ALTER TABLE {table} ALTER COLUMN id TYPE uuid USING id::uuid')
+    else:
+        for table in TABLES:
+            _convert_sqlite(table, 'text', _to_bytes)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for table in TABLES:
+            op.execute(f'ALTER TABLE {table} ALTER COLUMN id TYPE varchar USING id::text')
+    else:
+        for table in TABLES:
+            _convert_sqlite(table, 'blob', _to_text)
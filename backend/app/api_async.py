@@ -0,0 +1,64 @@
+"""Async versions of the hot API endpoints, mounted ahead of the sync
+ones when DB_ASYNC=1 (see ``backend.app.db_async``)."""
+from typing import Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .auth import Principal, get_current_user_async, get_current_user_optional_async
+from .db_async import get_async_db
+from .learning import MemoryService
+from .schemas import BatchProgressIn, BatchProgressOut, ProgressIn, ProgressOut, UploadOut
+from .storage import BlobStore
+from . import jobs
+
+
+def build_router(blob_store: BlobStore, queue_mode: str, plan_page_max: int, batch_max: int) -> APIRouter:
+    router = APIRouter()
+
+    @router.post('/api/v1/upload', response_model=UploadOut)
+    async def upload_file(file: UploadFile = File(...), background_tasks: BackgroundTasks = BackgroundTasks(), current_user: Optional[Principal] = Depends(get_current_user_optional_async), db: AsyncSession = Depends(get_async_db)):
+        digest, storage_path, size = await blob_store.save_upload(file)
+        user_id = current_user.id if current_user else None
+        upload, job = await db.run_sync(
+            lambda s: jobs.create_upload(s, user_id, file.filename, storage_path, digest, size))
+        if queue_mode == 'inline':
+            background_tasks.add_task(jobs.run_inline, job.id)
+        return {'upload_id': upload.id, 'words': [], 'count': 0}
+
+    @router.get('/api/v1/upload/{upload_id}')
+    async def get_upload(upload_id: str, db: AsyncSession = Depends(get_async_db)):
+        snapshot = await db.run_sync(lambda s: jobs.upload_snapshot(s, upload_id))
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail='Upload not found')
+        return snapshot
+
+    @router.get('/api/v1/learning/plan')
+    async def get_learning_plan(cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=plan_page_max), current_user: Principal = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+        try:
+            plans, next_cursor = await MemoryService().plan_page_async(db, current_user.id, limit, cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail='invalid cursor')
+        return {'plans': plans, 'next_cursor': next_cursor}
+
+    @router.post('/api/v1/learning/progress', response_model=ProgressOut)
+    async def post_learning_progress(payload: ProgressIn, current_user: Principal = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+        if not payload.word_id:
+            raise HTTPException(status_code=400, detail='word_id required')
+        res = await MemoryService().update_progress_async(db, current_user.id, payload.word_id, payload.performance)
+        return {'next_review': res['next_review'], 'interval_hours': res['interval_hours']}
+
+    @router.post('/api/v1/learning/progress/batch', response_model=BatchProgressOut)
+    async def post_learning_progress_batch(payload: BatchProgressIn, current_user: Principal = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+        if len(payload.reviews) > batch_max:
+            raise HTTPException(status_code=400, detail=f'at most {batch_max} reviews per batch')
+        if any(not r.word_id for r in payload.reviews):
+            raise HTTPException(status_code=400, detail='word_id required')
+        reviews = [
+            {'review_id': r.review_id, 'word_id': r.word_id, 'performance': r.performance, 'reviewed_at': r.reviewed_at}
+            for r in payload.reviews
+        ]
+        results = await MemoryService().apply_reviews_async(db, current_user.id, reviews)
+        return {'results': results}
+
+    return router
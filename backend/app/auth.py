@@ -1,18 +1,36 @@
 import os
+import threading
+import time
+from typing import Dict
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from jose import jwt
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
 
+from .cache import TTLCache
 from .db import get_db
+from .db_async import get_async_db
 from . import models
 
 pwd_context = CryptContext(schemes=['pbkdf2_sha256'], deprecated='auto')
 SECRET_KEY = os.getenv('JWT_SECRET', 'dev-secret')
 ALGORITHM = 'HS256'
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7 days
+# Put the principal's fields in new tokens and trust them without a DB
+# lookup; a deleted user's tokens then stay usable until they expire.
+AUTH_CLAIMS_MODE = os.getenv('AUTH_CLAIMS_MODE', '0').lower() in ('1', 'true', 'yes')
+try:
+    AUTH_CACHE_TTL_SECONDS = float(os.getenv('AUTH_CACHE_TTL_SECONDS', '60'))
+except Exception:
+    AUTH_CACHE_TTL_SECONDS = 60.0
+try:
+    AUTH_CACHE_MAX = int(os.getenv('AUTH_CACHE_MAX', '10000'))
+except Exception:
+    AUTH_CACHE_MAX = 10000
 
 
 def hash_password(password: str) -> str:
@@ -23,6 +41,13 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
+def token_claims(user: models.User) -> dict:
+    claims = {'sub': user.id}
+    if AUTH_CLAIMS_MODE:
+        claims.update({'email': user.email, 'name': user.name})
+    return claims
+
+
 def create_access_token(data: dict, expires_delta: int = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=(expires_delta or ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -36,9 +61,78 @@ def decode_token(token: str) -> dict:
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/api/v1/users/login')
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl='/api/v1/users/login', auto_error=False)
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+class Principal:
+    """The authenticated user as endpoints see it: a plain object that can
+    be cached and shared across requests, unlike a session-bound row."""
+    __slots__ = ('id', 'email', 'name')
+
+    def __init__(self, id: str, email: str = None, name: str = None):
+        self.id = id
+        self.email = email
+        self.name = name
+
+
+# principals by (user_id, token), so a lookup is skipped on repeat requests
+_principals = TTLCache(maxsize=AUTH_CACHE_MAX, ttl=AUTH_CACHE_TTL_SECONDS)
+_lookup_lock = threading.Lock()
+_lookups = {'count': 0, 'seconds': 0.0, 'claims': 0}
+
+
+def _count_lookup(name: str, seconds: float = 0.0):
+    with _lookup_lock:
+        _lookups[name] += 1
+        _lookups['seconds'] += seconds
+
+
+def invalidate_user(user_id: str) -> int:
+    return _principals.pop_matching(lambda key: key[0] == user_id)
+
+
+# ORM changes in this process only; other processes wait out the TTL.
+# Users are evicted once the change commits: evicting at flush would let a
+# concurrent request cache the old row again before the commit.
+
+@event.listens_for(models.User, 'after_update')
+@event.listens_for(models.User, 'after_delete')
+def _mark_changed_principal(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('auth_changed_users', set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _drop_changed_principals(session):
+    for user_id in session.info.pop('auth_changed_users', ()):
+        invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_changed_principals(session):
+    session.info.pop('auth_changed_users', None)
+
+
+def auth_cache_stats() -> Dict:
+    stats = _principals.stats()
+    with _lookup_lock:
+        count, seconds, claims = _lookups['count'], _lookups['seconds'], _lookups['claims']
+    avg_ms = (seconds / count * 1000.0) if count else 0.0
+    stats.update({
+        'claims_mode': AUTH_CLAIMS_MODE,
+        'claims_principals': claims,
+        'db_lookups': count,
+        'avg_lookup_ms': avg_ms,
+        # each hit skipped one lookup of about the average cost
+        'saved_ms_estimate': stats['hits'] * avg_ms,
+    })
+    return stats
+
+
+def _principal_from_token(token: str):
+    """(user_id, principal) when the token alone or the cache answers,
+    else (user_id, None) and the caller looks the user up."""
     try:
         payload = decode_token(token)
         user_id: str = payload.get('sub')
@@ -46,7 +140,57 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid authentication')
     except Exception:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid authentication')
-    user = db.query(models.User).filter(models.User.id == user_id).first()
+    if AUTH_CLAIMS_MODE and 'email' in payload:
+        _count_lookup('claims')
+        return user_id, Principal(user_id, payload['email'], payload.get('name'))
+    return user_id, (_principals.get((user_id, token)) if AUTH_CACHE_TTL_SECONDS > 0 else None)
+
+
+def _remember(user_id: str, token: str, user, seconds: float) -> Principal:
+    _count_lookup('count', seconds)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='User not found')
-    return user
+    principal = Principal(user.id, user.email, user.name)
+    if AUTH_CACHE_TTL_SECONDS > 0:
+        _principals.set((user_id, token), principal)
+    return principal
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user_id, principal = _principal_from_token(token)
+    if principal is None:
+        started = time.perf_counter()
+        user = db.query(models.User).filter(models.User.id == user_id).first()
+        principal = _remember(user_id, token, user, time.perf_counter() - started)
+    return principal
+
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    user_id, principal = _principal_from_token(token)
+    if principal is None:
+        started = time.perf_counter()
+        user = (await db.execute(select(models.User).where(models.User.id == user_id))).scalars().first()
+        principal = _remember(user_id, token, user, time.perf_counter() - started)
+    return principal
+
+
+async def get_current_user_optional_async(token: str = Depends(optional_oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    if not token:
+        return None
+    return await get_current_user_async(token, db)
+
+
+def get_current_user_optional(token: str = Depends(optional_oauth2_scheme), db: Session = Depends(get_db)):
+    # Anonymous requests are allowed; a bad token is still rejected.
+    if not token:
+        return None
+    return get_current_user(token, db)
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    # Operational endpoints are guarded by a shared token; they are
+    # disabled entirely when ADMIN_TOKEN is not configured.
+    admin_token = os.getenv('ADMIN_TOKEN', '')
+    if not admin_token or x_admin_token != admin_token:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail='Admin access required')
+    return True
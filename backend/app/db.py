@@ -1,20 +1,148 @@
 import os
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Dict, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./dev.db')
 
-engine = create_engine(DATABASE_URL, future=True)
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a
+    connection, to tell a saturated pool from a slow database."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.waited = 0
+        self.timeouts = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+                # anything slower than opening a connection from the queue
+                self.waited += waited >= 0.001
+
+    def metrics(self) -> Dict:
+        capacity = self.size() + max(self._max_overflow, 0)
+        with self._stats_lock:
+            return {
+                'size': self.size(),
+                'max_overflow': self._max_overflow,
+                'checked_out': self.checkedout(),
+                'saturation': (self.checkedout() / capacity) if capacity else 0.0,
+                'checkouts': self.checkouts,
+                'waited': self.waited,
+                'avg_wait_ms': (self.wait_seconds / self.checkouts * 1000.0) if self.checkouts else 0.0,
+                'max_wait_ms': self.max_wait_seconds * 1000.0,
+                'timeouts': self.timeouts,
+            }
+
+
+def _sqlite_profile(dbapi_conn, _record):
+    # WAL lets readers run alongside the writer; NORMAL sync is safe under
+    # WAL; busy_timeout makes writers queue instead of failing "database
+    # is locked"
+    cur = dbapi_conn.cursor()
+    cur.execute('PRAGMA journal_mode=WAL')
+    cur.execute('PRAGMA synchronous=NORMAL')
+    cur.execute(f'PRAGMA busy_timeout={_env_int("SQLITE_BUSY_TIMEOUT_MS", 5000)}')
+    cur.execute(f'PRAGMA mmap_size={_env_int("SQLITE_MMAP_BYTES", 256 * 1024 * 1024)}')
+    cur.close()
+
+
+def _flag(name: str, default: str = '1') -> bool:
+    return os.getenv(name, default).lower() not in ('0', 'false', 'no')
+
+
+def make_engine(url: Optional[str] = None, **overrides):
+    """Engine for ``url`` (default DATABASE_URL): a timed queue pool sized
+    by DB_POOL_*, plus the pragma profile on SQLite files (SQLITE_PRAGMAS=0
+    turns it off). In-memory SQLite keeps SQLAlchemy's defaults."""
+    u = make_url(url or DATABASE_URL)
+    sqlite = u.get_backend_name() == 'sqlite'
+    memory = sqlite and (not u.database or u.database == ':memory:' or 'mode=memory' in str(u))
+    kwargs = {'future': True}
+    if not memory:
+        kwargs.update(
+            poolclass=TimedQueuePool,
+            pool_size=_env_int('DB_POOL_SIZE', 5),
+            max_overflow=_env_int('DB_MAX_OVERFLOW', 10),
+            pool_timeout=_env_float('DB_POOL_TIMEOUT', 30.0),
+        )
+    if not sqlite:
+        kwargs.update(pool_recycle=_env_int('DB_POOL_RECYCLE', 1800), pool_pre_ping=_flag('DB_POOL_PRE_PING'))
+    kwargs.update(overrides)
+    eng = create_engine(u, **kwargs)
+    if sqlite and not memory and _flag('SQLITE_PRAGMAS'):
+        event.listen(eng, 'connect', _sqlite_profile)
+    return eng
+
+
+def pool_metrics(eng=None) -> Dict:
+    eng = eng or engine
+    pool = eng.pool
+    if isinstance(pool, TimedQueuePool):
+        return {'pool': 'queue', **pool.metrics()}
+    return {'pool': type(pool).__name__}
+
+
+engine = make_engine()
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
 
 def get_db():
-    # Ensure tables exist when a DB session is first requested. This
-    # moves table creation away from module import time so tests can
-    # control/remove the DB file before the app creates tables.
-    Base.metadata.create_all(bind=engine)
+    # The schema is settled the first time a session is requested (see
+    # backend.app.schema), not at import time, so tests can control or
+    # remove the DB file before the app creates tables.
+    from .schema import ensure_schema
+    ensure_schema()
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+def dialect_insert(db, table):
+    """``INSERT`` construct for the session's dialect, so callers can use
+    ``on_conflict_do_nothing`` on both Postgres and SQLite."""
+    name = db.get_bind().dialect.name
+    if name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f'upserts are not supported on {name}')
+    return insert(table)
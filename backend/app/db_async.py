@@ -0,0 +1,82 @@
+"""Async database access for the API (DB_ASYNC=1).
+
+The same database as ``backend.app.db`` through an ``AsyncEngine``
+(asyncpg on Postgres, aiosqlite on SQLite), so a request waiting on the
+database does not hold a threadpool thread. Sync service code is reused
+through ``AsyncSession.run_sync``, which runs it on the async connection
+without a thread.
+"""
+import threading
+from typing import AsyncIterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette.concurrency import run_in_threadpool
+
+from .db import DATABASE_URL, TimedQueuePool, _env_float, _env_int, _flag, _sqlite_profile
+
+DB_ASYNC = _flag('DB_ASYNC', '0')
+
+_ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+def async_url(url: str):
+    """``url`` with the async driver for its backend."""
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend not in _ASYNC_DRIVERS:
+        raise NotImplementedError(f'no async driver configured for {backend}')
+    return u.set(drivername=_ASYNC_DRIVERS[backend])
+
+
+class TimedAsyncQueuePool(TimedQueuePool, AsyncAdaptedQueuePool):
+    # the checkout timing of TimedQueuePool on the asyncio-aware queue
+    pass
+
+
+def make_async_engine(url: str = None, **overrides):
+    u = async_url(url or DATABASE_URL)
+    sqlite = u.get_backend_name() == 'sqlite'
+    memory = sqlite and (not u.database or u.database == ':memory:')
+    kwargs = {}
+    if not memory:
+        kwargs.update(poolclass=TimedAsyncQueuePool, pool_size=_env_int('DB_POOL_SIZE', 5), max_overflow=_env_int('DB_MAX_OVERFLOW', 10),
+                      pool_timeout=_env_float('DB_POOL_TIMEOUT', 30.0))
+    if not sqlite:
+        kwargs.update(pool_recycle=_env_int('DB_POOL_RECYCLE', 1800), pool_pre_ping=_flag('DB_POOL_PRE_PING'))
+    kwargs.update(overrides)
+    eng = create_async_engine(u, **kwargs)
+    if sqlite and not memory and _flag('SQLITE_PRAGMAS'):
+        event.listen(eng.sync_engine, 'connect', _sqlite_profile)
+    return eng
+
+
+_engine = None
+_sessionmaker = None
+_lock = threading.Lock()
+
+
+def get_async_sessionmaker() -> async_sessionmaker:
+    global _engine, _sessionmaker
+    with _lock:
+        if _sessionmaker is None:
+            _engine = make_async_engine()
+            _sessionmaker = async_sessionmaker(_engine, expire_on_commit=False)
+        return _sessionmaker
+
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    # async counterpart of db.get_db
+    from .schema import get_schema_manager
+    manager = get_schema_manager()
+    if not manager.ready:
+        await run_in_threadpool(manager.ensure)
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+
+def async_engine():
+    """The async engine, once created (for metrics); None before."""
+    return _engine
@@ -0,0 +1,381 @@
+"""Offline dictionary for ``words`` (definition, pronunciation, example, pos).
+
+Loads an ECDICT- or WordNet-style CSV into ``words`` and builds a compact
+memory-mapped index that ingest uses to fill in newly extracted words::
+
+    python -m backend.app.dictionary load ecdict.csv --batch-size 20000
+    python -m backend.app.dictionary index ecdict.csv --out data/dict.idx
+    python -m backend.app.dictionary enrich            # fill existing words from DICT_INDEX_PATH
+
+``definition`` only takes English definitions (``definition`` or
+``gloss`` columns). ECDICT leaves many rows without one and has a Chinese
+``translation`` instead; ``--translation-fallback`` on ``load`` and
+``index`` uses it for those rows, mixing Chinese glosses into
+``definition``.
+
+``load`` upserts in batches (COPY into a temporary table on Postgres, an
+executemany elsewhere), one transaction per batch. Users whose words
+changed get their plan cache entries dropped and their study sessions
+invalidated; per-process local caches catch up within
+PLAN_CACHE_TTL_SECONDS.
+
+The index file is a header, an array of record offsets sorted by lemma
+and the records themselves (``lemma\\t<json fields>\\n``). Lookups are a
+binary search over the offsets of the mapped file, so every worker shares
+the same pages through the OS page cache instead of holding the
+dictionary in its own heap. Set DICT_INDEX_PATH to use it during ingest.
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal, dialect_insert
+from . import models
+from . import plan_cache
+from . import sessions
+
+logger = logging.getLogger('wordmem.dictionary')
+
+FIELDS = ('pos', 'definition', 'pronunciation', 'example')
+
+# candidate CSV columns per field; the first non-empty one in a row wins
+_COLUMNS = {
+    'lemma': ('lemma', 'word', 'headword'),
+    'pos': ('pos', 'part_of_speech'),
+    'definition': ('definition', 'gloss'),
+    'pronunciation': ('pronunciation', 'phonetic', 'ipa'),
+    'example': ('example', 'examples'),
+}
+
+_MAGIC = b'LWDICT1\n'
+_HEADER = struct.Struct('<8sQ')
+_OFFSET = struct.Struct('<Q')
+
+POS_MAX = models.Word.__table__.c.pos.type.length or 32
+
+
+def _clean(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    # ECDICT writes line breaks inside a field as a literal backslash-n
+    value = value.replace('\\n', '\n').strip()
+    return value or None
+
+
+def read_csv(path: str, translation: bool = False) -> Iterator[Dict]:
+    """Rows of a dictionary CSV as ``{'lemma', *FIELDS}`` dicts, lemmas
+    lowercased like extracted words. Later duplicates of a lemma are
+    skipped. With ``translation``, rows without an English definition take
+    the ``translation`` column (ECDICT's Chinese gloss) instead."""
+    csv.field_size_limit(1 << 30)
+    seen = set()
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        header = {c.strip().lower(): c for c in reader.fieldnames or []}
+        source = {field: [header[n] for n in names if n in header] for field, names in _COLUMNS.items()}
+        if translation and 'translation' in header:
+            source['definition'].append(header['translation'])
+        if not source['lemma']:
+            raise ValueError(f'{path}: no lemma/word column')
+        for row in reader:
+            lemma = (row.get(source['lemma'][0]) or '').strip().lower()
+            if not lemma or '\t' in lemma or '\n' in lemma or lemma in seen:
+                continue
+            seen.add(lemma)
+            entry = {'lemma': lemma}
+            for field in FIELDS:
+                entry[field] = next((v for v in (_clean(row.get(c)) for c in source[field]) if v), None)
+            if entry['pos']:
+                entry['pos'] = entry['pos'][:POS_MAX]
+            yield entry
+
+
+def _batches(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _affected_users(db: Session, word_ids: List[str]) -> List[str]:
+    users = set()
+    for i in range(0, len(word_ids), 500):
+        users.update(db.execute(
+            select(models.UserWord.user_id).distinct().where(models.UserWord.word_id.in_(word_ids[i:i + 500]))
+        ).scalars())
+    return list(users)
+
+
+def _merge(row: Dict, old) -> Dict:
+    # dictionary values win, but an empty one never blanks a stored field
+    return {f: row[f] if row[f] is not None else getattr(old, f) for f in FIELDS}
+
+
+def _upsert_batch(db: Session, batch: List[Dict], now: datetime) -> Tuple[int, List[str]]:
+    """Insert new lemmas and update changed ones; returns (inserted, ids of
+    existing words whose details changed)."""
+    W = models.Word
+    existing = {}
+    for i in range(0, len(batch), 500):
+        chunk = [b['lemma'] for b in batch[i:i + 500]]
+        existing.update((r.lemma, r) for r in db.execute(
+            select(W.id, W.lemma, *(getattr(W, f) for f in FIELDS)).where(W.lemma.in_(chunk))))
+    new_rows, changed = [], []
+    for row in batch:
+        old = existing.get(row['lemma'])
+        if old is None:
+            new_rows.append({'id': str(uuid.uuid4()), 'lemma': row['lemma'], 'created_at': now,
+                             **{f: row[f] for f in FIELDS}})
+            continue
+        merged = _merge(row, old)
+        if any(merged[f] != getattr(old, f) for f in FIELDS):
+            changed.append({'_id': old.id, **{f'_{f}': merged[f] for f in FIELDS}})
+    if new_rows:
+        # a concurrent ingest may add some of the same lemmas first; those
+        # are filled by the next `enrich`
+        db.execute(dialect_insert(db, W.__table__).on_conflict_do_nothing(index_elements=['lemma']), new_rows)
+    if changed:
+        table = W.__table__
+        stmt = table.update().where(table.c.id == bindparam('_id')).values(
+            **{f: bindparam(f'_{f}') for f in FIELDS})
+        db.execute(stmt, changed)
+    return len(new_rows), [c['_id'] for c in changed]
+
+
+def _copy_batch(db: Session, batch: List[Dict], now: datetime) -> Tuple[int, List[str]]:
+    # Postgres: COPY into a temp table, then one INSERT ... ON CONFLICT
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in batch:
+        writer.writerow([row['lemma'], *(row[f] if row[f] is not None else '' for f in FIELDS)])
+    buf.seek(0)
+    db.execute(text(
+        'CREATE TEMP TABLE IF NOT EXISTS dict_load (lemma text, pos text, definition text, '
+        'pronunciation text, example text) ON COMMIT DELETE ROWS'))
+    cursor = db.connection().connection.cursor()
+    cursor.copy_expert(f"COPY dict_load (lemma, {', '.join(FIELDS)}) FROM STDIN WITH (FORMAT csv)", buf)
+    rows = db.execute(text(
+        "INSERT INTO words (id, lemma, pos, definition, pronunciation, example, created_at) "
+        "SELECT gen_random_uuid()::text, lemma, NULLIF(pos, ''), NULLIF(definition, ''), "
+        "NULLIF(pronunciation, ''), NULLIF(example, ''), :now FROM dict_load "
+        "ON CONFLICT (lemma) DO UPDATE SET "
+        "pos = COALESCE(EXCLUDED.pos, words.pos), definition = COALESCE(EXCLUDED.definition, words.definition), "
+        "pronunciation = COALESCE(EXCLUDED.pronunciation, words.pronunciation), "
+        "example = COALESCE(EXCLUDED.example, words.example) "
+        "WHERE (words.pos, words.definition, words.pronunciation, words.example) IS DISTINCT FROM "
+        "(COALESCE(EXCLUDED.pos, words.pos), COALESCE(EXCLUDED.definition, words.definition), "
+        "COALESCE(EXCLUDED.pronunciation, words.pronunciation), COALESCE(EXCLUDED.example, words.example)) "
+        "RETURNING id, xmax = 0 AS inserted"
+    ), {'now': now}).all()
+    return sum(1 for r in rows if r.inserted), [r.id for r in rows if not r.inserted]
+
+
+def load(rows: Iterable[Dict], batch_size: int = 20000, session_factory=SessionLocal) -> Dict:
+    """Upsert dictionary ``rows`` into ``words``, one transaction per batch."""
+    stats = {'rows': 0, 'inserted': 0, 'updated': 0, 'users_invalidated': 0}
+    db = session_factory()
+    try:
+        upsert = _copy_batch if db.get_bind().dialect.name == 'postgresql' else _upsert_batch
+        for batch in _batches(rows, batch_size):
+            inserted, changed = upsert(db, batch, datetime.utcnow())
+            users = _affected_users(db, changed) if changed else []
+            sessions.touch(db, users)
+            db.commit()
+            for user_id in users:
+                plan_cache.invalidate(user_id)
+            stats['rows'] += len(batch)
+            stats['inserted'] += inserted
+            stats['updated'] += len(changed)
+            stats['users_invalidated'] += len(users)
+    finally:
+        db.close()
+    return stats
+
+
+def build_index(rows: Iterable[Dict], path: str) -> int:
+    """Write the index file for ``rows`` to ``path`` (atomically); returns
+    the number of entries."""
+    records = sorted(
+        (r['lemma'].encode('utf-8'), json.dumps([r[f] for f in FIELDS], ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+        for r in rows
+    )
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(_HEADER.pack(_MAGIC, len(records)))
+        pos = _HEADER.size + _OFFSET.size * len(records)
+        offsets = bytearray()
+        for lemma, fields in records:
+            offsets += _OFFSET.pack(pos)
+            pos += len(lemma) + len(fields) + 2
+        f.write(offsets)
+        for lemma, fields in records:
+            f.write(lemma + b'\t' + fields + b'\n')
+    os.replace(tmp, path)
+    return len(records)
+
+
+class DictionaryIndex:
+    """Read-only lookups in an index file written by ``build_index``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC:
+            self._mm.close()
+            raise ValueError(f'{path}: not a dictionary index')
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _offset(self, i: int) -> int:
+        return _OFFSET.unpack_from(self._mm, _HEADER.size + _OFFSET.size * i)[0]
+
+    def _lemma_at(self, off: int) -> bytes:
+        return self._mm[off:self._mm.find(b'\t', off)]
+
+    def get(self, lemma: str) -> Optional[Dict]:
+        """``{field: value}`` for ``lemma``, or None if it isn't listed."""
+        key = lemma.encode('utf-8')
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            off = self._offset(mid)
+            found = self._lemma_at(off)
+            if found < key:
+                lo = mid + 1
+            elif found > key:
+                hi = mid
+            else:
+                start = off + len(found) + 1
+                return dict(zip(FIELDS, json.loads(self._mm[start:self._mm.find(b'\n', start)])))
+        return None
+
+    def lookup(self, lemmas: Iterable[str]) -> Dict[str, Dict]:
+        """Entries for the listed lemmas among ``lemmas``."""
+        out = {}
+        for lemma in lemmas:
+            entry = self.get(lemma)
+            if entry is not None:
+                out[lemma] = entry
+        return out
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+_index = None
+_index_key = None
+_index_lock = threading.Lock()
+_missing_logged = set()
+
+
+def get_index() -> Optional[DictionaryIndex]:
+    """Process-wide index from DICT_INDEX_PATH; None when unset or missing.
+
+    Nothing is cached until an open succeeds, and a rebuilt file (new
+    mtime) is reopened, so an index built after a worker started is picked
+    up without a restart."""
+    global _index, _index_key
+    path = os.getenv('DICT_INDEX_PATH')
+    if not path:
+        return None
+    try:
+        key = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        if path not in _missing_logged:
+            _missing_logged.add(path)
+            logger.warning('DICT_INDEX_PATH %s does not exist; new words are stored without details', path)
+        return None
+    if _index is not None and _index_key == key:
+        return _index
+    with _index_lock:
+        if _index is None or _index_key != key:
+            # a replaced index stays mapped for lookups already using it
+            _index, _index_key = DictionaryIndex(path), key
+            _missing_logged.discard(path)
+        return _index
+
+
+def enrich(index: DictionaryIndex, batch_size: int = 5000, session_factory=SessionLocal) -> Dict:
+    """Fill empty details of existing words from ``index``."""
+    W = models.Word
+    stats = {'scanned': 0, 'updated': 0, 'users_invalidated': 0}
+    db = session_factory()
+    try:
+        last = None
+        while True:
+            q = select(W.lemma).where(W.definition.is_(None)).order_by(W.lemma).limit(batch_size)
+            if last is not None:
+                q = q.where(W.lemma > last)
+            lemmas = db.execute(q).scalars().all()
+            if not lemmas:
+                break
+            last = lemmas[-1]
+            found = index.lookup(lemmas)
+            rows = [{'lemma': lemma, **entry} for lemma, entry in found.items()]
+            changed = _upsert_batch(db, rows, datetime.utcnow())[1] if rows else []
+            users = _affected_users(db, changed) if changed else []
+            sessions.touch(db, users)
+            db.commit()
+            for user_id in users:
+                plan_cache.invalidate(user_id)
+            stats['scanned'] += len(lemmas)
+            stats['updated'] += len(changed)
+            stats['users_invalidated'] += len(users)
+    finally:
+        db.close()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load and index an offline dictionary')
+    sub = parser.add_subparsers(dest='command', required=True)
+    l = sub.add_parser('load', help='upsert a dictionary CSV into words')
+    l.add_argument('csv')
+    l.add_argument('--batch-size', type=int, default=20000)
+    i = sub.add_parser('index', help='build the memory-mapped lookup index')
+    i.add_argument('csv')
+    i.add_argument('--out', default=os.getenv('DICT_INDEX_PATH') or 'dict.idx')
+    for p in (l, i):
+        p.add_argument('--translation-fallback', action='store_true',
+                       help='use the translation column when a row has no English definition')
+    e = sub.add_parser('enrich', help='fill existing words without a definition from the index')
+    e.add_argument('--index', default=os.getenv('DICT_INDEX_PATH'))
+    e.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    if args.command == 'load':
+        stats = load(read_csv(args.csv, args.translation_fallback), args.batch_size)
+        print(f"loaded {stats['rows']} entries: {stats['inserted']} new words, {stats['updated']} updated, "
+              f"{stats['users_invalidated']} users' queues invalidated")
+    elif args.command == 'index':
+        n = build_index(read_csv(args.csv, args.translation_fallback), args.out)
+        print(f'indexed {n} entries into {args.out}')
+    else:
+        if not args.index:
+            parser.error('--index or DICT_INDEX_PATH is required')
+        stats = enrich(DictionaryIndex(args.index), args.batch_size)
+        print(f"enriched {stats['updated']} of {stats['scanned']} words; "
+              f"{stats['users_invalidated']} users' queues invalidated")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger('wordmem.events')
+
+
+def upload_channel(upload_id: str) -> str:
+    return f'upload:{upload_id}'
+
+
+class _LocalSubscription:
+    def __init__(self, broker: 'LocalBroker', channel: str, maxsize: int = 256):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def _put(self, message: Dict):
+        if self.queue.full():
+            # slow consumer: drop the oldest event rather than block publishers
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    def deliver(self, message: Dict):
+        # publishers run in worker threads; hand off to the subscriber's loop
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    async def get(self, timeout: float) -> Optional[Dict]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker._unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process pub/sub. Only reaches subscribers in the same process, so
+    use the Redis broker when OCR runs in separate worker processes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subs: Dict[str, Set[_LocalSubscription]] = {}
+
+    def publish(self, channel: str, message: Dict):
+        with self._lock:
+            subs = list(self._subs.get(channel, ()))
+        for sub in subs:
+            try:
+                sub.deliver(message)
+            except RuntimeError:
+                # subscriber's loop already closed
+                self._unsubscribe(sub)
+
+    async def subscribe(self, channel: str) -> _LocalSubscription:
+        sub = _LocalSubscription(self, channel)
+        with self._lock:
+            self._subs.setdefault(channel, set()).add(sub)
+        return sub
+
+    def _unsubscribe(self, sub: _LocalSubscription):
+        with self._lock:
+            subs = self._subs.get(sub.channel)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[sub.channel]
+
+
+class _RedisSubscription:
+    def __init__(self, pubsub):
+        self.pubsub = pubsub
+
+    async def get(self, timeout: float) -> Optional[Dict]:
+        msg = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if not msg:
+            return None
+        return json.loads(msg['data'])
+
+    async def close(self):
+        await self.pubsub.unsubscribe()
+        await self.pubsub.close()
+
+
+class RedisBroker:
+    """Redis pub/sub, shared by API and worker processes."""
+
+    def __init__(self, url: str):
+        import redis
+        import redis.asyncio as aioredis
+        self.url = url
+        self._sync = redis.Redis.from_url(url)
+        self._async = aioredis.Redis.from_url(url)
+
+    def publish(self, channel: str, message: Dict):
+        self._sync.publish(channel, json.dumps(message, default=str))
+
+    async def subscribe(self, channel: str) -> _RedisSubscription:
+        pubsub = self._async.pubsub()
+        await pubsub.subscribe(channel)
+        return _RedisSubscription(pubsub)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """The process-wide broker: EVENTS_BACKEND=redis uses REDIS_URL,
+    anything else the in-process broker."""
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            if os.getenv('EVENTS_BACKEND', 'local') == 'redis':
+                _broker = RedisBroker(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+            else:
+                _broker = LocalBroker()
+        return _broker
+
+
+def publish_upload(upload_id: str, event: str, **data):
+    """Best-effort notification; a broker outage must never fail a job."""
+    try:
+        get_broker().publish(upload_channel(upload_id), {'event': event, 'upload_id': upload_id, **data})
+    except Exception:
+        logger.exception('failed to publish %s event for upload %s', event, upload_id)
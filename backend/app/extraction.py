@@ -0,0 +1,257 @@
+import os
+import re
+from collections import Counter
+from typing import Dict, Iterable, Iterator, Optional, Set
+
+# Response fields that carry recognised text. Everything else in an OCR
+# response (bounding boxes, confidences, echoed image bytes, ids) is skipped.
+TEXT_KEYS = frozenset({'text', 'content', 'plain_text', 'plainText', 'output', 'outputText', '_raw_text'})
+
+# A word hyphenated at a line break ("exam-\nple") is rejoined first.
+_LINEBREAK_HYPHEN_RE = re.compile(r'-\r?\n[ \t]*')
+
+# Byte translation table for tokenizing: ASCII letters and apostrophes
+# (contractions: "don't", "we'll") survive, everything else becomes a space.
+_KEEP_BYTES = set(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'")
+_TOKEN_TABLE = bytes(b if b in _KEEP_BYTES else 0x20 for b in range(256))
+
+# geometry / payload fields never worth descending into
+SKIP_KEYS = frozenset({'bbox', 'boundingBox', 'bounding_box', 'boundingPoly', 'vertices', 'polygon',
+                       'image', 'image_bytes'})
+
+DEFAULT_STOPWORDS = frozenset('''
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most my
+myself no nor not now of off on once only or other our ours ourselves out over own same she should so
+some such than that the their theirs them themselves then there these they this those through to too
+under until up very was we were what when where which while who whom why will with would you your
+yours yourself yourselves also may might must shall upon yet via per etc
+'''.split())
+
+# contraction suffixes that attach to a base word we keep
+_CONTRACTION_SUFFIXES = frozenset({'s', 't', 'll', 're', 've', 'd', 'm'})
+_IRREGULAR_CONTRACTIONS = {"can't": 'can', "won't": 'will', "shan't": 'shall', "ain't": 'be'}
+
+IRREGULAR_LEMMAS = {
+    'am': 'be', 'is': 'be', 'are': 'be', 'was': 'be', 'were': 'be', 'been': 'be', 'being': 'be',
+    'has': 'have', 'had': 'have', 'having': 'have', 'does': 'do', 'did': 'do', 'done': 'do',
+    'went': 'go', 'gone': 'go', 'goes': 'go', 'said': 'say', 'made': 'make', 'took': 'take',
+    'taken': 'take', 'came': 'come', 'saw': 'see', 'seen': 'see', 'knew': 'know', 'known': 'know',
+    'got': 'get', 'gotten': 'get', 'gave': 'give', 'given': 'give', 'found': 'find', 'thought': 'think',
+    'told': 'tell', 'became': 'become', 'left': 'leave', 'felt': 'feel', 'brought': 'bring',
+    'began': 'begin', 'begun': 'begin', 'kept': 'keep', 'held': 'hold', 'wrote': 'write',
+    'written': 'write', 'stood': 'stand', 'heard': 'hear', 'meant': 'mean', 'met': 'meet',
+    'ran': 'run', 'paid': 'pay', 'sat': 'sit', 'spoke': 'speak', 'spoken': 'speak', 'lay': 'lie',
+    'led': 'lead', 'grew': 'grow', 'grown': 'grow', 'lost': 'lose', 'fell': 'fall', 'fallen': 'fall',
+    'sent': 'send', 'built': 'build', 'understood': 'understand', 'drew': 'draw', 'drawn': 'draw',
+    'broke': 'break', 'broken': 'break', 'spent': 'spend', 'rose': 'rise', 'risen': 'rise',
+    'drove': 'drive', 'driven': 'drive', 'bought': 'buy', 'wore': 'wear', 'worn': 'wear',
+    'chose': 'choose', 'chosen': 'choose', 'sought': 'seek', 'threw': 'throw', 'thrown': 'throw',
+    'caught': 'catch', 'taught': 'teach', 'ate': 'eat', 'eaten': 'eat', 'flew': 'fly', 'flown': 'fly',
+    'forgot': 'forget', 'forgotten': 'forget', 'sold': 'sell', 'slept': 'sleep', 'won': 'win',
+    'children': 'child', 'men': 'man', 'women': 'woman', 'people': 'person', 'feet': 'foot',
+    'teeth': 'tooth', 'mice': 'mouse', 'geese': 'goose', 'oxen': 'ox', 'lives': 'life',
+    'wives': 'wife', 'knives': 'knife', 'leaves': 'leaf', 'halves': 'half', 'wolves': 'wolf',
+    'shelves': 'shelf', 'thieves': 'thief', 'loaves': 'loaf', 'calves': 'calf', 'selves': 'self',
+    'buses': 'bus', 'gases': 'gas', 'better': 'good', 'best': 'good', 'worse': 'bad', 'worst': 'bad',
+}
+
+# words that merely look inflected
+_KEEP_AS_IS = frozenset('''
+news series species means physics mathematics economics politics ethics lens bus gas yes this thus
+hundred bed red need seed speed feed weed bleed breed shed sled indeed naked wicked sacred kindred
+exceed proceed succeed greed deed heed reed steed creed tweed
+morning evening ceiling during nothing something anything everything wedding pudding
+always perhaps towards afterwards besides sometimes whereas
+'''.split())
+
+_VOWELS = set('aeiouy')
+
+
+def _has_vowel(s: str) -> bool:
+    return any(c in _VOWELS for c in s)
+
+
+# stems that lost a silent "e": moved, danced, realized, judged, settled
+_E_ENDINGS = ('v', 'c', 'iz', 'yz', 'dg', 'rg', 'lg', 'bl', 'pl', 'tl', 'dl', 'gl', 'kl', 'cl', 'fl', 'zl')
+
+
+def _undouble_or_restore_e(stem: str) -> str:
+    # running -> run, stopped -> stop (but keep "fall", "miss", "buzz")
+    if len(stem) >= 3 and stem[-1] == stem[-2] and stem[-1] not in 'lsz' and stem[-1] not in _VOWELS:
+        return stem[:-1]
+    # making -> make, hoped -> hope: short consonant-vowel-consonant stems
+    if len(stem) == 3 and stem[0] not in _VOWELS and stem[1] in 'aeiou' and stem[2] not in _VOWELS and stem[2] not in 'wxy':
+        return stem + 'e'
+    if stem.endswith(_E_ENDINGS):
+        return stem + 'e'
+    # secured -> secure, desired -> desire (but poured -> pour)
+    if len(stem) >= 4 and stem[-2:] in ('ur', 'ir') and stem[-3] not in _VOWELS:
+        return stem + 'e'
+    return stem
+
+
+def lemmatize(word: str) -> str:
+    """Map a lowercase word to its dictionary (``Word.lemma``) form.
+
+    A lightweight rule-based lemmatizer: irregular forms come from a table,
+    regular plurals and -ed/-ing verb forms are stripped by suffix rules.
+    """
+    if word in IRREGULAR_LEMMAS:
+        return IRREGULAR_LEMMAS[word]
+    if word in _KEEP_AS_IS or len(word) <= 3:
+        return word
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('sses'):
+        return word[:-2]
+    if word.endswith(('ches', 'shes', 'xes', 'zzes')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is', 'ous')):
+        return word[:-1]
+    if word.endswith('ing') and len(word) > 5:
+        stem = word[:-3]
+        if _has_vowel(stem):
+            return _undouble_or_restore_e(stem)
+    if word.endswith('ied') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('ed') and len(word) > 4:
+        if word.endswith('eed'):
+            # agreed -> agree
+            return word[:-1]
+        stem = word[:-2]
+        if _has_vowel(stem):
+            return _undouble_or_restore_e(stem)
+    return word
+
+
+def _split_tail(text: str):
+    """``(head, tail)`` cut at the last line break not ending a hyphenated
+    line, so ``head`` tokenizes the same on its own as inside ``text``."""
+    cut = text.rfind('\n')
+    while cut > 0 and text[:cut].rstrip('\r').endswith('-'):
+        cut = text.rfind('\n', 0, cut)
+    if cut < 0:
+        return '', text
+    return text[:cut], text[cut + 1:]
+
+
+def load_stopwords(path: Optional[str] = None) -> Set[str]:
+    """Default English stopwords, replaced by the file at ``path`` (or
+    OCR_STOPWORDS_FILE) when given: one word per line, ``#`` comments."""
+    path = path or os.getenv('OCR_STOPWORDS_FILE')
+    if not path:
+        return set(DEFAULT_STOPWORDS)
+    words = set()
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip().lower()
+            if line:
+                words.add(line)
+    return words
+
+
+def iter_text_fields(resp) -> Iterator[str]:
+    """Yield only the text-bearing strings of an OCR response, without
+    recursing through the whole structure on the stack. Text that sits
+    directly in a dict is yielded before that dict's nested containers."""
+    stack = [resp]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        obj = pop()
+        if type(obj) is dict:
+            nested = []
+            for k, v in obj.items():
+                kind = type(v)
+                if kind is str:
+                    if k in TEXT_KEYS:
+                        yield v
+                elif (kind is dict or kind is list) and k not in SKIP_KEYS:
+                    if kind is list and (k in TEXT_KEYS or k == 'predictions'):
+                        # strings directly inside a text field or a predictions list are text
+                        for item in v:
+                            if type(item) is str:
+                                yield item
+                    nested.append(v)
+            while nested:
+                push(nested.pop())
+        elif type(obj) is list:
+            for item in reversed(obj):
+                if type(item) is dict or type(item) is list:
+                    push(item)
+        elif type(obj) is str and obj is resp:
+            yield obj
+
+
+class WordExtractor:
+    def __init__(self, stopwords: Optional[Iterable[str]] = None, min_length: int = 3):
+        self.stopwords = set(stopwords) if stopwords is not None else load_stopwords()
+        self.min_length = min_length
+        # raw token -> lemma (or None when filtered); tokens repeat a lot
+        self._memo: Dict[bytes, Optional[str]] = {}
+
+    def _normalize(self, token: bytes) -> Optional[str]:
+        word = token.decode('ascii').strip("'").lower()
+        if "'" in word:
+            if word in _IRREGULAR_CONTRACTIONS:
+                word = _IRREGULAR_CONTRACTIONS[word]
+            else:
+                base, suffix = word.split("'", 1)
+                if suffix == 't' and base.endswith('n'):
+                    base = base[:-1]  # don't -> do, isn't -> is
+                word = base if suffix in _CONTRACTION_SUFFIXES else base + suffix.replace("'", '')
+        if not word or word in self.stopwords:
+            return None
+        lemma = lemmatize(word)
+        if len(lemma) < self.min_length or lemma in self.stopwords:
+            return None
+        return lemma
+
+    @staticmethod
+    def _tokens(text: str):
+        if '-\n' in text or '-\r\n' in text:
+            text = _LINEBREAK_HYPHEN_RE.sub('', text)
+        if '’' in text:
+            text = text.replace('’', "'")
+        # encode + translate + split all run in C, roughly an order of
+        # magnitude faster than a regex scan over the same text
+        return text.encode('ascii', 'replace').translate(_TOKEN_TABLE).split()
+
+    def extract(self, texts: Iterable[str], chunk_chars: int = 256 * 1024) -> Dict[str, int]:
+        """Count lemmas across ``texts``; the returned dict is ordered by
+        first appearance.
+
+        Texts are consumed as a stream and tokenized in ~``chunk_chars``
+        pieces. Pieces are joined with newlines, so a word hyphenated at the
+        end of one OCR line and finished on the next is rejoined.
+        """
+        raw = Counter()
+        buf, size = [], 0
+        for text in texts:
+            buf.append(text)
+            size += len(text)
+            if size >= chunk_chars:
+                # keep the trailing line back: it may continue in the next text
+                done, tail = _split_tail('\n'.join(buf))
+                raw.update(self._tokens(done))
+                buf, size = [tail], len(tail)
+        if buf:
+            raw.update(self._tokens('\n'.join(buf)))
+
+        # tokenizing and Counter run in C; Python-level work below is per
+        # distinct token, not per occurrence.
+        counts: Dict[str, int] = {}
+        memo = self._memo
+        for token, n in raw.items():
+            if token in memo:
+                lemma = memo[token]
+            else:
+                lemma = memo[token] = self._normalize(token)
+            if lemma is not None:
+                counts[lemma] = counts.get(lemma, 0) + n
+        return counts
+
+    def extract_response(self, resp) -> Dict[str, int]:
+        return self.extract(iter_text_fields(resp))
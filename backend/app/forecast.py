@@ -0,0 +1,92 @@
+"""Upcoming review workload: how many cards fall due per day or hour.
+
+Bucketing happens in the database with one ``GROUP BY`` over
+``user_words.next_review_at``, so the cost does not grow with the number
+of rows sent back. Cards already due are reported as ``overdue`` rather
+than spread over past buckets. Results are cached for a short while
+(FORECAST_CACHE_SECONDS, default 60) per user and for the system-wide
+view.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from .cache import TTLCache
+from . import models
+
+BUCKETS = ('day', 'hour')
+_STEP = {'day': timedelta(days=1), 'hour': timedelta(hours=1)}
+_SQLITE_FMT = {'day': '%Y-%m-%d', 'hour': '%Y-%m-%dT%H:00'}
+_PG_FMT = {'day': 'YYYY-MM-DD', 'hour': 'YYYY-MM-DD"T"HH24:00'}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+_cache = TTLCache(maxsize=10000, ttl=_env_float('FORECAST_CACHE_SECONDS', 60.0))
+
+
+def _floor(ts: datetime, bucket: str) -> datetime:
+    if bucket == 'day':
+        return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def _bucket_key(db: Session, col, bucket: str):
+    # bucket labels as text on both backends, matching _SQLITE_FMT
+    if db.get_bind().dialect.name == 'postgresql':
+        return func.to_char(func.date_trunc(bucket, col), _PG_FMT[bucket])
+    return func.strftime(_SQLITE_FMT[bucket], col)
+
+
+def compute(db: Session, user_id: Optional[str] = None, days: int = 7, bucket: str = 'day',
+            now: Optional[datetime] = None) -> Dict:
+    """Cards due in each ``bucket`` over the next ``days`` days, for one
+    user or (``user_id=None``) everyone. Empty buckets are filled in."""
+    if bucket not in BUCKETS:
+        raise ValueError(f'bucket must be one of {BUCKETS}')
+    now = now or datetime.utcnow()
+    end = now + timedelta(days=days)
+    uw = models.UserWord
+    # NULL label = overdue, so everything comes back from one GROUP BY
+    label = case((uw.next_review_at < now, None), else_=_bucket_key(db, uw.next_review_at, bucket))
+    q = select(label.label('bucket'), func.count()).where(uw.next_review_at < end)
+    if user_id is not None:
+        q = q.where(uw.user_id == user_id)
+    counts = dict(db.execute(q.group_by(label)).all())
+
+    overdue = counts.pop(None, 0)
+    buckets = []
+    start = _floor(now, bucket)
+    while start < end:
+        key = start.strftime(_SQLITE_FMT[bucket])
+        buckets.append({'start': key, 'count': counts.get(key, 0)})
+        start += _STEP[bucket]
+    return {
+        'bucket': bucket,
+        'generated_at': now,
+        'overdue': overdue,
+        'total': overdue + sum(b['count'] for b in buckets),
+        'buckets': buckets,
+    }
+
+
+def forecast(db: Session, user_id: Optional[str] = None, days: int = 7, bucket: str = 'day') -> Dict:
+    """``compute`` behind the short-lived cache."""
+    key = (user_id, days, bucket)
+    result = _cache.get(key)
+    if result is None:
+        result = compute(db, user_id, days, bucket)
+        _cache.set(key, result)
+    return result
+
+
+def info() -> Dict:
+    return _cache.stats()
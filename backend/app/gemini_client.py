@@ -0,0 +1,190 @@
+import os
+import asyncio
+import random
+import threading
+import time
+import importlib.util
+from typing import Dict, Optional
+
+import httpx
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+class GeminiError(RuntimeError):
+    pass
+
+
+class GeminiRejected(GeminiError):
+    """The API refused the request itself (non-retryable 4xx)."""
+
+
+class GeminiClient:
+    """asyncio client for the Gemini predict endpoint.
+
+    One instance owns one pooled ``httpx.AsyncClient`` (keep-alive, HTTP/2
+    when the ``h2`` package is installed) and a semaphore capping the number
+    of requests in flight. Retries use exponential backoff with full jitter
+    and never block a thread; every call is bounded by an overall deadline.
+    """
+
+    RETRY_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+    def __init__(self, api_key: str, url: str, timeout: float = None, max_attempts: int = None,
+                 max_in_flight: int = None, deadline: float = None, backoff_base: float = None,
+                 backoff_cap: float = None):
+        self.api_key = api_key or ''
+        self.url = url
+        self.timeout = timeout or _env_float('GEMINI_TIMEOUT', 30.0)
+        self.max_attempts = max_attempts or _env_int('GEMINI_MAX_ATTEMPTS', 3)
+        self.max_in_flight = max_in_flight or _env_int('GEMINI_MAX_IN_FLIGHT', 32)
+        self.deadline = deadline or _env_float('GEMINI_DEADLINE', 120.0)
+        self.backoff_base = backoff_base if backoff_base is not None else _env_float('GEMINI_BACKOFF_BASE', 0.5)
+        self.backoff_cap = backoff_cap if backoff_cap is not None else _env_float('GEMINI_BACKOFF_CAP', 8.0)
+        self.http2 = importlib.util.find_spec('h2') is not None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    def _auth(self):
+        params = {}
+        headers = {}
+        # If the key looks like an API key (AIza...), send as query param; otherwise try Bearer token.
+        if self.api_key.startswith('AIza'):
+            params['key'] = self.api_key
+        else:
+            headers['Authorization'] = f'Bearer {self.api_key}'
+        return params, headers
+
+    def _ensure_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            limits = httpx.Limits(
+                max_connections=self.max_in_flight,
+                max_keepalive_connections=self.max_in_flight,
+                keepalive_expiry=60.0,
+            )
+            self._client = httpx.AsyncClient(http2=self.http2, limits=limits, timeout=self.timeout)
+            self._sem = asyncio.Semaphore(self.max_in_flight)
+        return self._client
+
+    def _backoff(self, attempt: int) -> float:
+        # "full jitter": uniform over [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * (2 ** (attempt - 1))))
+
+    async def predict(self, payload=None, content=None, content_length: int = None, deadline: float = None) -> Dict:
+        """POST one predict request. Pass either a JSON-able ``payload`` or
+        a ``content`` callable returning a fresh body (bytes or async
+        iterator) for each attempt."""
+        client = self._ensure_client()
+        params, headers = self._auth()
+        if content is not None:
+            headers['Content-Type'] = 'application/json'
+            if content_length is not None:
+                # known length: send a plain body instead of chunked encoding
+                headers['Content-Length'] = str(content_length)
+        give_up_at = time.monotonic() + (deadline or self.deadline)
+        last_exc = None
+        for attempt in range(1, self.max_attempts + 1):
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                # waiting for a slot counts against the deadline too
+                await asyncio.wait_for(self._sem.acquire(), timeout=remaining)
+                try:
+                    remaining = give_up_at - time.monotonic()
+                    if remaining <= 0:
+                        raise asyncio.TimeoutError()
+                    kwargs = {'json': payload} if content is None else {'content': content()}
+                    resp = await asyncio.wait_for(
+                        client.post(self.url, params=params, headers=headers,
+                                    timeout=min(self.timeout, remaining), **kwargs),
+                        timeout=remaining,
+                    )
+                finally:
+                    self._sem.release()
+                if resp.status_code in self.RETRY_STATUS:
+                    last_exc = GeminiError(f'HTTP {resp.status_code}')
+                else:
+                    resp.raise_for_status()
+                    try:
+                        return resp.json()
+                    except ValueError:
+                        # Non-JSON response
+                        return {'_raw_text': resp.text}
+            except httpx.HTTPStatusError as e:
+                # other 4xx: the request itself is bad, retrying won't help
+                raise GeminiRejected(f'Gemini API request rejected: {e}')
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                last_exc = e
+            if attempt < self.max_attempts:
+                sleep_for = self._backoff(attempt)
+                if time.monotonic() + sleep_for >= give_up_at:
+                    break
+                await asyncio.sleep(sleep_for)
+        raise GeminiError(f'Gemini API request failed after {attempt} attempts: {last_exc!r}')
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class _LoopThread:
+    """A daemon thread running one event loop, so synchronous callers
+    (worker threads) share one connection pool instead of each spinning up
+    their own loop and client."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loop = None
+
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                t = threading.Thread(target=self._loop.run_forever, name='gemini-loop', daemon=True)
+                t.start()
+            return self._loop
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop())
+
+    def run(self, coro):
+        return self.submit(coro).result()
+
+
+_loop_thread = _LoopThread()
+_clients: Dict[tuple, GeminiClient] = {}
+_clients_lock = threading.Lock()
+
+
+def shared_client(api_key: str, url: str) -> GeminiClient:
+    """Process-wide client per (key, url), used from the shared loop."""
+    with _clients_lock:
+        client = _clients.get((api_key, url))
+        if client is None:
+            client = _clients[(api_key, url)] = GeminiClient(api_key, url)
+        return client
+
+
+def run_sync(coro):
+    """Run a coroutine on the shared Gemini loop from synchronous code."""
+    return _loop_thread.run(coro)
+
+
+def submit(coro):
+    """Schedule a coroutine on the shared Gemini loop; returns a
+    ``concurrent.futures.Future``."""
+    return _loop_thread.submit(coro)
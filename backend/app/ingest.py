@@ -0,0 +1,99 @@
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List
+
+from sqlalchemy.orm import Session
+
+from .db import dialect_insert
+from .dictionary import FIELDS as DICT_FIELDS, get_index
+from .ids import new_id
+from . import models
+from . import sessions
+
+# keeps every IN (...) list and executemany batch well under SQLite's
+# bound-parameter limit
+CHUNK_SIZE = 500
+
+
+def _chunks(items: List, size: int = CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def resolve_words(db: Session, lemmas: Iterable[str]) -> Dict[str, str]:
+    """Return ``{lemma: word_id}`` for ``lemmas``, inserting missing lemmas
+    in bulk. Costs one SELECT per chunk plus, for chunks with new lemmas,
+    one INSERT ... ON CONFLICT DO NOTHING and one SELECT. New words get
+    their details from the offline dictionary index (DICT_INDEX_PATH) when
+    one is configured."""
+    lemmas = list(dict.fromkeys(l for l in lemmas if l))
+    ids: Dict[str, str] = {}
+    now = datetime.utcnow()
+    index = get_index()
+    for chunk in _chunks(lemmas):
+        found = db.query(models.Word.lemma, models.Word.id).filter(models.Word.lemma.in_(chunk)).all()
+        ids.update((lemma, wid) for lemma, wid in found)
+        missing = [l for l in chunk if l not in ids]
+        if not missing:
+            continue
+        details = index.lookup(missing) if index is not None else {}
+        stmt = dialect_insert(db, models.Word.__table__).on_conflict_do_nothing(index_elements=['lemma'])
+        db.execute(stmt, [
+            {'id': str(uuid.uuid4()), 'lemma': l, 'created_at': now, **details.get(l, dict.fromkeys(DICT_FIELDS))}
+            for l in missing
+        ])
+        # re-read rather than trust our ids: a concurrent upload may have
+        # inserted some of the same lemmas first
+        ids.update(
+            (lemma, wid) for lemma, wid in
+            db.query(models.Word.lemma, models.Word.id).filter(models.Word.lemma.in_(missing))
+        )
+    return ids
+
+
+def link_user_words(db: Session, user_id: str, word_ids: Iterable[str]) -> int:
+    """Create ``user_words`` rows for words the user doesn't have yet, due
+    immediately. Returns the number of rows created."""
+    word_ids = list(dict.fromkeys(word_ids))
+    now = datetime.utcnow()
+    created = 0
+    for chunk in _chunks(word_ids):
+        have = {
+            r.word_id for r in
+            db.query(models.UserWord.word_id).filter(models.UserWord.user_id == user_id, models.UserWord.word_id.in_(chunk))
+        }
+        rows = [
+            {
+                'id': new_id(),
+                'user_id': user_id,
+                'word_id': wid,
+                'added_at': now,
+                'review_count': 0,
+                # same as MemoryService.calculate_next for a new item
+                'next_review_at': now - timedelta(days=1),
+                'interval_hours': 0.0,
+                'ease_factor': 2.5,
+            }
+            for wid in chunk if wid not in have
+        ]
+        if rows:
+            # a concurrent ingest for the same user may insert first
+            stmt = dialect_insert(db, models.UserWord.__table__).on_conflict_do_nothing(
+                index_elements=['user_id', 'word_id'])
+            inserted = db.execute(stmt, rows).rowcount
+            if inserted is None or inserted < 0:
+                # driver didn't report it: our freshly made ids are the rows that landed
+                inserted = db.query(models.UserWord.id).filter(
+                    models.UserWord.id.in_([r['id'] for r in rows])).count()
+            created += inserted
+    if created:
+        sessions.touch(db, [user_id])
+    return created
+
+
+def ingest_words(db: Session, user_id: str, lemmas: Iterable[str]) -> Dict:
+    """Resolve extracted lemmas to ``words`` and attach them to the user.
+    Does not commit; callers include it in their own transaction."""
+    ids = resolve_words(db, lemmas)
+    created = link_user_words(db, user_id, ids.values()) if user_id else 0
+    return {'words': len(ids), 'user_words_created': created}
@@ -0,0 +1,400 @@
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from . import models
+from . import ocr_service
+from .ocr_cache import OCRCache
+from . import pdf
+from .ingest import ingest_words
+from .events import publish_upload
+from . import plan_cache
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+LEASE_SECONDS = _env_int('OCR_JOB_LEASE_SECONDS', 300)
+MAX_ATTEMPTS = _env_int('OCR_JOB_MAX_ATTEMPTS', 3)
+BATCH_SIZE = max(1, _env_int('OCR_BATCH_SIZE', 1))
+BATCH_MAX_BYTES = _env_int('OCR_BATCH_MAX_BYTES', 8 * 1024 * 1024)
+
+
+def new_worker_id() -> str:
+    return f'{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+
+def enqueue(db: Session, upload_id: str) -> models.OCRJob:
+    job = models.OCRJob(upload_id=upload_id, status='queued')
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def create_upload(db: Session, user_id: Optional[str], filename: str, storage_path: str, content_hash: str,
+                  size_bytes: int):
+    """Record a stored upload as pending and queue its OCR job."""
+    upload = models.Upload(user_id=user_id, filename=filename, storage_path=storage_path, content_hash=content_hash,
+                           size_bytes=size_bytes, status='pending')
+    db.add(upload)
+    db.commit()
+    db.refresh(upload)
+    return upload, enqueue(db, upload.id)
+
+
+def upload_snapshot(db: Session, upload_id: str) -> Optional[Dict]:
+    """What the status endpoints report for an upload; None if unknown."""
+    up = db.query(models.Upload).filter(models.Upload.id == upload_id).first()
+    if not up:
+        return None
+    ocr_rec = db.query(models.OCRResult).filter(models.OCRResult.upload_id == up.id).first()
+    words = []
+    count = 0
+    if ocr_rec:
+        words = ocr_rec.words_extracted.split(',') if ocr_rec.words_extracted else []
+        count = ocr_rec.count or 0
+    return {
+        'upload_id': up.id,
+        'status': up.status,
+        'words': words,
+        'count': count,
+        'pages_done': up.pages_done or 0,
+        'pages_total': up.pages_total,
+    }
+
+
+def _set_upload_status(db: Session, upload_id: str, status: str, processed: bool = False):
+    values = {'status': status}
+    if processed:
+        values['processed_at'] = datetime.utcnow()
+    db.execute(update(models.Upload).where(models.Upload.id == upload_id).values(**values))
+
+
+def claim(db: Session, worker_id: str, limit: int = 1, job_id: str = None, lease_seconds: int = None) -> List[str]:
+    """Atomically move up to ``limit`` queued jobs to ``processing`` and
+    return their ids.
+
+    Each job is claimed with a conditional UPDATE (``WHERE status='queued'``),
+    so when several workers race for the same row only one sees a rowcount
+    of 1. On Postgres the candidate scan also skips rows locked by others.
+    """
+    now = datetime.utcnow()
+    lease = timedelta(seconds=lease_seconds or LEASE_SECONDS)
+    q = db.query(models.OCRJob.id).filter(models.OCRJob.status == 'queued')
+    if job_id is not None:
+        q = q.filter(models.OCRJob.id == job_id)
+    q = q.order_by(models.OCRJob.created_at).limit(limit)
+    if db.bind.dialect.name == 'postgresql':
+        q = q.with_for_update(skip_locked=True)
+    candidate_ids = [r.id for r in q]
+
+    claimed_ids = []
+    for cid in candidate_ids:
+        res = db.execute(
+            update(models.OCRJob)
+            .where(models.OCRJob.id == cid, models.OCRJob.status == 'queued')
+            .values(
+                status='processing',
+                worker_id=worker_id,
+                lease_expires_at=now + lease,
+                attempts=models.OCRJob.attempts + 1,
+                updated_at=now,
+            )
+        )
+        if res.rowcount == 1:
+            claimed_ids.append(cid)
+    if not claimed_ids:
+        db.commit()
+        return []
+    upload_ids = select(models.OCRJob.upload_id).where(models.OCRJob.id.in_(claimed_ids))
+    db.execute(update(models.Upload).where(models.Upload.id.in_(upload_ids)).values(status='processing'))
+    upload_ids = list(db.execute(upload_ids).scalars())
+    db.commit()
+    for upload_id in upload_ids:
+        publish_upload(upload_id, 'status', status='processing')
+    return claimed_ids
+
+
+def renew_lease(db: Session, job_id: str, worker_id: str, lease_seconds: int = None) -> bool:
+    now = datetime.utcnow()
+    res = db.execute(
+        update(models.OCRJob)
+        .where(models.OCRJob.id == job_id, models.OCRJob.worker_id == worker_id, models.OCRJob.status == 'processing')
+        .values(lease_expires_at=now + timedelta(seconds=lease_seconds or LEASE_SECONDS), updated_at=now)
+    )
+    db.commit()
+    return res.rowcount == 1
+
+
+def requeue_stale(db: Session) -> int:
+    """Return expired ``processing`` jobs to the queue (or fail them once
+    they have used up their attempts). Returns the number of jobs touched."""
+    now = datetime.utcnow()
+    stale = (
+        db.query(models.OCRJob)
+        .filter(models.OCRJob.status == 'processing', models.OCRJob.lease_expires_at < now)
+        .all()
+    )
+    touched = []
+    for job in stale:
+        exhausted = (job.attempts or 0) >= MAX_ATTEMPTS
+        res = db.execute(
+            update(models.OCRJob)
+            .where(models.OCRJob.id == job.id, models.OCRJob.status == 'processing', models.OCRJob.lease_expires_at < now)
+            .values(
+                status='error' if exhausted else 'queued',
+                worker_id=None,
+                lease_expires_at=None,
+                last_error='lease expired',
+                updated_at=now,
+            )
+        )
+        if res.rowcount == 1:
+            status = 'error' if exhausted else 'pending'
+            touched.append((job.upload_id, status))
+            _set_upload_status(db, job.upload_id, status, processed=exhausted)
+    db.commit()
+    for upload_id, status in touched:
+        publish_upload(upload_id, 'status', status=status)
+    return len(touched)
+
+
+def _finish(db: Session, job: models.OCRJob, worker_id: str, status: str, error: str = None) -> bool:
+    # Only the current lease holder may finish the job; if our lease
+    # expired and someone else picked it up, drop our result.
+    values = {'status': status, 'last_error': error, 'lease_expires_at': None, 'updated_at': datetime.utcnow()}
+    if status == 'queued':
+        values['worker_id'] = None
+    res = db.execute(
+        update(models.OCRJob)
+        .where(models.OCRJob.id == job.id, models.OCRJob.worker_id == worker_id, models.OCRJob.status == 'processing')
+        .values(**values)
+    )
+    return res.rowcount == 1
+
+
+def _ocr_record(db: Session, upload_id: str) -> models.OCRResult:
+    rec = db.query(models.OCRResult).filter(models.OCRResult.upload_id == upload_id).first()
+    if rec is None:
+        rec = models.OCRResult(upload_id=upload_id)
+        db.add(rec)
+    return rec
+
+
+def _process_pdf(db: Session, ocr, upload: models.Upload, worker_id: str = None, job_id: str = None) -> dict:
+    """OCR a PDF page-parallel, appending words to the upload's OCRResult as
+    each page finishes so clients can read partial results."""
+    total = pdf.page_count(upload.storage_path)
+    upload.pages_total = total
+    upload.pages_done = 0
+    rec = _ocr_record(db, upload.id)
+    # a retried job starts over
+    rec.words_extracted = ''
+    rec.count = 0
+    db.commit()
+
+    seen = {}
+    failed = 0
+    for _, outcome in ocr.process_pdf(upload.storage_path):
+        new = []
+        if isinstance(outcome, Exception):
+            failed += 1
+        else:
+            for w in outcome.get('words', []):
+                if w not in seen:
+                    seen[w] = None
+                    new.append(w)
+            rec.words_extracted = ','.join(seen)
+            rec.count = len(seen)
+        upload.pages_done = (upload.pages_done or 0) + 1
+        db.commit()
+        # only the words this page added; clients append them
+        publish_upload(upload.id, 'words', words=new, count=len(seen),
+                       pages_done=upload.pages_done, pages_total=total)
+        if job_id and worker_id:
+            renew_lease(db, job_id, worker_id)
+    if total and failed == total:
+        raise RuntimeError(f'all {total} pages failed OCR')
+    words = list(seen)
+    return {'words': words, 'count': len(words), 'raw_result': {'pages_total': total, 'pages_failed': failed}}
+
+
+def process_upload(db: Session, upload: models.Upload, worker_id: str = None, job_id: str = None) -> dict:
+    ocr = ocr_service.OCRService()
+    cache = OCRCache()
+    cached = cache.get(db, upload.content_hash, ocr.model)
+    if cached:
+        # Same image already processed with this model: reuse its words
+        return cache.result(cached)
+    if pdf.is_pdf(upload.storage_path):
+        result = _process_pdf(db, ocr, upload, worker_id, job_id)
+    else:
+        result = ocr.process_document(upload.storage_path)
+    raw = result.get('raw_result')
+    if isinstance(raw, dict) and raw.get('pages_failed'):
+        # partial PDF result: leave it uncached so the next upload retries the failed pages
+        return result
+    cache.put(db, upload.content_hash, ocr.model, result)
+    return result
+
+
+def _complete(db: Session, job: models.OCRJob, upload: models.Upload, worker_id: str, result) -> str:
+    """Record a job outcome; ``result`` is an OCR result dict or the
+    exception raised while producing it."""
+    if isinstance(result, Exception):
+        retry = (job.attempts or 0) < MAX_ATTEMPTS
+        status = 'queued' if retry else 'error'
+        finished = _finish(db, job, worker_id, status, repr(result))
+        if finished:
+            _set_upload_status(db, upload.id, 'pending' if retry else 'error', processed=not retry)
+        db.commit()
+        if finished:
+            publish_upload(upload.id, 'status', status='pending' if retry else 'error')
+        return status
+    if not _finish(db, job, worker_id, 'done'):
+        db.rollback()
+        return 'lost'
+    words = result.get('words', [])
+    ocr_rec = _ocr_record(db, upload.id)
+    ocr_rec.raw_json = str(result)
+    ocr_rec.plain_text = '\n'.join(words)
+    ocr_rec.words_extracted = ','.join(words)
+    ocr_rec.count = result.get('count', 0)
+    if upload.user_id:
+        # link the words to the uploader's study list in the same transaction
+        ingest_words(db, upload.user_id, words)
+    _set_upload_status(db, upload.id, 'done', processed=True)
+    db.commit()
+    if upload.user_id:
+        # new cards are due now; the cached queue no longer covers them
+        plan_cache.invalidate(upload.user_id)
+    # the full list, so a subscriber that missed page batches still ends consistent
+    publish_upload(upload.id, 'status', status='done', words=words, count=ocr_rec.count)
+    return 'done'
+
+
+def execute_job(job_id: str, worker_id: str) -> str:
+    """Run one claimed job in its own session. Returns the final status."""
+    db = SessionLocal()
+    try:
+        job = db.query(models.OCRJob).filter(models.OCRJob.id == job_id).first()
+        if job is None:
+            return 'missing'
+        upload = db.query(models.Upload).filter(models.Upload.id == job.upload_id).first()
+        if upload is None:
+            _finish(db, job, worker_id, 'error', 'upload not found')
+            db.commit()
+            return 'error'
+        try:
+            result = process_upload(db, upload, worker_id, job.id)
+        except Exception as e:
+            db.rollback()
+            result = e
+        return _complete(db, job, upload, worker_id, result)
+    finally:
+        db.close()
+
+
+def _batches(uploads: List[models.Upload], max_items: int, max_bytes: int):
+    batch, size = [], 0
+    for up in uploads:
+        n = up.size_bytes or 0
+        if batch and (len(batch) >= max_items or size + n > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(up)
+        size += n
+    if batch:
+        yield batch
+
+
+def execute_batch(job_ids: List[str], worker_id: str) -> List[str]:
+    """Run several claimed jobs, sending cache misses to Gemini as
+    multi-instance requests of at most OCR_BATCH_SIZE images and
+    OCR_BATCH_MAX_BYTES raw bytes. Each job succeeds or fails on its own."""
+    db = SessionLocal()
+    try:
+        job_list = db.query(models.OCRJob).filter(models.OCRJob.id.in_(job_ids)).all()
+        uploads = {
+            u.id: u for u in db.query(models.Upload).filter(models.Upload.id.in_([j.upload_id for j in job_list]))
+        }
+        ocr = ocr_service.OCRService()
+        cache = OCRCache()
+        results = {}
+        pending = {}
+        for job in job_list:
+            upload = uploads.get(job.upload_id)
+            if upload is None:
+                results[job.id] = RuntimeError('upload not found')
+                continue
+            if pdf.is_pdf(upload.storage_path):
+                # PDFs fan out into their own page-parallel pipeline
+                try:
+                    results[job.id] = process_upload(db, upload, worker_id, job.id)
+                except Exception as e:
+                    db.rollback()
+                    results[job.id] = e
+                continue
+            cached = cache.get(db, upload.content_hash, ocr.model)
+            if cached:
+                results[job.id] = cache.result(cached)
+                continue
+            # identical content inside one batch is only sent once
+            key = upload.content_hash or upload.id
+            pending.setdefault(key, (upload, []))[1].append(job.id)
+
+        representatives = [up for up, _ in pending.values()]
+        for batch in _batches(representatives, BATCH_SIZE, BATCH_MAX_BYTES):
+            if len(batch) == 1:
+                try:
+                    outcomes = [ocr.process_document(batch[0].storage_path)]
+                except Exception as e:
+                    outcomes = [e]
+            else:
+                outcomes = ocr.process_batch([up.storage_path for up in batch])
+            for up, outcome in zip(batch, outcomes):
+                if not isinstance(outcome, Exception):
+                    cache.put(db, up.content_hash, ocr.model, outcome)
+                for jid in pending[up.content_hash or up.id][1]:
+                    results[jid] = outcome
+
+        statuses = []
+        for job in job_list:
+            upload = uploads.get(job.upload_id)
+            if upload is None:
+                _finish(db, job, worker_id, 'error', 'upload not found')
+                db.commit()
+                statuses.append('error')
+                continue
+            statuses.append(_complete(db, job, upload, worker_id, results[job.id]))
+        return statuses
+    finally:
+        db.close()
+
+
+def run_inline(job_id: str):
+    """Claim and run a single job in the calling thread (dev/test mode).
+
+    Failed attempts are retried immediately up to OCR_JOB_MAX_ATTEMPTS."""
+    worker_id = new_worker_id()
+    for _ in range(MAX_ATTEMPTS):
+        db = SessionLocal()
+        try:
+            claimed = claim(db, worker_id, job_id=job_id)
+        finally:
+            db.close()
+        if not claimed:
+            return
+        if execute_job(job_id, worker_id) != 'queued':
+            return
@@ -1,7 +1,17 @@
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from sqlalchemy import bindparam
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from .db import dialect_insert
+from .ids import new_id
 from . import models
+from . import forecast
+from . import plan_cache
+from . import sessions
+from .review_log import event_row, log_events
 
 class MemoryService:
     def __init__(self):
@@ -15,47 +25,308 @@ class MemoryService:
         else:
             return base_interval * 0.7
 
-    def calculate_next(self, user_word: Optional[models.UserWord], performance: float):
+    def calculate_next(self, user_word: Optional[models.UserWord], performance: float, now: Optional[datetime] = None):
+        now = now or datetime.utcnow()
         if user_word is None:
             # For new items, set next_review well in the past so they
             # are immediately due for review in queries using <= now.
             return {
-                'next_review': datetime.utcnow() - timedelta(days=1),
+                'next_review': now - timedelta(days=1),
                 'interval_hours': 0,
                 'status': 'new'
             }
         review_count = user_word.review_count or 0
         base_interval = self.base_intervals[min(review_count, len(self.base_intervals)-1)]
         adjusted = self._adjust_interval(base_interval, performance)
-        next_review = datetime.utcnow() + timedelta(hours=adjusted)
+        next_review = now + timedelta(hours=adjusted)
         return {
             'next_review': next_review,
             'interval_hours': adjusted,
             'status': 'reviewing'
         }
 
+    def infer_performance(self, review_count: int, interval_hours: float) -> float:
+        """A performance in the bucket ``_adjust_interval`` applied, read back
+        from a stored interval; for rows reviewed before ``last_performance``
+        was recorded."""
+        base = self.base_intervals[min(review_count or 0, len(self.base_intervals)-1)]
+        ratio = interval_hours / base
+        if ratio >= 1.15:
+            return 0.8
+        elif ratio >= 0.85:
+            return 0.6
+        return 0.0
+
+    def reschedule(self, user_word: models.UserWord, base_intervals: Optional[List[float]] = None,
+                   overdue_penalty: float = 0.0, now: Optional[datetime] = None) -> Optional[Dict]:
+        """Recompute a reviewed card's schedule from its last review under
+        ``base_intervals`` (default: the current ones). Each day the card
+        is overdue by that schedule shrinks the interval by
+        ``overdue_penalty`` (floored at half); the stored ``next_review_at``
+        is not used, so rescheduling twice gives the same result. Returns None for cards that were never scheduled. The
+        returned ``performance`` is the recorded or inferred one; store it,
+        since the new interval no longer reveals it.
+
+        Scalar reference for ``backend.app.reschedule``, which must agree.
+        """
+        if user_word.last_review_at is None or not user_word.interval_hours:
+            return None
+        now = now or datetime.utcnow()
+        review_count = user_word.review_count or 0
+        performance = user_word.last_performance
+        if performance is None:
+            performance = self.infer_performance(review_count, user_word.interval_hours)
+        intervals = base_intervals or self.base_intervals
+        adjusted = self._adjust_interval(intervals[min(review_count, len(intervals)-1)], performance)
+        if overdue_penalty:
+            overdue_days = ((now - user_word.last_review_at).total_seconds() - adjusted * 3600.0) / 86400.0
+            if overdue_days > 0:
+                adjusted = adjusted * max(0.5, 1.0 - overdue_penalty * overdue_days)
+        return {
+            'next_review': user_word.last_review_at + timedelta(hours=adjusted),
+            'interval_hours': adjusted,
+            'performance': performance,
+        }
+
     def update_progress(self, db: Session, user_id: str, word_id: str, performance: float):
-        uw = db.query(models.UserWord).filter(models.UserWord.user_id==user_id, models.UserWord.word_id==word_id).first()
+        calc, cached = self._update_progress(db, user_id, word_id, performance)
+        plan_cache.record_reviews(user_id, cached)
+        return calc
+
+    def _update_progress(self, db: Session, user_id: str, word_id: str, performance: float):
+        # commits; returns (result, plan cache items) for the caller to record
+        now = datetime.utcnow()
+        uw_table = models.UserWord.__table__
+        q = db.query(models.UserWord).filter(models.UserWord.user_id == user_id, models.UserWord.word_id == word_id)
+        if db.get_bind().dialect.name == 'postgresql':
+            q = q.with_for_update()
+        uw = q.first()
         if not uw:
-            # create new entry
-            uw = models.UserWord(user_id=user_id, word_id=word_id, review_count=1, last_review_at=datetime.utcnow())
-            calc = self.calculate_next(None, performance)
-            uw.next_review_at = calc['next_review']
-            uw.interval_hours = calc['interval_hours']
-            db.add(uw)
-            db.commit()
-            db.refresh(uw)
-            return calc
+            # create new entry; the unique (user_id, word_id) index settles
+            # a race between two first reviews of the same word
+            calc = self.calculate_next(None, performance, now=now)
+            stmt = dialect_insert(db, uw_table).on_conflict_do_nothing(index_elements=['user_id', 'word_id'])
+            uw_id = new_id()
+            res = db.execute(stmt, {
+                'id': uw_id, 'user_id': user_id, 'word_id': word_id, 'added_at': now,
+                'review_count': 1, 'last_review_at': now, 'last_performance': performance, 'next_review_at': calc['next_review'],
+                'interval_hours': calc['interval_hours'], 'ease_factor': 2.5,
+            })
+            if res.rowcount == 1:
+                log_events(db, [event_row(user_id, word_id, now, performance, None, calc['interval_hours'], 1)])
+                sessions.touch(db, [user_id])
+                db.commit()
+                return calc, [(calc['next_review'], uw_id, word_id, calc['interval_hours'], 1)]
+            # lost the race: review the row the other request created
+            uw = q.first()
         # update existing
-        uw.review_count = (uw.review_count or 0) + 1
-        uw.last_review_at = datetime.utcnow()
-        calc = self.calculate_next(uw, performance)
-        uw.next_review_at = calc['next_review']
-        uw.interval_hours = calc['interval_hours']
-        db.add(uw)
+        review_count = (uw.review_count or 0) + 1
+        calc = self.calculate_next(models.UserWord(review_count=review_count), performance, now=now)
+        db.execute(
+            uw_table.update().where(uw_table.c.id == uw.id).values(
+                review_count=review_count, last_review_at=now, last_performance=performance,
+                next_review_at=calc['next_review'], interval_hours=calc['interval_hours'],
+            )
+        )
+        log_events(db, [event_row(user_id, word_id, now, performance, uw.interval_hours, calc['interval_hours'], review_count)])
+        sessions.touch(db, [user_id])
         db.commit()
-        db.refresh(uw)
-        return calc
+        return calc, [(calc['next_review'], uw.id, word_id, calc['interval_hours'], review_count)]
+
+    def apply_reviews(self, db: Session, user_id: str, reviews: List[Dict]) -> List[Dict]:
+        """Apply a batch of reviews (``word_id``, ``performance`` and optional
+        ``reviewed_at`` / ``review_id``) in one transaction.
+
+        Affected ``user_words`` are loaded with one query, schedules are
+        computed in memory (in ``reviewed_at`` order, so repeated cards
+        chain), and written back with one executemany UPDATE and INSERT.
+        Reviews whose ``review_id`` was already applied return the stored
+        result instead of being applied twice. A review older than the
+        card's last one (a late offline sync or a back-dated retry) is
+        logged but leaves the schedule alone and returns ``stale``.
+        Returns one result per review, in request order.
+        """
+        results, cached = self._apply_reviews_retrying(db, user_id, reviews)
+        plan_cache.record_reviews(user_id, cached)
+        return results
+
+    def _apply_reviews_retrying(self, db: Session, user_id: str, reviews: List[Dict]):
+        try:
+            return self._apply_reviews(db, user_id, reviews)
+        except IntegrityError:
+            # a concurrent request won a receipt or user_words insert
+            # (unique (user_id, word_id)); run again against its rows
+            db.rollback()
+            return self._apply_reviews(db, user_id, reviews)
+
+    def _apply_reviews(self, db: Session, user_id: str, reviews: List[Dict]) -> List[Dict]:
+        now = datetime.utcnow()
+        results: List[Optional[Dict]] = [None] * len(reviews)
+
+        review_ids = [r['review_id'] for r in reviews if r.get('review_id')]
+        receipts = {}
+        if review_ids:
+            receipts = {
+                rc.review_id: rc for rc in
+                db.query(models.ReviewReceipt).filter(
+                    models.ReviewReceipt.user_id == user_id, models.ReviewReceipt.review_id.in_(review_ids)
+                )
+            }
+        todo = []
+        seen_ids = set()
+        for i, r in enumerate(reviews):
+            rid = r.get('review_id')
+            if rid in receipts:
+                rc = receipts[rid]
+                results[i] = {'review_id': rid, 'word_id': rc.word_id, 'status': 'duplicate',
+                              'next_review': rc.next_review_at, 'interval_hours': rc.interval_hours}
+            elif rid and rid in seen_ids:
+                results[i] = {'review_id': rid, 'word_id': r['word_id'], 'status': 'duplicate'}
+            else:
+                if rid:
+                    seen_ids.add(rid)
+                todo.append(i)
+
+        word_ids = list({reviews[i]['word_id'] for i in todo})
+        state = {}
+        if word_ids:
+            q = (
+                db.query(models.UserWord.id, models.UserWord.word_id, models.UserWord.review_count,
+                         models.UserWord.interval_hours, models.UserWord.last_review_at,
+                         models.UserWord.next_review_at)
+                .filter(models.UserWord.user_id == user_id, models.UserWord.word_id.in_(word_ids))
+            )
+            if db.get_bind().dialect.name == 'postgresql':
+                # like _update_progress: a concurrent review of the same word
+                # waits for this batch; locked in id order so batches don't deadlock
+                q = q.order_by(models.UserWord.id).with_for_update()
+            for uw in q:
+                state[uw.word_id] = {'id': uw.id, 'review_count': uw.review_count or 0, 'new': False,
+                                     'interval_hours': uw.interval_hours, 'last_review_at': uw.last_review_at,
+                                     'next_review_at': uw.next_review_at}
+            missing = [w for w in word_ids if w not in state]
+            if missing:
+                known = {w for (w,) in db.query(models.Word.id).filter(models.Word.id.in_(missing))}
+                for w in known:
+                    state[w] = {'id': new_id(), 'review_count': 0, 'new': True, 'added_at': now}
+
+        def reviewed_at(i):
+            ts = reviews[i].get('reviewed_at')
+            if ts is None:
+                return now
+            if ts.tzinfo is not None:
+                ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+            # a skewed client clock must not schedule from the future
+            return min(ts, now)
+
+        receipt_rows = []
+        events = []
+        for i in sorted(todo, key=reviewed_at):
+            r = reviews[i]
+            st = state.get(r['word_id'])
+            if st is None:
+                results[i] = {'review_id': r.get('review_id'), 'word_id': r['word_id'], 'status': 'error',
+                              'detail': 'word not found'}
+                continue
+            at = reviewed_at(i)
+            if st.get('last_review_at') is not None and at < st['last_review_at']:
+                # keep the history, but never move the schedule backwards
+                events.append(event_row(user_id, r['word_id'], at, r['performance'], st['interval_hours'],
+                                        st['interval_hours'], st['review_count']))
+                results[i] = {'review_id': r.get('review_id'), 'word_id': r['word_id'], 'status': 'stale',
+                              'next_review': st['next_review_at'], 'interval_hours': st['interval_hours']}
+                if r.get('review_id'):
+                    receipt_rows.append({
+                        'user_id': user_id, 'review_id': r['review_id'], 'word_id': r['word_id'],
+                        'next_review_at': st['next_review_at'], 'interval_hours': st['interval_hours'],
+                        'created_at': now,
+                    })
+                continue
+            if st['new'] and st['review_count'] == 0:
+                # same as update_progress for a word the user didn't have
+                calc = self.calculate_next(None, r['performance'], now=at)
+                st['review_count'] = 1
+            else:
+                st['review_count'] += 1
+                calc = self.calculate_next(models.UserWord(review_count=st['review_count']), r['performance'], now=at)
+            events.append(event_row(user_id, r['word_id'], at, r['performance'], st.get('interval_hours'),
+                                    calc['interval_hours'], st['review_count']))
+            st['last_review_at'] = at
+            st['last_performance'] = r['performance']
+            st['next_review_at'] = calc['next_review']
+            st['interval_hours'] = calc['interval_hours']
+            st['dirty'] = True
+            results[i] = {'review_id': r.get('review_id'), 'word_id': r['word_id'], 'status': 'applied',
+                          'next_review': calc['next_review'], 'interval_hours': calc['interval_hours']}
+            if r.get('review_id'):
+                receipt_rows.append({
+                    'user_id': user_id, 'review_id': r['review_id'], 'word_id': r['word_id'],
+                    'next_review_at': calc['next_review'], 'interval_hours': calc['interval_hours'],
+                    'created_at': now,
+                })
+
+        inserts, updates = [], []
+        for word_id, st in state.items():
+            if not st.get('dirty'):
+                continue
+            if st['new']:
+                inserts.append({
+                    'id': st['id'], 'user_id': user_id, 'word_id': word_id, 'added_at': now,
+                    'review_count': st['review_count'], 'last_review_at': st['last_review_at'],
+                    'last_performance': st['last_performance'],
+                    'next_review_at': st['next_review_at'], 'interval_hours': st['interval_hours'],
+                    'ease_factor': 2.5,
+                })
+            else:
+                updates.append({
+                    '_id': st['id'], '_review_count': st['review_count'], '_last_review_at': st['last_review_at'],
+                    '_last_performance': st['last_performance'],
+                    '_next_review_at': st['next_review_at'], '_interval_hours': st['interval_hours'],
+                })
+        uw = models.UserWord.__table__
+        if updates:
+            db.execute(
+                uw.update().where(uw.c.id == bindparam('_id')).values(
+                    review_count=bindparam('_review_count'),
+                    last_review_at=bindparam('_last_review_at'),
+                    last_performance=bindparam('_last_performance'),
+                    next_review_at=bindparam('_next_review_at'),
+                    interval_hours=bindparam('_interval_hours'),
+                ),
+                updates,
+            )
+        if inserts:
+            db.execute(uw.insert(), inserts)
+        if receipt_rows:
+            db.execute(models.ReviewReceipt.__table__.insert(), receipt_rows)
+        log_events(db, events)
+        if events:
+            sessions.touch(db, [user_id])
+        db.commit()
+        return results, [
+            (st['next_review_at'], st['id'], word_id, st['interval_hours'], st['review_count'])
+            for word_id, st in state.items() if st.get('dirty')
+        ]
+
+    def due_plans(self, db: Session, user_id: str, limit: int = 50) -> List[Dict]:
+        # same rows as due_for_user, served from the plan cache when warm
+        return plan_cache.due_plans(db, user_id, limit)
+
+    def plan_page(self, db: Session, user_id: str, limit: int = 50, cursor: Optional[str] = None):
+        # (plans with their words, next_cursor); see plan_cache.plan_page
+        return plan_cache.plan_page(db, user_id, limit, cursor)
+
+    def queue_version(self, db: Session, user_id: str) -> int:
+        # changes whenever the user's queue does; see sessions.queue_version
+        return sessions.queue_version(db, user_id)
+
+    def prefetch(self, db: Session, user_id: str, limit: int = 20) -> List[Dict]:
+        # next cards in queue order, due or not; read queue_version first
+        return plan_cache.upcoming(db, user_id, limit)
+
+    def forecast(self, db: Session, user_id: Optional[str] = None, days: int = 7, bucket: str = 'day') -> Dict:
+        # upcoming workload per day/hour; user_id=None covers every user
+        return forecast.forecast(db, user_id, days, bucket)
 
     def due_for_user(self, db: Session, user_id: str, limit: int = 50):
         # Return only user_words that are due for review (next_review_at <= now),
@@ -69,3 +340,24 @@ class MemoryService:
             .all()
         )
         return rows
+
+    # Async variants for AsyncSession callers (DB_ASYNC=1). run_sync runs
+    # the sync database code above on the async connection, so both paths
+    # share one implementation and the request holds no thread while it
+    # waits. Plan cache calls can block on Redis, so they run after it, in
+    # the threadpool.
+
+    async def update_progress_async(self, db: AsyncSession, user_id: str, word_id: str, performance: float):
+        calc, cached = await db.run_sync(lambda s: self._update_progress(s, user_id, word_id, performance))
+        if cached:
+            await run_in_threadpool(plan_cache.record_reviews, user_id, cached)
+        return calc
+
+    async def apply_reviews_async(self, db: AsyncSession, user_id: str, reviews: List[Dict]) -> List[Dict]:
+        results, cached = await db.run_sync(lambda s: self._apply_reviews_retrying(s, user_id, reviews))
+        if cached:
+            await run_in_threadpool(plan_cache.record_reviews, user_id, cached)
+        return results
+
+    async def plan_page_async(self, db: AsyncSession, user_id: str, limit: int = 50, cursor: Optional[str] = None):
+        return await plan_cache.plan_page_async(db, user_id, limit, cursor)
@@ -1,18 +1,57 @@
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, BackgroundTasks, Request, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from fastapi import status
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 import os
+import json
+import asyncio
+from typing import Optional
 
-from .db import engine, Base, get_db, SessionLocal
+from .db import engine, Base, get_db, SessionLocal, pool_metrics
 from . import models
-from .schemas import UserCreate, UserOut, Token, UploadOut, ProgressIn, ProgressOut
-from .auth import hash_password, verify_password, create_access_token
-from .auth import get_current_user
+from .schemas import UserCreate, UserOut, Token, UploadOut, ProgressIn, ProgressOut, BatchProgressIn, BatchProgressOut
+from .auth import hash_password, verify_password, create_access_token, token_claims
+from .auth import get_current_user, get_current_user_optional, require_admin, Principal, auth_cache_stats
 from .learning import MemoryService
+from .storage import BlobStore
+from .ocr_cache import OCRCache
+from . import jobs
+from .events import get_broker, upload_channel
+from .plan_cache import get_plan_cache
+from .schema import get_schema_manager
+from .db_async import DB_ASYNC, async_engine
+from .api_async import build_router as build_async_router
 from sqlalchemy.orm import Session
 
 app = FastAPI(title='WordMem API - Skeleton')
+blob_store = BlobStore()
+OCR_QUEUE_MODE = os.getenv('OCR_QUEUE_MODE', 'inline')
+try:
+    PLAN_PAGE_MAX = int(os.getenv('PLAN_PAGE_MAX', '200'))
+except Exception:
+    PLAN_PAGE_MAX = 200
+try:
+    LEARNING_BATCH_MAX = int(os.getenv('LEARNING_BATCH_MAX', '500'))
+except Exception:
+    LEARNING_BATCH_MAX = 500
+try:
+    SSE_HEARTBEAT_SECONDS = float(os.getenv('SSE_HEARTBEAT_SECONDS', '15'))
+except Exception:
+    SSE_HEARTBEAT_SECONDS = 15.0
+try:
+    SSE_MAX_SECONDS = float(os.getenv('SSE_MAX_SECONDS', '300'))
+except Exception:
+    SSE_MAX_SECONDS = 300.0
+try:
+    FORECAST_DAYS_MAX = int(os.getenv('FORECAST_DAYS_MAX', '90'))
+except Exception:
+    FORECAST_DAYS_MAX = 90
+
+if DB_ASYNC:
+    # registered first, so these shadow the sync endpoints on the same paths
+    app.include_router(build_async_router(blob_store, OCR_QUEUE_MODE, PLAN_PAGE_MAX, LEARNING_BATCH_MAX))
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,9 +59,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=['*'],
     allow_headers=['*'],
+    expose_headers=['ETag'],
 )
 
 
+@app.on_event('startup')
+def check_schema():
+    # settle the schema at boot; in SCHEMA_MODE=check a stale database
+    # stops the server here instead of failing requests later
+    get_schema_manager().ensure()
+
+
 @app.get('/')
 def hello():
     return {'status': 'ok', 'service': 'wordmem-backend'}
@@ -51,80 +98,143 @@ def login(credentials: UserCreate, db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.email == credentials.email).first()
     if not user or not verify_password(credentials.password, user.password_hash):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail='Invalid credentials')
-    token = create_access_token({'sub': user.id})
+    token = create_access_token(token_claims(user))
     return {'access_token': token, 'token_type': 'bearer'}
 
 
 # Simple upload endpoint that delegates to OCR service
 @app.post('/api/v1/upload', response_model=UploadOut)
-async def upload_file(file: UploadFile = File(...), background_tasks: BackgroundTasks = BackgroundTasks(), db: Session = Depends(get_db)):
-    from .ocr_service import OCRService
-    contents = await file.read()
-    tmp_path = f"/tmp/{file.filename}"
-    with open(tmp_path, 'wb') as f:
-        f.write(contents)
+async def upload_file(file: UploadFile = File(...), background_tasks: BackgroundTasks = BackgroundTasks(), current_user: Optional[Principal] = Depends(get_current_user_optional), db: Session = Depends(get_db)):
+    # Stream the upload into content-addressed storage instead of reading
+    # the whole file into memory; identical files share one blob.
+    digest, storage_path, size = await blob_store.save_upload(file)
     # Persist minimal upload with pending status and schedule background OCR
-    upload = models.Upload(filename=file.filename, storage_path=tmp_path, status='pending')
-    db.add(upload)
-    db.commit()
-    db.refresh(upload)
-
-    def _process_background(u_id: str, path: str):
-        db2 = SessionLocal()
-        try:
-            ocr = OCRService()
-            result = ocr.process_document(path)
-            ocr_rec = models.OCRResult(upload_id=u_id, raw_json=str(result), plain_text='\n'.join(result.get('words', [])), words_extracted=','.join(result.get('words', [])), count=result.get('count', 0))
-            db2.add(ocr_rec)
-            up = db2.query(models.Upload).filter(models.Upload.id == u_id).first()
-            if up:
-                up.status = 'done'
-            db2.commit()
-        except Exception:
-            up = db2.query(models.Upload).filter(models.Upload.id == u_id).first()
-            if up:
-                up.status = 'error'
-            db2.commit()
-        finally:
-            db2.close()
-
-    # schedule background processing
-    background_tasks.add_task(_process_background, upload.id, tmp_path)
+    user_id = current_user.id if current_user else None
+    # the commits block, so keep them off the event loop
+    upload, job = await run_in_threadpool(jobs.create_upload, db, user_id, file.filename, storage_path, digest, size)
+    # In worker mode a separate `python -m backend.app.worker` process picks
+    # the job up; inline mode (dev/tests) runs it after the response.
+    if OCR_QUEUE_MODE == 'inline':
+        background_tasks.add_task(jobs.run_inline, job.id)
     return {'upload_id': upload.id, 'words': [], 'count': 0}
 
 
 @app.get('/api/v1/upload/{upload_id}')
 def get_upload(upload_id: str, db: Session = Depends(get_db)):
-    up = db.query(models.Upload).filter(models.Upload.id == upload_id).first()
-    if not up:
+    snapshot = jobs.upload_snapshot(db, upload_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail='Upload not found')
+    return snapshot
+
+
+def _load_snapshot(upload_id: str):
+    db = SessionLocal()
+    try:
+        return jobs.upload_snapshot(db, upload_id)
+    finally:
+        db.close()
+
+
+def _sse(event: str, data) -> str:
+    return f'event: {event}\ndata: {json.dumps(data, default=str)}\n\n'
+
+
+TERMINAL_STATUSES = ('done', 'error')
+
+
+@app.get('/api/v1/upload/{upload_id}/events')
+async def upload_events(upload_id: str, request: Request):
+    """Server-Sent Events stream of an upload's progress.
+
+    Sends the current state once as a ``status`` event, then pushes
+    ``status`` transitions and ``words`` batches (new words per PDF page) as
+    the job publishes them, and closes after ``done`` or ``error``. The DB
+    is read once per connection, not once per poll.
+    """
+    # subscribe before reading the snapshot so no transition falls in between
+    sub = await get_broker().subscribe(upload_channel(upload_id))
+    try:
+        snapshot = await run_in_threadpool(_load_snapshot, upload_id)
+    except Exception:
+        await sub.close()
+        raise
+    if snapshot is None:
+        await sub.close()
         raise HTTPException(status_code=404, detail='Upload not found')
-    ocr_rec = db.query(models.OCRResult).filter(models.OCRResult.upload_id == up.id).first()
-    words = []
-    count = 0
-    if ocr_rec:
-        words = ocr_rec.words_extracted.split(',') if ocr_rec.words_extracted else []
-        count = ocr_rec.count or 0
-    return {'upload_id': up.id, 'status': up.status, 'words': words, 'count': count}
 
+    async def stream():
+        try:
+            yield _sse('status', snapshot)
+            if snapshot['status'] in TERMINAL_STATUSES:
+                return
+            loop = asyncio.get_running_loop()
+            # bounded connection; EventSource reconnects and gets a fresh snapshot
+            close_at = loop.time() + SSE_MAX_SECONDS
+            while loop.time() < close_at:
+                if await request.is_disconnected():
+                    return
+                msg = await sub.get(timeout=min(SSE_HEARTBEAT_SECONDS, max(0.0, close_at - loop.time())))
+                if msg is None:
+                    yield ': keepalive\n\n'
+                    continue
+                event = msg.pop('event', 'status')
+                yield _sse(event, msg)
+                if event == 'status' and msg.get('status') in TERMINAL_STATUSES:
+                    return
+        finally:
+            await sub.close()
+
+    return StreamingResponse(
+        stream(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
 
 
 @app.get('/api/v1/learning/plan')
-def get_learning_plan(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_learning_plan(cursor: Optional[str] = None, limit: int = Query(50, ge=1, le=PLAN_PAGE_MAX), current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    # Cards due now with their words, oldest first; pass next_cursor back
+    # as ?cursor= for the following page.
     ms = MemoryService()
-    rows = ms.due_for_user(db, current_user.id)
-    plans = []
-    for r in rows:
-        plans.append({
-            'word_id': r.word_id,
-            'next_review': r.next_review_at,
-            'interval_hours': r.interval_hours,
-            'review_count': r.review_count
-        })
-    return {'plans': plans}
+    try:
+        plans, next_cursor = ms.plan_page(db, current_user.id, limit, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail='invalid cursor')
+    return {'plans': plans, 'next_cursor': next_cursor}
+
+
+@app.get('/api/v1/learning/prefetch')
+def get_learning_prefetch(request: Request, response: Response, limit: int = Query(20, ge=1, le=PLAN_PAGE_MAX), current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    # The next cards in queue order (due or not) for the client to work
+    # through locally. The ETag follows the user's queue version, so a
+    # repeat request is a 304 until a review or new word changes it. The
+    # version is read before the cards: a review landing in between only
+    # makes the tag older than the cards.
+    ms = MemoryService()
+    version = ms.queue_version(db, current_user.id)
+    etag = f'"q{version}-{limit}"'
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+    if_none_match = request.headers.get('if-none-match', '')
+    if if_none_match.strip() == '*' or etag in [t.strip() for t in if_none_match.split(',')]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return {'version': version, 'cards': ms.prefetch(db, current_user.id, limit)}
+
+
+def _forecast(db: Session, user_id: Optional[str], days: int, bucket: str):
+    # hourly buckets are only offered for short windows
+    if bucket == 'hour' and days > 14:
+        raise HTTPException(status_code=400, detail='hourly forecasts cover at most 14 days')
+    return MemoryService().forecast(db, user_id, days, bucket)
+
+
+@app.get('/api/v1/learning/forecast')
+def get_learning_forecast(days: int = Query(7, ge=1, le=FORECAST_DAYS_MAX), bucket: str = Query('day', pattern='^(day|hour)$'), current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    return _forecast(db, current_user.id, days, bucket)
 
 
 @app.post('/api/v1/learning/progress', response_model=ProgressOut)
-def post_learning_progress(payload: ProgressIn, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def post_learning_progress(payload: ProgressIn, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     user_id = current_user.id
     word_id = payload.word_id
     performance = payload.performance
@@ -133,3 +243,60 @@ def post_learning_progress(payload: ProgressIn, current_user: models.User = Depe
     ms = MemoryService()
     res = ms.update_progress(db, user_id, word_id, performance)
     return {'next_review': res['next_review'], 'interval_hours': res['interval_hours']}
+
+
+@app.post('/api/v1/learning/progress/batch', response_model=BatchProgressOut)
+def post_learning_progress_batch(payload: BatchProgressIn, current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
+    if len(payload.reviews) > LEARNING_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f'at most {LEARNING_BATCH_MAX} reviews per batch')
+    if any(not r.word_id for r in payload.reviews):
+        raise HTTPException(status_code=400, detail='word_id required')
+    ms = MemoryService()
+    reviews = [
+        {'review_id': r.review_id, 'word_id': r.word_id, 'performance': r.performance, 'reviewed_at': r.reviewed_at}
+        for r in payload.reviews
+    ]
+    results = ms.apply_reviews(db, current_user.id, reviews)
+    return {'results': results}
+
+
+@app.get('/api/v1/admin/ocr-cache')
+def get_ocr_cache_stats(_: bool = Depends(require_admin), db: Session = Depends(get_db)):
+    return OCRCache().stats(db)
+
+
+@app.get('/api/v1/admin/plan-cache')
+def get_plan_cache_stats(_: bool = Depends(require_admin)):
+    cache = get_plan_cache()
+    return cache.info() if cache is not None else {'backend': 'off'}
+
+
+@app.get('/api/v1/admin/forecast')
+def get_system_forecast(days: int = Query(7, ge=1, le=FORECAST_DAYS_MAX), bucket: str = Query('day', pattern='^(day|hour)$'), _: bool = Depends(require_admin), db: Session = Depends(get_db)):
+    # review workload across all users, for capacity dashboards
+    return _forecast(db, None, days, bucket)
+
+
+@app.get('/api/v1/admin/auth-cache')
+def get_auth_cache_stats(_: bool = Depends(require_admin)):
+    return auth_cache_stats()
+
+
+@app.get('/api/v1/admin/schema')
+def get_schema_status(_: bool = Depends(require_admin)):
+    return get_schema_manager().status()
+
+
+@app.get('/api/v1/admin/db-pool')
+def get_db_pool_stats(_: bool = Depends(require_admin)):
+    # checkout waits and saturation of the engines' pools
+    stats = pool_metrics()
+    if async_engine() is not None:
+        stats['async'] = pool_metrics(async_engine().sync_engine)
+    return stats
+
+
+@app.get('/api/v1/admin/ocr-transfer')
+def get_ocr_transfer_stats(_: bool = Depends(require_admin)):
+    from .preprocess import stats
+    return stats.as_dict()
@@ -1,9 +1,10 @@
 import uuid
 from datetime import datetime
-from sqlalchemy import Column, String, Integer, DateTime, ForeignKey, Text, Float, Boolean
+from sqlalchemy import Column, String, Integer, Date, DateTime, ForeignKey, Text, Float, Boolean, UniqueConstraint, Index
 from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import relationship
 from .db import Base
+from .ids import CompactUUID, new_id
 
 class User(Base):
     __tablename__ = 'users'
@@ -20,14 +21,20 @@ class Upload(Base):
     user_id = Column(String, ForeignKey('users.id', ondelete='SET NULL'))
     filename = Column(Text)
     storage_path = Column(Text)
-    status = Column(String(20), default='pending')
+    # sha256 of the file contents; storage_path points at the shared blob
+    content_hash = Column(String(64))
+    size_bytes = Column(Integer)
+    # multi-page documents report progress while OCR is still running
+    pages_total = Column(Integer)
+    pages_done = Column(Integer, default=0)
+    status = Column(String(20), default='pending', index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     processed_at = Column(DateTime)
 
 class OCRResult(Base):
     __tablename__ = 'ocr_results'
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
-    upload_id = Column(String, ForeignKey('uploads.id', ondelete='CASCADE'))
+    upload_id = Column(String, ForeignKey('uploads.id', ondelete='CASCADE'), index=True)
     raw_json = Column(Text)
     plain_text = Column(Text)
     # store as comma-separated string to avoid Postgres ARRAY requirement in sqlite
@@ -47,7 +54,7 @@ class Word(Base):
 
 class UserWord(Base):
     __tablename__ = 'user_words'
-    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(CompactUUID, primary_key=True, default=new_id)
     user_id = Column(String, ForeignKey('users.id', ondelete='CASCADE'))
     word_id = Column(String, ForeignKey('words.id', ondelete='CASCADE'))
     added_at = Column(DateTime, default=datetime.utcnow)
@@ -56,4 +63,87 @@ class UserWord(Base):
     next_review_at = Column(DateTime)
     ease_factor = Column(Float, default=2.5)
     interval_hours = Column(Float, default=0.0)
-    performance_history = Column(Text)  # JSON string
+    performance_history = Column(Text)  # legacy JSON string; history lives in review_events
+    # performance of the latest review, so schedules can be recomputed
+    last_performance = Column(Float)
+    # review_events folded in by compaction (see review_log.compact)
+    history_reviews = Column(Integer, default=0)
+    history_lapses = Column(Integer, default=0)
+    history_performance_sum = Column(Float, default=0.0)
+    history_compacted_until = Column(DateTime)
+    __table_args__ = (
+        # plan pages: WHERE user_id = ? AND (next_review_at, id) > (?, ?)
+        # ORDER BY next_review_at, id; id breaks ties among cards added together
+        Index('ix_user_words_user_next_review_id', 'user_id', 'next_review_at', 'id'),
+        # one row per user and word; upserts conflict on it
+        Index('uq_user_words_user_word', 'user_id', 'word_id', unique=True),
+    )
+
+class OCRCacheEntry(Base):
+    __tablename__ = 'ocr_cache'
+    __table_args__ = (UniqueConstraint('content_hash', 'model', name='uq_ocr_cache_hash_model'),)
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    content_hash = Column(String(64), nullable=False)
+    model = Column(String(100), nullable=False)
+    raw_json = Column(Text)
+    words = Column(Text)
+    count = Column(Integer)
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_hit_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class OCRJob(Base):
+    __tablename__ = 'ocr_jobs'
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    upload_id = Column(String, ForeignKey('uploads.id', ondelete='CASCADE'), index=True)
+    # queued -> processing -> done | error (stale processing jobs go back to queued)
+    status = Column(String(20), default='queued', nullable=False)
+    attempts = Column(Integer, default=0)
+    worker_id = Column(String(100))
+    lease_expires_at = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index('ix_ocr_jobs_status_created_at', 'status', 'created_at'),)
+
+class ReviewReceipt(Base):
+    # one row per client-supplied review id, so retried batches are not applied twice
+    __tablename__ = 'review_receipts'
+    user_id = Column(String, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    review_id = Column(String(64), primary_key=True)
+    word_id = Column(String, ForeignKey('words.id', ondelete='CASCADE'))
+    next_review_at = Column(DateTime)
+    interval_hours = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class ReviewEvent(Base):
+    # append-only review history; on Postgres range-partitioned by month on
+    # reviewed_at, which is why it is part of the primary key
+    __tablename__ = 'review_events'
+    id = Column(CompactUUID, primary_key=True, default=new_id)
+    reviewed_at = Column(DateTime, primary_key=True, default=datetime.utcnow)
+    user_id = Column(String, nullable=False)
+    word_id = Column(String, nullable=False)
+    performance = Column(Float)
+    interval_before = Column(Float)
+    interval_after = Column(Float)
+    review_count = Column(Integer)
+    __table_args__ = (
+        Index('ix_review_events_user_word_reviewed_at', 'user_id', 'word_id', 'reviewed_at'),
+        Index('ix_review_events_reviewed_at', 'reviewed_at'),
+    )
+
+class StudySession(Base):
+    # a user's first plan page of the day, built overnight by backend.app.sessions.
+    # version is bumped by every change to the user's due queue (it is also
+    # the prefetch ETag); the stored session is only valid while
+    # built_version still matches it.
+    __tablename__ = 'study_sessions'
+    user_id = Column(String, ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    built_version = Column(Integer)
+    session_date = Column(Date)
+    built_at = Column(DateTime)
+    card_count = Column(Integer)
+    complete = Column(Boolean)
+    items = Column(Text)
@@ -0,0 +1,140 @@
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from . import models
+
+
+class OCRCache:
+    """Persistent cache of OCR results keyed by (content hash, model).
+
+    Entries live in the ``ocr_cache`` table so every API/worker process
+    shares them. Entries older than the TTL are ignored and purged, and the
+    table is trimmed to ``max_entries`` by least-recent hit.
+    """
+
+    # process-wide counters, shared by every OCRCache instance
+    _lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+    _puts = 0
+
+    def __init__(self, ttl_hours: float = None, max_entries: int = None):
+        try:
+            self.ttl_hours = ttl_hours or float(os.getenv('OCR_CACHE_TTL_HOURS', str(24 * 30)))
+        except Exception:
+            self.ttl_hours = 24.0 * 30
+        try:
+            self.max_entries = max_entries or int(os.getenv('OCR_CACHE_MAX_ENTRIES', '100000'))
+        except Exception:
+            self.max_entries = 100000
+        try:
+            self.evict_every = int(os.getenv('OCR_CACHE_EVICT_EVERY', '100'))
+        except Exception:
+            self.evict_every = 100
+
+    @classmethod
+    def _count(cls, name: str):
+        with cls._lock:
+            setattr(cls, name, getattr(cls, name) + 1)
+            return getattr(cls, name)
+
+    def _expired_before(self) -> datetime:
+        return datetime.utcnow() - timedelta(hours=self.ttl_hours)
+
+    def get(self, db: Session, content_hash: Optional[str], model: str) -> Optional[models.OCRCacheEntry]:
+        model = str(model)
+        if not content_hash:
+            self._count('_misses')
+            return None
+        entry = (
+            db.query(models.OCRCacheEntry)
+            .filter(models.OCRCacheEntry.content_hash == content_hash, models.OCRCacheEntry.model == model)
+            .first()
+        )
+        if entry is None or entry.created_at < self._expired_before():
+            self._count('_misses')
+            return None
+        entry.hits = (entry.hits or 0) + 1
+        entry.last_hit_at = datetime.utcnow()
+        db.commit()
+        self._count('_hits')
+        return entry
+
+    @staticmethod
+    def result(entry: models.OCRCacheEntry) -> Dict:
+        """The OCR result dict a cache entry was stored from."""
+        words = entry.words.split(',') if entry.words else []
+        try:
+            raw = json.loads(entry.raw_json) if entry.raw_json is not None else None
+        except ValueError:
+            # entries written before raw_json held JSON
+            raw = entry.raw_json
+        return {'words': words, 'count': entry.count or len(words), 'raw_result': raw}
+
+    def put(self, db: Session, content_hash: Optional[str], model: str, result: Dict):
+        if not content_hash:
+            return
+        model = str(model)
+        words = result.get('words', [])
+        entry = models.OCRCacheEntry(
+            content_hash=content_hash,
+            model=model,
+            raw_json=json.dumps(result.get('raw_result'), default=str),
+            words=','.join(words),
+            count=result.get('count', len(words)),
+        )
+        db.query(models.OCRCacheEntry).filter(
+            models.OCRCacheEntry.content_hash == content_hash,
+            models.OCRCacheEntry.model == model,
+            models.OCRCacheEntry.created_at < self._expired_before(),
+        ).delete(synchronize_session=False)
+        db.add(entry)
+        try:
+            db.commit()
+        except IntegrityError:
+            # another worker cached the same content first
+            db.rollback()
+            return
+        if self._count('_puts') % self.evict_every == 0:
+            self.evict(db)
+
+    def evict(self, db: Session) -> int:
+        removed = db.query(models.OCRCacheEntry).filter(
+            models.OCRCacheEntry.created_at < self._expired_before()
+        ).delete(synchronize_session=False)
+        total = db.query(func.count(models.OCRCacheEntry.id)).scalar() or 0
+        overflow = total - self.max_entries
+        if overflow > 0:
+            stale_ids = [
+                r.id for r in db.query(models.OCRCacheEntry.id)
+                .order_by(models.OCRCacheEntry.last_hit_at)
+                .limit(overflow)
+            ]
+            removed += db.query(models.OCRCacheEntry).filter(
+                models.OCRCacheEntry.id.in_(stale_ids)
+            ).delete(synchronize_session=False)
+        db.commit()
+        return removed
+
+    def stats(self, db: Session) -> Dict:
+        entries, total_hits = db.query(
+            func.count(models.OCRCacheEntry.id), func.coalesce(func.sum(models.OCRCacheEntry.hits), 0)
+        ).one()
+        lookups = self._hits + self._misses
+        return {
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl_hours': self.ttl_hours,
+            'process_hits': self._hits,
+            'process_misses': self._misses,
+            'process_hit_rate': (self._hits / lookups) if lookups else 0.0,
+            # every hit is one Gemini call we did not pay for
+            'total_hits': int(total_hits),
+        }
@@ -1,103 +1,217 @@
 import os
-import requests
-import re
-import base64
 import time
-from typing import Dict
+import queue
+import asyncio
+import logging
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from .gemini_client import GeminiError, GeminiRejected, shared_client, run_sync, submit
+from . import pdf
+from . import preprocess
+from .extraction import WordExtractor, iter_text_fields
+
+logger = logging.getLogger('wordmem.ocr')
+
+_PIPELINE_DONE = object()
 
 
 class OCRService:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, preprocess_images: bool = None):
         # Allow passing an explicit API key (useful for tests).
         # If not provided, read from env. Don't raise here so tests can
         # instantiate and monkeypatch methods without needing env vars.
         self.api_key = api_key or os.getenv('GEMINI_API_KEY', '')
         self.disabled = not bool(self.api_key)
         self.model = os.getenv('GEMINI_MODEL', 'gemini-image-1')
-        self.url = f'https://generativelanguage.googleapis.com/v1/models/{self.model}:predict'
-        # retry settings
-        try:
-            self.max_attempts = int(os.getenv('GEMINI_MAX_ATTEMPTS', '3'))
-        except Exception:
-            self.max_attempts = 3
-        try:
-            self.base_timeout = float(os.getenv('GEMINI_TIMEOUT', '30'))
-        except Exception:
-            self.base_timeout = 30.0
+        self.url = os.getenv('GEMINI_OCR_ENDPOINT') or f'https://generativelanguage.googleapis.com/v1/models/{self.model}:predict'
+        self._client = None
+        # OCR_PREPROCESS=0 sends images as uploaded (for A/B comparisons)
+        self.preprocess = preprocess.preprocess_enabled() if preprocess_images is None else preprocess_images
+        self.extractor = WordExtractor()
 
-    def _call_gemini(self, image_path: str) -> Dict:
+    @property
+    def client(self):
+        # Created lazily: retries, timeouts and the in-flight cap come from
+        # GEMINI_* env vars (see gemini_client.GeminiClient).
+        if self._client is None:
+            self._client = shared_client(self.api_key, self.url)
+        return self._client
+
+    INSTRUCTIONS = 'Extract the textual content from the image and return plain text.'
+
+    def _load(self, source: Union[str, bytes]) -> Tuple[bytes, Dict]:
+        """Read an image (path or bytes) and, when enabled, shrink it."""
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                data = f.read()
+        else:
+            data = source
+        if not self.preprocess:
+            return data, {'bytes_in': len(data), 'bytes_out': len(data), 'preprocessed': False, 'preprocess_seconds': 0.0}
+        return preprocess.prepare_image(data)
+
+    def _transfer_report(self, info: Dict, request_seconds: float, body_bytes: int) -> Dict:
+        sent = preprocess.b64_len(info['bytes_out'])
+        unprocessed = preprocess.b64_len(info['bytes_in'])
+        # estimate what the original payload would have cost at the
+        # throughput this request actually achieved
+        rate = body_bytes / request_seconds if request_seconds > 0 else 0
+        upload_saved = (unprocessed - sent) / rate if rate else 0.0
+        report = {
+            'preprocessed': info['preprocessed'],
+            'bytes_in': info['bytes_in'],
+            'bytes_sent': sent,
+            'preprocess_ms': round(info['preprocess_seconds'] * 1000, 1),
+            'request_ms': round(request_seconds * 1000, 1),
+            'est_time_saved_ms': round((upload_saved - info['preprocess_seconds']) * 1000, 1),
+        }
+        preprocess.stats.record(info['bytes_in'], sent, info['preprocess_seconds'], request_seconds)
+        logger.info('ocr transfer: %s', report)
+        return report
+
+    async def _request(self, loaded: List[Tuple[bytes, Dict]]) -> Tuple[Dict, List[Dict]]:
         if self.disabled:
             raise RuntimeError('GEMINI_API_KEY must be set')
-        with open(image_path, 'rb') as f:
-            b64 = base64.b64encode(f.read()).decode('utf-8')
-
         # Construct a minimal request payload. Adjust to match the exact Generative API schema if needed.
-        payload = {
-            'instances': [
-                {
-                    'image': {
-                        'image_bytes': b64
-                    },
-                    'instructions': 'Extract the textual content from the image and return plain text.'
-                }
-            ]
-        }
+        make_iter, length = preprocess.stream_instances([data for data, _ in loaded], self.INSTRUCTIONS)
+        started = time.perf_counter()
+        resp = await self.client.predict(content=make_iter, content_length=length)
+        elapsed = time.perf_counter() - started
+        return resp, [self._transfer_report(info, elapsed, length) for _, info in loaded]
 
-        params = {}
-        headers = {}
-        # If the key looks like an API key (AIza...), send as query param; otherwise try Bearer token.
-        if self.api_key.startswith('AIza'):
-            params['key'] = self.api_key
-        else:
-            headers['Authorization'] = f'Bearer {self.api_key}'
+    async def _call_gemini_async(self, image_path: str) -> Dict:
+        if self.disabled:
+            raise RuntimeError('GEMINI_API_KEY must be set')
+        # pre-processing is CPU bound: keep it off the shared event loop
+        loaded = await asyncio.to_thread(self._load, image_path)
+        resp, _ = await self._request([loaded])
+        return resp
 
-        last_exc = None
-        for attempt in range(1, self.max_attempts + 1):
-            try:
-                resp = requests.post(self.url, params=params, headers=headers, json=payload, timeout=self.base_timeout)
-                resp.raise_for_status()
-                try:
-                    return resp.json()
-                except ValueError:
-                    # Non-JSON response
-                    return {'_raw_text': resp.text}
-            except requests.RequestException as e:
-                last_exc = e
-                # exponential backoff with jitter
-                if attempt < self.max_attempts:
-                    sleep_for = (2 ** (attempt - 1)) + (0.1 * attempt)
-                    time.sleep(sleep_for)
-                    continue
-                # exhausted retries
-                raise RuntimeError(f'Gemini API request failed after {self.max_attempts} attempts: {e}')
+    def _call_gemini(self, image_path: str) -> Dict:
+        # Synchronous callers (worker threads) hand the request to the shared
+        # event loop so they all reuse one pooled connection.
+        return run_sync(self._call_gemini_async(image_path))
 
     def _extract_text_from_response(self, resp_json: Dict) -> str:
-        texts = []
+        return '\n'.join(iter_text_fields(resp_json))
+
+    async def _batch_loaded(self, loaded: List[Tuple[bytes, Dict]]) -> List[Tuple[Union[Dict, Exception], Optional[Dict]]]:
+        """Send several images as one multi-instance request.
 
-        def walk(obj):
-            if isinstance(obj, str):
-                texts.append(obj)
-            elif isinstance(obj, dict):
-                for v in obj.values():
-                    walk(v)
-            elif isinstance(obj, list):
-                for v in obj:
-                    walk(v)
+        Returns one ``(response_or_exception, transfer_report)`` per image,
+        where a response holds that image's single prediction. A rejected
+        batch is split in halves so one bad page only fails itself.
+        """
+        try:
+            resp, reports = await self._request(loaded)
+        except GeminiRejected as e:
+            if len(loaded) == 1:
+                return [(e, None)]
+            mid = len(loaded) // 2
+            return await self._batch_loaded(loaded[:mid]) + await self._batch_loaded(loaded[mid:])
+        except Exception as e:
+            return [(e, None)] * len(loaded)
+
+        if len(loaded) == 1:
+            return [(resp, reports[0])]
+        predictions = resp.get('predictions') if isinstance(resp, dict) else None
+        if not isinstance(predictions, list) or len(predictions) != len(loaded):
+            # Can't demultiplex reliably: fall back to one request per page.
+            return [r for item in loaded for r in await self._batch_loaded([item])]
+        out = []
+        for pred, report in zip(predictions, reports):
+            if isinstance(pred, dict) and pred.get('error'):
+                out.append((GeminiError(f'prediction failed: {pred.get("error")}'), report))
+            else:
+                out.append(({'predictions': [pred]}, report))
+        return out
 
-        walk(resp_json)
-        return '\n'.join(texts)
+    async def _call_gemini_batch_async(self, image_paths: List[str]) -> List[Tuple[Union[Dict, Exception], Optional[Dict]]]:
+        if self.disabled:
+            raise RuntimeError('GEMINI_API_KEY must be set')
+        loaded = [await asyncio.to_thread(self._load, p) for p in image_paths]
+        return await self._batch_loaded(loaded)
+
+    def _result_from_response(self, result: Dict) -> Dict:
+        # lemmas in first-seen order, stopwords dropped
+        counts = self.extractor.extract_response(result)
+        return {
+            'raw_result': result,
+            'words': list(counts),
+            'counts': counts,
+            'count': len(counts),
+        }
+
+    def _with_transfer(self, resp: Dict, report: Optional[Dict]) -> Dict:
+        result = self._result_from_response(resp)
+        if report is not None:
+            result['transfer'] = report
+        return result
 
     def process_document(self, file_path: str) -> Dict:
         try:
-            result = self._call_gemini(file_path)
+            [(result, report)] = run_sync(self._call_gemini_batch_async([file_path]))
         except Exception:
             raise
+        if isinstance(result, Exception):
+            raise result
 
-        raw_text = self._extract_text_from_response(result)
-        words = re.findall(r"\b[A-Za-z]+\b", raw_text)
-        english_words = list({w.lower() for w in words if len(w) > 2})
-        return {
-            'raw_result': result,
-            'words': english_words,
-            'count': len(english_words),
-        }
+        return self._with_transfer(result, report)
+
+    def process_batch(self, file_paths: List[str]) -> List[Union[Dict, Exception]]:
+        """OCR several documents in one round trip; per-item errors are
+        returned in place rather than raised."""
+        responses = run_sync(self._call_gemini_batch_async(file_paths))
+        return [r if isinstance(r, Exception) else self._with_transfer(r, report) for r, report in responses]
+
+    async def _pdf_pipeline(self, pdf_path: str, out: queue.Queue, concurrency: int):
+        sem = asyncio.Semaphore(concurrency)
+        pages = pdf.iter_pages(pdf_path)
+        tasks = set()
+
+        async def one(index: int, png: bytes):
+            try:
+                loaded = await asyncio.to_thread(self._load, png)
+                resp, reports = await self._request([loaded])
+                outcome = self._with_transfer(resp, reports[0])
+            except Exception as e:
+                outcome = e
+            finally:
+                sem.release()
+            out.put((index, outcome))
+
+        try:
+            while True:
+                # Only render the next page once a request slot is free, so at
+                # most `concurrency` rendered pages are held in memory.
+                await sem.acquire()
+                item = await asyncio.to_thread(next, pages, None)
+                if item is None:
+                    sem.release()
+                    break
+                tasks.add(asyncio.create_task(one(*item)))
+            await asyncio.gather(*tasks)
+        finally:
+            pages.close()
+            out.put(_PIPELINE_DONE)
+
+    def process_pdf(self, pdf_path: str, concurrency: int = None) -> Iterator[Tuple[int, Union[Dict, Exception]]]:
+        """OCR a PDF page by page, yielding ``(page_index, result)`` in
+        completion order. Up to OCR_PDF_CONCURRENCY pages are in flight;
+        a failed page yields its exception instead of aborting the rest."""
+        if self.disabled:
+            raise RuntimeError('GEMINI_API_KEY must be set')
+        if concurrency is None:
+            try:
+                concurrency = int(os.getenv('OCR_PDF_CONCURRENCY', '4'))
+            except Exception:
+                concurrency = 4
+        out = queue.Queue()
+        fut = submit(self._pdf_pipeline(pdf_path, out, max(1, concurrency)))
+        while True:
+            item = out.get()
+            if item is _PIPELINE_DONE:
+                break
+            yield item
+        # surface pipeline-level failures (e.g. unreadable PDF)
+        fut.result()
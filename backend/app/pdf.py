@@ -0,0 +1,40 @@
+import os
+from typing import Iterator, Tuple
+
+
+def _pymupdf():
+    # PyMuPDF is only needed for PDF uploads; import lazily so image-only
+    # deployments (and tests) don't require it.
+    try:
+        import pymupdf
+    except ImportError:
+        raise RuntimeError('PyMuPDF is required for PDF uploads (pip install pymupdf)')
+    return pymupdf
+
+
+def is_pdf(path: str) -> bool:
+    try:
+        with open(path, 'rb') as f:
+            return f.read(5) == b'%PDF-'
+    except OSError:
+        return False
+
+
+def page_count(path: str) -> int:
+    # Opening a document only parses the xref table; no page is rendered.
+    with _pymupdf().open(path) as doc:
+        return doc.page_count
+
+
+def iter_pages(path: str, dpi: int = None) -> Iterator[Tuple[int, bytes]]:
+    """Yield ``(page_index, png_bytes)`` one page at a time, rendering each
+    page only when the consumer asks for it."""
+    if dpi is None:
+        try:
+            dpi = int(os.getenv('OCR_PDF_DPI', '150'))
+        except Exception:
+            dpi = 150
+    with _pymupdf().open(path) as doc:
+        for i in range(doc.page_count):
+            pix = doc.load_page(i).get_pixmap(dpi=dpi)
+            yield i, pix.tobytes('png')
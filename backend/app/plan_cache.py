@@ -0,0 +1,508 @@
+import os
+import base64
+import heapq
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from . import models
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+WORD_FIELDS = ('lemma', 'definition', 'pronunciation', 'example')
+
+
+def _plan(item) -> Dict:
+    ts, _, word_id, interval_hours, review_count, info = item
+    plan = {'word_id': word_id, 'next_review': ts, 'interval_hours': interval_hours, 'review_count': review_count}
+    plan.update(info or dict.fromkeys(WORD_FIELDS))
+    return plan
+
+
+def encode_cursor(item) -> str:
+    """Opaque keyset cursor for the card after ``item``: its
+    ``(next_review_at, user_words.id)``."""
+    raw = json.dumps([item[0].isoformat(), item[1]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str):
+    """Inverse of ``encode_cursor``; raises ValueError on garbage."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        ts, uw_id = json.loads(raw)
+        return datetime.fromisoformat(ts), str(uw_id)
+    except Exception:
+        raise ValueError('invalid cursor')
+
+
+class _Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fills = 0
+        self.updates = 0
+        self.invalidations = 0
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits / lookups) if lookups else 0.0,
+            'fills': self.fills,
+            'updates': self.updates,
+            'invalidations': self.invalidations,
+        }
+
+
+class _UserQueue:
+    """The earliest ``user_words`` of one user as a min-heap ordered like
+    the plan query, on ``(next_review_at, id)``. Items are ``(next_review_at,
+    user_word_id, word_id, interval_hours, review_count, word_info)``.
+    Rescheduled cards are pushed again and their old heap item is skipped
+    (lazy deletion via ``current``, keyed by word id).
+
+    When the user has more rows than were loaded, ``horizon`` is the last
+    loaded ``(next_review_at, id)``: every row not in the heap sorts after
+    it, so the heap can only answer for times before it.
+    """
+
+    def __init__(self, rows, horizon: Optional[tuple], expires_at: float):
+        self.heap = []
+        self.current = {}
+        for item in rows:
+            self.current[item[2]] = item
+            self.heap.append(item)
+        heapq.heapify(self.heap)
+        self.horizon = horizon
+        self.expires_at = expires_at
+
+    def push(self, item):
+        word_id = item[2]
+        if self.horizon is not None and item[:2] >= self.horizon:
+            # beyond what we hold; unloaded rows may come first
+            self.current.pop(word_id, None)
+            return
+        old = self.current.get(word_id)
+        if item[5] is None and old is not None:
+            # reviews don't carry the word itself; keep what was loaded
+            item = item[:5] + (old[5],)
+        self.current[word_id] = item
+        heapq.heappush(self.heap, item)
+        if len(self.heap) > 2 * len(self.current) + 64:
+            self.heap = list(self.current.values())
+            heapq.heapify(self.heap)
+
+    def due(self, now: datetime, limit: int) -> Optional[List]:
+        stale = len(self.heap) - len(self.current)
+        out = []
+        for item in heapq.nsmallest(limit + stale, self.heap):
+            if self.current.get(item[2]) is not item:
+                continue
+            if item[0] > now or len(out) == limit:
+                return out
+            if item[5] is None:
+                # a card first seen through a review; reload to get its word
+                return None
+            out.append(item)
+        if len(out) < limit and self.horizon is not None and self.horizon[0] <= now:
+            # more may be due among the rows we did not load
+            return None
+        return out
+
+
+class LocalPlanCache:
+    """In-process due-queue cache, LRU over users with a TTL per user."""
+
+    def __init__(self, max_users: int = None, ttl_seconds: float = None, per_user: int = None):
+        self.max_users = max_users or _env_int('PLAN_CACHE_MAX_USERS', 10000)
+        self.ttl_seconds = ttl_seconds or _env_float('PLAN_CACHE_TTL_SECONDS', 300.0)
+        self.per_user = per_user or _env_int('PLAN_CACHE_PER_USER', 200)
+        self.stats = _Stats()
+        self._lock = threading.Lock()
+        self._users: 'OrderedDict[str, _UserQueue]' = OrderedDict()
+        # write generations by user hash bucket: a fill computed from a
+        # read that raced with a write is dropped instead of cached
+        self._gens = [0] * 1024
+
+    def _bucket(self, user_id: str) -> int:
+        return hash(user_id) % len(self._gens)
+
+    def _now(self) -> float:
+        return time.monotonic()
+
+    def token(self, user_id: str):
+        return self._gens[self._bucket(user_id)]
+
+    def due(self, user_id: str, now: datetime, limit: int) -> Optional[List]:
+        with self._lock:
+            q = self._users.get(user_id)
+            if q is not None and q.expires_at <= self._now():
+                del self._users[user_id]
+                q = None
+            items = q.due(now, limit) if q is not None else None
+            if items is not None:
+                self._users.move_to_end(user_id)
+        if items is None:
+            self.stats.count('misses')
+            return None
+        self.stats.count('hits')
+        return items
+
+    def fill(self, user_id: str, rows: List, complete: bool, token) -> None:
+        horizon = None if complete or not rows else rows[-1][:2]
+        with self._lock:
+            if self._gens[self._bucket(user_id)] != token:
+                return
+            self._users[user_id] = _UserQueue(rows, horizon, self._now() + self.ttl_seconds)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        self.stats.count('fills')
+
+    def update(self, user_id: str, items: List) -> None:
+        with self._lock:
+            self._gens[self._bucket(user_id)] += 1
+            q = self._users.get(user_id)
+            if q is not None:
+                for item in items:
+                    q.push(item)
+        self.stats.count('updates', len(items))
+
+    def invalidate(self, user_id: str) -> None:
+        with self._lock:
+            self._gens[self._bucket(user_id)] += 1
+            self._users.pop(user_id, None)
+        self.stats.count('invalidations')
+
+    def info(self) -> Dict:
+        return {'backend': 'local', 'users': len(self._users), 'max_users': self.max_users,
+                'ttl_seconds': self.ttl_seconds, 'per_user': self.per_user, **self.stats.as_dict()}
+
+
+_EPOCH = datetime(1970, 1, 1)
+_US = timedelta(microseconds=1)
+
+
+def _score(ts: datetime) -> int:
+    # whole microseconds: exact as a Redis (double) score until 2255, so
+    # next_review_at and the cursors built from it round-trip unchanged
+    return (ts - _EPOCH) // _US
+
+
+def _from_score(score) -> datetime:
+    return _EPOCH + int(score) * _US
+
+
+class RedisPlanCache:
+    """Due queues in Redis, shared by all API and worker processes.
+
+    Per user: a sorted set ``plan:v2:{id}`` of user_word ids scored by
+    next review time in microseconds since the epoch (equal scores sort by
+    member, matching the plan query's ``(next_review_at, id)`` order), a
+    hash ``plan:v2:{id}:d`` with each card's word id, interval, review
+    count and word, a ``plan:v2:{id}:horizon`` key that marks the entry as
+    loaded, and a ``plan:v2:{id}:gen`` write counter that guards fills
+    against races.
+    LRU eviction is left to Redis (``maxmemory-policy allkeys-lru``).
+    """
+
+    def __init__(self, url: str, ttl_seconds: float = None, per_user: int = None):
+        import redis
+        self.r = redis.Redis.from_url(url)
+        self.ttl_seconds = int(ttl_seconds or _env_float('PLAN_CACHE_TTL_SECONDS', 300.0))
+        self.per_user = per_user or _env_int('PLAN_CACHE_PER_USER', 200)
+        self.stats = _Stats()
+
+    @staticmethod
+    def _keys(user_id: str):
+        # v2: scores in microseconds (v1 entries held float seconds)
+        base = f'plan:v2:{user_id}'
+        return base, base + ':d', base + ':horizon'
+
+    @staticmethod
+    def _gen(user_id: str):
+        return f'plan:v2:{user_id}:gen'
+
+    @staticmethod
+    def _horizon(raw):
+        if raw == b'inf':
+            return None
+        score, uw_id = json.loads(raw)
+        return score, uw_id
+
+    def token(self, user_id: str):
+        return self.r.get(self._gen(user_id))
+
+    def due(self, user_id: str, now: datetime, limit: int) -> Optional[List]:
+        zkey, dkey, hkey = self._keys(user_id)
+        p = self.r.pipeline(transaction=True)
+        p.get(hkey)
+        p.zrangebyscore(zkey, '-inf', _score(now), start=0, num=limit, withscores=True)
+        horizon, members = p.execute()
+        if horizon is None:
+            self.stats.count('misses')
+            return None
+        horizon = self._horizon(horizon)
+        if len(members) < limit and horizon is not None and horizon[0] <= _score(now):
+            self.stats.count('misses')
+            return None
+        details = self.r.hmget(dkey, [m for m, _ in members]) if members else []
+        out = []
+        for (member, score), detail in zip(members, details):
+            if detail is None:
+                continue
+            word_id, interval, count, info = json.loads(detail)
+            if info is None:
+                self.stats.count('misses')
+                return None
+            out.append((_from_score(score), member.decode(), word_id, interval, count, info))
+        self.stats.count('hits')
+        return out
+
+    def fill(self, user_id: str, rows: List, complete: bool, token) -> None:
+        import redis
+        zkey, dkey, hkey = self._keys(user_id)
+        horizon = 'inf' if complete or not rows else json.dumps([_score(rows[-1][0]), rows[-1][1]])
+        with self.r.pipeline(transaction=True) as p:
+            try:
+                p.watch(self._gen(user_id))
+                if p.get(self._gen(user_id)) != token:
+                    return
+                p.multi()
+                p.delete(zkey, dkey)
+                if rows:
+                    p.zadd(zkey, {uw_id: _score(ts) for ts, uw_id, *_ in rows})
+                    p.hset(dkey, mapping={
+                        uw_id: json.dumps([word_id, interval, count, info])
+                        for _, uw_id, word_id, interval, count, info in rows
+                    })
+                p.set(hkey, horizon)
+                for key in (zkey, dkey, hkey):
+                    p.expire(key, self.ttl_seconds)
+                p.execute()
+            except redis.WatchError:
+                return
+        self.stats.count('fills')
+
+    def update(self, user_id: str, items: List) -> None:
+        zkey, dkey, hkey = self._keys(user_id)
+        self.r.incr(self._gen(user_id))
+        horizon = self.r.get(hkey)
+        if horizon is None:
+            return
+        horizon = self._horizon(horizon)
+        # keep the word info loaded with the queue
+        existing = self.r.hmget(dkey, [item[1] for item in items])
+        p = self.r.pipeline(transaction=True)
+        for (ts, uw_id, word_id, interval, count, info), old in zip(items, existing):
+            if horizon is not None and (_score(ts), uw_id) >= tuple(horizon):
+                p.zrem(zkey, uw_id)
+                p.hdel(dkey, uw_id)
+            else:
+                if info is None and old is not None:
+                    info = json.loads(old)[3]
+                p.zadd(zkey, {uw_id: _score(ts)})
+                p.hset(dkey, uw_id, json.dumps([word_id, interval, count, info]))
+        p.execute()
+        self.stats.count('updates', len(items))
+
+    def invalidate(self, user_id: str) -> None:
+        self.r.incr(self._gen(user_id))
+        self.r.delete(*self._keys(user_id))
+        self.stats.count('invalidations')
+
+    def info(self) -> Dict:
+        return {'backend': 'redis', 'ttl_seconds': self.ttl_seconds, 'per_user': self.per_user,
+                **self.stats.as_dict()}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_plan_cache():
+    """Process-wide plan cache: PLAN_CACHE_BACKEND=local (default), redis
+    (REDIS_URL) or off."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            backend = os.getenv('PLAN_CACHE_BACKEND', 'local')
+            if backend == 'redis':
+                _cache = RedisPlanCache(os.getenv('REDIS_URL', 'redis://localhost:6379/0'))
+            elif backend == 'off':
+                _cache = False
+            else:
+                _cache = LocalPlanCache()
+        return _cache or None
+
+
+def _query(db: Session, user_id: str):
+    UW, W = models.UserWord, models.Word
+    return (
+        db.query(UW.next_review_at, UW.id, UW.word_id, UW.interval_hours, UW.review_count,
+                 W.lemma, W.definition, W.pronunciation, W.example)
+        .join(W, W.id == UW.word_id)
+        .filter(UW.user_id == user_id, UW.next_review_at.isnot(None))
+        .order_by(UW.next_review_at, UW.id)
+    )
+
+
+def _item(row):
+    return tuple(row[:5]) + (dict(zip(WORD_FIELDS, row[5:])),)
+
+
+def pack_items(items) -> str:
+    """Items as compact JSON for ``study_sessions.items``."""
+    return json.dumps([
+        [ts.isoformat(), uw_id, word_id, interval, count, *(info[f] for f in WORD_FIELDS)]
+        for ts, uw_id, word_id, interval, count, info in items
+    ], separators=(',', ':'))
+
+
+def unpack_items(raw: str) -> List:
+    return [
+        (datetime.fromisoformat(r[0]), r[1], r[2], r[3], r[4], dict(zip(WORD_FIELDS, r[5:])))
+        for r in json.loads(raw)
+    ]
+
+
+def _stored_session(db: Session, user_id: str, now: datetime):
+    # today's precomputed first rows, unless a review or new word came since
+    s = db.get(models.StudySession, user_id)
+    if s is None or s.items is None or s.built_version != s.version or s.session_date != now.date():
+        return None
+    return unpack_items(s.items), bool(s.complete)
+
+
+def _seek(db: Session, user_id: str, after, until: datetime, limit: int) -> List:
+    UW = models.UserWord
+    return [
+        _item(r) for r in
+        _query(db, user_id)
+        .filter(UW.next_review_at <= until, tuple_(UW.next_review_at, UW.id) > tuple_(
+            # typed like the columns, so the id binds in its stored form
+            literal(after[0], UW.next_review_at.type), literal(after[1], UW.id.type)))
+        .limit(limit)
+    ]
+
+
+def _load_first(db: Session, user_id: str, now: datetime, per_user: int):
+    # (first rows, whether they are all of the user's rows) for a cache fill
+    stored = _stored_session(db, user_id, now)
+    if stored is not None and (stored[1] or len(stored[0]) >= per_user):
+        return stored[0][:per_user], stored[1] and len(stored[0]) <= per_user
+    loaded = [_item(r) for r in _query(db, user_id).limit(per_user)]
+    return loaded, len(loaded) < per_user
+
+
+def _page(rows, limit: int) -> Tuple[List[Dict], Optional[str]]:
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1]) if len(rows) > limit else None
+    return [_plan(r) for r in page], next_cursor
+
+
+def plan_page(db: Session, user_id: str, limit: int = 50, cursor: Optional[str] = None,
+              now: datetime = None, until: datetime = None) -> Tuple[List[Dict], Optional[str]]:
+    """One page of due cards, with their words, in ``(next_review_at, id)``
+    order, and the cursor of the next page (None on the last page).
+
+    Later pages are a keyset seek on the (user_id, next_review_at, id)
+    index, so every page costs the same. The first page comes from the
+    cache when it can answer, else from today's study session (see
+    ``backend.app.sessions``) when it is still valid, else from the query;
+    the rows loaded either way also fill the cache.
+
+    ``until`` (default ``now``) widens the page to cards due up to then.
+    """
+    now = now or datetime.utcnow()
+    until = until or now
+    if cursor is not None:
+        return _page(_seek(db, user_id, decode_cursor(cursor), until, limit + 1), limit)
+    cache = get_plan_cache()
+    rows = cache.due(user_id, until, limit + 1) if cache is not None else None
+    if rows is None:
+        token = cache.token(user_id) if cache is not None else None
+        per_user = max(limit + 1, cache.per_user) if cache is not None else limit + 1
+        loaded, complete = _load_first(db, user_id, now, per_user)
+        if cache is not None:
+            cache.fill(user_id, loaded, complete, token)
+        rows = [r for r in loaded if r[0] <= until][:limit + 1]
+    return _page(rows, limit)
+
+
+async def plan_page_async(db: AsyncSession, user_id: str, limit: int = 50, cursor: Optional[str] = None,
+                          now: datetime = None, until: datetime = None) -> Tuple[List[Dict], Optional[str]]:
+    """``plan_page`` for an ``AsyncSession``. Cache calls, which can block
+    on Redis, run in the threadpool, and the queries through ``run_sync``,
+    so neither holds up the event loop."""
+    now = now or datetime.utcnow()
+    until = until or now
+    if cursor is not None:
+        after = decode_cursor(cursor)
+        return _page(await db.run_sync(lambda s: _seek(s, user_id, after, until, limit + 1)), limit)
+    cache = get_plan_cache()
+    if cache is None:
+        loaded, _ = await db.run_sync(lambda s: _load_first(s, user_id, now, limit + 1))
+        return _page([r for r in loaded if r[0] <= until][:limit + 1], limit)
+    rows = await run_in_threadpool(cache.due, user_id, until, limit + 1)
+    if rows is None:
+        token = await run_in_threadpool(cache.token, user_id)
+        per_user = max(limit + 1, cache.per_user)
+        loaded, complete = await db.run_sync(lambda s: _load_first(s, user_id, now, per_user))
+        # builds the heap (local) or writes the queue (Redis)
+        await run_in_threadpool(cache.fill, user_id, loaded, complete, token)
+        rows = [r for r in loaded if r[0] <= until][:limit + 1]
+    return _page(rows, limit)
+
+
+def due_plans(db: Session, user_id: str, limit: int = 50, now: datetime = None) -> List[Dict]:
+    """The first ``limit`` due cards for ``user_id``."""
+    return plan_page(db, user_id, limit, now=now)[0]
+
+
+def upcoming(db: Session, user_id: str, limit: int = 20) -> List[Dict]:
+    """The next ``limit`` cards in queue order, due or not, so a client can
+    hold them and turn cards over locally."""
+    return plan_page(db, user_id, limit, until=datetime.max)[0]
+
+
+def record_reviews(user_id: str, items: List) -> None:
+    """Write-through after a committed review: ``items`` are
+    ``(next_review_at, user_word_id, word_id, interval_hours, review_count)``."""
+    cache = get_plan_cache()
+    if cache is not None and items:
+        cache.update(user_id, [item + (None,) for item in items])
+
+
+def invalidate(user_id: str) -> None:
+    cache = get_plan_cache()
+    if cache is not None and user_id:
+        cache.invalidate(user_id)
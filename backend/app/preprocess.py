@@ -0,0 +1,135 @@
+import io
+import os
+import time
+import base64
+import json
+import threading
+from typing import Dict, List, Tuple
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def preprocess_enabled() -> bool:
+    return os.getenv('OCR_PREPROCESS', '1').lower() not in ('0', 'false', 'no', 'off')
+
+
+def _pil():
+    # Pillow is optional: without it images are sent as uploaded.
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None, None
+    return Image, ImageOps
+
+
+class PreprocessStats:
+    """Process-wide totals so the with/without pre-processing runs can be
+    compared (see /api/v1/admin/ocr-transfer)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.documents = 0
+        self.bytes_in = 0
+        self.bytes_sent = 0
+        self.preprocess_seconds = 0.0
+        self.request_seconds = 0.0
+
+    def record(self, bytes_in: int, bytes_sent: int, preprocess_seconds: float, request_seconds: float):
+        with self._lock:
+            self.documents += 1
+            self.bytes_in += bytes_in
+            self.bytes_sent += bytes_sent
+            self.preprocess_seconds += preprocess_seconds
+            self.request_seconds += request_seconds
+
+    def as_dict(self) -> Dict:
+        return {
+            'enabled': preprocess_enabled(),
+            'documents': self.documents,
+            'bytes_in': self.bytes_in,
+            'bytes_sent': self.bytes_sent,
+            'bytes_saved': self.bytes_in - self.bytes_sent,
+            'preprocess_seconds': round(self.preprocess_seconds, 3),
+            'request_seconds': round(self.request_seconds, 3),
+        }
+
+
+stats = PreprocessStats()
+
+
+def prepare_image(data: bytes, max_side: int = None, quality: int = None) -> Tuple[bytes, Dict]:
+    """Downsample, grayscale and re-encode an image for OCR.
+
+    Returns ``(bytes_to_send, info)``. EXIF and other metadata are dropped
+    by re-encoding. Input that Pillow can't decode, or that would get
+    bigger, is returned unchanged.
+    """
+    started = time.perf_counter()
+    info = {'bytes_in': len(data), 'bytes_out': len(data), 'preprocessed': False}
+    Image, ImageOps = _pil()
+    if Image is None:
+        info['preprocess_seconds'] = 0.0
+        return data, info
+    max_side = max_side or _env_int('OCR_PREPROCESS_MAX_SIDE', 2000)
+    quality = quality or _env_int('OCR_PREPROCESS_QUALITY', 80)
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            # apply camera rotation before the EXIF tag is thrown away
+            img = ImageOps.exif_transpose(img)
+            img = img.convert('L')
+            img.thumbnail((max_side, max_side))
+            buf = io.BytesIO()
+            img.save(buf, format='JPEG', quality=quality, optimize=True)
+        out = buf.getvalue()
+    except Exception:
+        info['preprocess_seconds'] = time.perf_counter() - started
+        return data, info
+    info['preprocess_seconds'] = time.perf_counter() - started
+    if len(out) >= len(data):
+        return data, info
+    info['bytes_out'] = len(out)
+    info['preprocessed'] = True
+    return out, info
+
+
+# base64 works on 3-byte groups; encoding multiples of 3 keeps the chunks
+# concatenable without padding in the middle of the stream.
+_B64_CHUNK = 3 * 16 * 1024
+
+
+def b64_len(n: int) -> int:
+    return 4 * ((n + 2) // 3)
+
+
+def stream_instances(images: List[bytes], instructions: str):
+    """Build a streaming JSON body for a predict request.
+
+    Returns ``(make_iter, content_length)``; ``make_iter()`` yields the body
+    in chunks, base64-encoding each image piecewise so the full encoded
+    string never exists in memory next to the raw bytes.
+    """
+    head = b'{"instances": ['
+    inst_head = b'{"image": {"image_bytes": "'
+    inst_tail = ('"}, "instructions": ' + json.dumps(instructions) + '}').encode()
+    tail = b']}'
+    length = len(head) + len(tail) + max(0, len(images) - 1) * 2
+    length += sum(len(inst_head) + b64_len(len(img)) + len(inst_tail) for img in images)
+
+    async def make_iter():
+        yield head
+        for i, img in enumerate(images):
+            if i:
+                yield b', '
+            yield inst_head
+            view = memoryview(img)
+            for off in range(0, len(img), _B64_CHUNK):
+                yield base64.b64encode(view[off:off + _B64_CHUNK])
+            yield inst_tail
+        yield tail
+
+    return make_iter, length
@@ -0,0 +1,160 @@
+"""Bulk rescheduling of ``user_words``.
+
+Recomputes ``next_review_at`` / ``interval_hours`` for every reviewed card
+after a change to the base intervals or to add an overdue penalty::
+
+    python -m backend.app.reschedule --base-intervals 0.083,0.5,12,24,48,96,168,360 \\
+        --overdue-penalty 0.05 --chunk-size 50000
+
+Rows are read in primary-key order in chunks, rescheduled with NumPy and
+written back with one executemany UPDATE per chunk (one transaction each).
+Days overdue are counted from the due date the new intervals give before
+any penalty, which is derived from ``last_review_at`` alone, so a rerun
+with the same ``now`` changes nothing and an interrupted run can simply be
+restarted. Results match ``MemoryService.reschedule`` row for row. Cached due queues pick the new
+times up when they expire (PLAN_CACHE_TTL_SECONDS).
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import bindparam, func, select
+
+from .db import SessionLocal
+from . import models
+from . import sessions
+from .learning import MemoryService
+
+
+def compute(review_count, interval_hours, last_review_at, last_performance,
+            base_intervals: List[float], old_base_intervals: List[float], overdue_penalty: float = 0.0,
+            now: Optional[datetime] = None):
+    """Vectorized ``MemoryService.reschedule``.
+
+    Takes column arrays (``datetime64[us]`` for the timestamps, NaN/NaT for
+    NULL) and returns ``(mask, interval_hours, next_review_at, performance)``;
+    only rows where ``mask`` is set were ever scheduled and get new values.
+    ``old_base_intervals`` are the intervals the stored values were
+    computed with, used to infer performance where it wasn't recorded.
+    """
+    now = np.datetime64(now or datetime.utcnow(), 'us')
+    review_count = np.nan_to_num(np.asarray(review_count, dtype=np.float64)).astype(np.int64)
+    interval_hours = np.asarray(interval_hours, dtype=np.float64)
+    last_performance = np.asarray(last_performance, dtype=np.float64)
+    new_base = np.asarray(base_intervals, dtype=np.float64)
+    old_base = np.asarray(old_base_intervals, dtype=np.float64)
+
+    mask = ~np.isnat(last_review_at) & (interval_hours > 0)
+    ratio = interval_hours / old_base[np.minimum(review_count, len(old_base) - 1)]
+    inferred = np.where(ratio >= 1.15, 0.8, np.where(ratio >= 0.85, 0.6, 0.0))
+    performance = np.where(np.isnan(last_performance), inferred, last_performance)
+    # same three buckets as MemoryService._adjust_interval
+    factor = np.where(performance >= 0.8, 1.3, np.where(performance >= 0.6, 1.0, 0.7))
+    adjusted = new_base[np.minimum(review_count, len(new_base) - 1)] * factor
+
+    if overdue_penalty:
+        # overdue against the unpenalized new schedule, not the stored
+        # next_review_at, which a previous run may already have penalized
+        elapsed_us = np.where(mask, (now - last_review_at).astype(np.int64), 0)
+        days = (elapsed_us / 1e6 - adjusted * 3600.0) / 86400.0
+        overdue = mask & (days > 0)
+        adjusted = np.where(overdue, adjusted * np.maximum(0.5, 1.0 - overdue_penalty * days), adjusted)
+
+    delta = np.rint(np.where(mask, adjusted, 0.0) * 3.6e9).astype('timedelta64[us]')
+    return mask, adjusted, last_review_at + delta, performance
+
+
+def run(base_intervals: Optional[List[float]] = None, overdue_penalty: float = 0.0, chunk_size: int = 20000,
+        user_id: Optional[str] = None, dry_run: bool = False, now: Optional[datetime] = None,
+        session_factory: Callable = SessionLocal, progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+    """Reschedule all (or one user's) cards. Returns run totals."""
+    ms = MemoryService()
+    base_intervals = base_intervals or ms.base_intervals
+    now = now or datetime.utcnow()
+    UW = models.UserWord
+    table = UW.__table__
+    stmt = table.update().where(table.c.id == bindparam('_id')).values(
+        interval_hours=bindparam('_interval_hours'),
+        next_review_at=bindparam('_next_review_at'),
+        # backfill inferred performance: the new interval no longer encodes it
+        last_performance=bindparam('_last_performance'),
+    )
+    db = session_factory()
+    started = time.perf_counter()
+    stats = {'total': 0, 'scanned': 0, 'updated': 0, 'seconds': 0.0, 'rows_per_second': 0.0}
+    try:
+        count_q = select(func.count(UW.id))
+        if user_id:
+            count_q = count_q.where(UW.user_id == user_id)
+        stats['total'] = db.execute(count_q).scalar() or 0
+        last_id = None
+        while True:
+            q = select(UW.id, UW.review_count, UW.interval_hours, UW.last_review_at, UW.next_review_at,
+                       UW.last_performance, UW.user_id).order_by(UW.id).limit(chunk_size)
+            if user_id:
+                q = q.where(UW.user_id == user_id)
+            if last_id is not None:
+                q = q.where(UW.id > last_id)
+            rows = db.execute(q).all()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            ids, review_count, interval_hours, last_review_at, next_review_at, last_performance, user_ids = zip(*rows)
+            old_next = np.array(next_review_at, dtype='datetime64[us]')
+            mask, new_interval, new_next, performance = compute(
+                review_count, interval_hours, np.array(last_review_at, dtype='datetime64[us]'),
+                last_performance, base_intervals, ms.base_intervals, overdue_penalty, now,
+            )
+            changed = mask & ((new_interval != np.asarray(interval_hours, dtype=np.float64)) | (new_next != old_next))
+            idx = np.flatnonzero(changed)
+            if len(idx) and not dry_run:
+                intervals = new_interval[idx].tolist()
+                nexts = new_next[idx].astype(object)
+                perfs = performance[idx].tolist()
+                db.execute(stmt, [
+                    {'_id': ids[i], '_interval_hours': iv, '_next_review_at': nx, '_last_performance': pf}
+                    for i, iv, nx, pf in zip(idx.tolist(), intervals, nexts, perfs)
+                ])
+                sessions.touch(db, [user_ids[i] for i in idx.tolist()])
+                db.commit()
+            stats['scanned'] += len(rows)
+            stats['updated'] += len(idx)
+            stats['seconds'] = time.perf_counter() - started
+            stats['rows_per_second'] = stats['scanned'] / stats['seconds'] if stats['seconds'] else 0.0
+            if progress:
+                progress(dict(stats))
+            if len(rows) < chunk_size:
+                break
+    finally:
+        db.close()
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Recompute review schedules in bulk')
+    parser.add_argument('--base-intervals', default=None,
+                        help='comma-separated hours per review count (default: the current ones)')
+    parser.add_argument('--overdue-penalty', type=float, default=0.0,
+                        help='fraction of the interval removed per day a card is overdue (floored at half)')
+    parser.add_argument('--chunk-size', type=int, default=20000)
+    parser.add_argument('--user', default=None, help='only this user id')
+    parser.add_argument('--dry-run', action='store_true', help='compute and report without writing')
+    args = parser.parse_args(argv)
+    base = [float(x) for x in args.base_intervals.split(',')] if args.base_intervals else None
+
+    def report(s):
+        pct = 100.0 * s['scanned'] / s['total'] if s['total'] else 100.0
+        print(f"\r{s['scanned']}/{s['total']} rows ({pct:.1f}%), {s['updated']} updated, "
+              f"{s['rows_per_second']:.0f} rows/s", end='', file=sys.stderr, flush=True)
+
+    stats = run(base, args.overdue_penalty, args.chunk_size, args.user, args.dry_run, progress=report)
+    print(file=sys.stderr)
+    print(f"{'would update' if args.dry_run else 'updated'} {stats['updated']} of {stats['scanned']} rows "
+          f"in {stats['seconds']:.2f}s ({stats['rows_per_second']:.0f} rows/s)")
+
+
+if __name__ == '__main__':
+    main()
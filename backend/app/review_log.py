@@ -0,0 +1,189 @@
+"""Append-only review history (``review_events``).
+
+Every review writes one row in the same transaction as its schedule
+update. Old events are periodically folded into per-word summary columns
+on ``user_words`` and removed::
+
+    python -m backend.app.review_log compact --older-than-days 180
+    python -m backend.app.review_log partitions --months-ahead 3   # Postgres
+
+On Postgres the table is range-partitioned by month on ``reviewed_at``;
+``partitions`` creates upcoming months ahead of time (anything outside
+them lands in ``review_events_default``) and compaction drops months it
+has emptied.
+"""
+import argparse
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, delete, func, select, text
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal
+from .ids import new_id
+from . import models
+
+# a review below this performance counts as a lapse
+LAPSE_BELOW = 0.6
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def event_row(user_id: str, word_id: str, reviewed_at: datetime, performance: float,
+              interval_before: Optional[float], interval_after: float, review_count: int) -> Dict:
+    return {
+        'id': new_id(), 'user_id': user_id, 'word_id': word_id, 'reviewed_at': reviewed_at,
+        'performance': performance, 'interval_before': interval_before, 'interval_after': interval_after,
+        'review_count': review_count,
+    }
+
+
+def log_events(db: Session, rows: List[Dict]) -> None:
+    """Queue the insert in the caller's transaction; does not commit."""
+    if rows:
+        db.execute(models.ReviewEvent.__table__.insert(), rows)
+
+
+def _month_start(ts: datetime) -> datetime:
+    return datetime(ts.year, ts.month, 1)
+
+
+def _next_month(ts: datetime) -> datetime:
+    return datetime(ts.year + ts.month // 12, ts.month % 12 + 1, 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f'review_events_y{month.year:04d}m{month.month:02d}'
+
+
+def ensure_partitions(db: Session, months_ahead: int = 3, now: Optional[datetime] = None) -> List[str]:
+    """Create monthly partitions from this month through ``months_ahead``
+    (Postgres only). Returns the partitions created."""
+    if db.get_bind().dialect.name != 'postgresql':
+        return []
+    month = _month_start(now or datetime.utcnow())
+    created = []
+    for _ in range(months_ahead + 1):
+        name = partition_name(month)
+        exists = db.execute(text('SELECT to_regclass(:n)'), {'n': name}).scalar()
+        if exists is None:
+            db.execute(text(
+                f"CREATE TABLE {name} PARTITION OF review_events "
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+            ))
+            created.append(name)
+        month = _next_month(month)
+    db.commit()
+    return created
+
+
+def _drop_empty_partitions(db: Session, before: datetime) -> List[str]:
+    # whole months below the cutoff have been emptied by compaction
+    rows = db.execute(text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'review_events' "
+        "AND c.relname LIKE 'review_events_y%'"
+    )).scalars().all()
+    dropped = []
+    for name in rows:
+        month = datetime(int(name[-7:-3]), int(name[-2:]), 1)
+        if _next_month(month) > before:
+            continue
+        # a late, back-dated review may have landed since; only drop empty months
+        db.execute(text(f'LOCK TABLE {name} IN ACCESS EXCLUSIVE MODE'))
+        if db.execute(text(f'SELECT EXISTS (SELECT 1 FROM {name})')).scalar():
+            db.rollback()
+            continue
+        db.execute(text(f'DROP TABLE {name}'))
+        db.commit()
+        dropped.append(name)
+    return dropped
+
+
+def compact(db: Session, before: datetime, window: timedelta = timedelta(days=1)) -> Dict:
+    """Fold events older than ``before`` into ``user_words.history_*`` and
+    delete them, one ``window`` of time per transaction.
+
+    Each window is removed with ``DELETE ... RETURNING`` and exactly the
+    returned rows are summed, so an event inserted concurrently is either
+    counted or left for the next run, never lost.
+    """
+    ev = models.ReviewEvent
+    uw = models.UserWord.__table__
+    stmt = uw.update().where(uw.c.user_id == bindparam('_user_id'), uw.c.word_id == bindparam('_word_id')).values(
+        history_reviews=func.coalesce(uw.c.history_reviews, 0) + bindparam('_reviews'),
+        history_lapses=func.coalesce(uw.c.history_lapses, 0) + bindparam('_lapses'),
+        history_performance_sum=func.coalesce(uw.c.history_performance_sum, 0.0) + bindparam('_perf_sum'),
+        history_compacted_until=bindparam('_until'),
+    )
+    stats = {'events': 0, 'words': 0, 'partitions_dropped': []}
+    def first_after(ts):
+        q = select(func.min(ev.reviewed_at)).where(ev.reviewed_at < before)
+        if ts is not None:
+            q = q.where(ev.reviewed_at >= ts)
+        return db.execute(q).scalar()
+
+    start = first_after(None)
+    while start is not None:
+        end = min(start + window, before)
+        removed = db.execute(
+            delete(ev).where(ev.reviewed_at >= start, ev.reviewed_at < end)
+            .returning(ev.user_id, ev.word_id, ev.performance)
+        ).all()
+        totals = defaultdict(lambda: [0, 0, 0.0])
+        for user_id, word_id, performance in removed:
+            t = totals[(user_id, word_id)]
+            t[0] += 1
+            if performance is not None:
+                t[1] += performance < LAPSE_BELOW
+                t[2] += performance
+        if totals:
+            db.execute(stmt, [
+                {'_user_id': u, '_word_id': w, '_reviews': n, '_lapses': lapses, '_perf_sum': perf_sum, '_until': before}
+                for (u, w), (n, lapses, perf_sum) in totals.items()
+            ])
+        db.commit()
+        stats['events'] += len(removed)
+        stats['words'] += len(totals)
+        # skip over empty stretches
+        start = first_after(end)
+    if db.get_bind().dialect.name == 'postgresql':
+        stats['partitions_dropped'] = _drop_empty_partitions(db, before)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Maintain the review_events log')
+    sub = parser.add_subparsers(dest='command', required=True)
+    c = sub.add_parser('compact', help='fold old events into user_words summary columns')
+    c.add_argument('--older-than-days', type=int, default=_env_int('REVIEW_EVENTS_RETENTION_DAYS', 180))
+    p = sub.add_parser('partitions', help='create upcoming monthly partitions (Postgres)')
+    p.add_argument('--months-ahead', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        if args.command == 'compact':
+            before = datetime.utcnow() - timedelta(days=args.older_than_days)
+            if db.get_bind().dialect.name == 'postgresql':
+                # whole months, so emptied partitions can be dropped
+                before = _month_start(before)
+            stats = compact(db, before)
+            print(f"compacted {stats['events']} events into {stats['words']} words before {before:%Y-%m-%d}; "
+                  f"dropped {len(stats['partitions_dropped'])} partitions")
+        else:
+            created = ensure_partitions(db, args.months_ahead)
+            print(f"created {len(created)} partitions: {', '.join(created) or '-'}")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Schema lifecycle, settled once per process instead of on every request.
+
+SCHEMA_MODE picks what happens the first time a session is handed out
+(or at API startup):
+
+- ``create`` (default, dev): ``create_all`` for missing tables
+- ``upgrade``: ``alembic upgrade head``
+- ``check`` (prod): refuse to start unless the database is at the
+  Alembic head revision
+- ``off``: nothing
+"""
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from .db import Base, engine as default_engine
+from . import models  # noqa: F401  (registers the tables on Base)
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+MODES = ('create', 'upgrade', 'check', 'off')
+
+
+class SchemaError(RuntimeError):
+    pass
+
+
+def alembic_config(connection=None) -> Config:
+    cfg = Config(os.path.join(ROOT, 'alembic.ini'))
+    cfg.set_main_option('script_location', os.path.join(ROOT, 'alembic'))
+    if connection is not None:
+        # alembic/env.py runs on this connection instead of DATABASE_URL
+        cfg.attributes['connection'] = connection
+    return cfg
+
+
+class SchemaManager:
+    def __init__(self, engine=None, mode: Optional[str] = None):
+        self.engine = engine or default_engine
+        self.mode = mode or os.getenv('SCHEMA_MODE', 'create')
+        if self.mode not in MODES:
+            raise SchemaError(f'SCHEMA_MODE must be one of {MODES}, not {self.mode!r}')
+        self.ready = False
+        self.current = None
+        self.head = None
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def _revisions(self, conn):
+        current = MigrationContext.configure(conn).get_current_revision()
+        head = ScriptDirectory.from_config(alembic_config()).get_current_head()
+        return current, head
+
+    def ensure(self) -> None:
+        """Run the configured mode once; later calls return immediately."""
+        if self.ready:
+            return
+        with self._lock:
+            if self.ready:
+                return
+            started = time.perf_counter()
+            if self.mode == 'create':
+                Base.metadata.create_all(bind=self.engine)
+            elif self.mode == 'upgrade':
+                from alembic import command
+                with self.engine.begin() as conn:
+                    command.upgrade(alembic_config(conn), 'head')
+            if self.mode != 'off':
+                with self.engine.connect() as conn:
+                    self.current, self.head = self._revisions(conn)
+                if self.current != self.head:
+                    if self.mode == 'check':
+                        raise SchemaError(
+                            f'database schema is at {self.current or "no revision"}, expected {self.head}; '
+                            'run `alembic upgrade head`')
+                    if self.current is not None:
+                        # create_all adds missing tables, never columns or indexes
+                        logger.warning('database schema is at %s, behind %s', self.current, self.head)
+            self.seconds = time.perf_counter() - started
+            self.ready = True
+
+    def status(self) -> Dict:
+        return {'mode': self.mode, 'ready': self.ready, 'current': self.current, 'head': self.head,
+                'seconds': self.seconds}
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_schema_manager() -> SchemaManager:
+    global _manager
+    manager = _manager
+    if manager is not None:
+        return manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = SchemaManager()
+        return _manager
+
+
+def ensure_schema() -> None:
+    # called for every request: once settled, no locks are taken
+    manager = _manager
+    if manager is not None and manager.ready:
+        return
+    get_schema_manager().ensure()
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime
 
@@ -30,4 +30,25 @@ class ProgressIn(BaseModel):
 
 class ProgressOut(BaseModel):
     next_review: datetime
-    interval_hours: float
\ No newline at end of file
+    interval_hours: float
+
+class ReviewIn(BaseModel):
+    word_id: str
+    performance: float
+    reviewed_at: Optional[datetime] = None
+    # client-generated id; resending the same id is a no-op
+    review_id: Optional[str] = Field(None, max_length=64)
+
+class BatchProgressIn(BaseModel):
+    reviews: List[ReviewIn]
+
+class ReviewResult(BaseModel):
+    review_id: Optional[str] = None
+    word_id: str
+    status: str  # applied | duplicate | stale | error
+    next_review: Optional[datetime] = None
+    interval_hours: Optional[float] = None
+    detail: Optional[str] = None
+
+class BatchProgressOut(BaseModel):
+    results: List[ReviewResult]
@@ -0,0 +1,209 @@
+"""Nightly precomputed study sessions (``study_sessions``).
+
+Most users open the app at about the same time each morning, and each
+first plan request would run the same due-queue query. This job builds
+every active user's first rows of the day ahead of time::
+
+    python -m backend.app.sessions build --workers 8 --chunk-size 500
+
+A session holds the rows the plan query would return first (overdue
+cards and new words, which are due as soon as they are added), with
+their words. ``GET /api/v1/learning/plan`` serves it while it is valid
+and falls back to the live query otherwise. Reviews and new words bump
+``study_sessions.version`` in their own transaction, which invalidates
+the session; the build records the version it read before loading rows,
+so a review racing the build also invalidates it.
+
+New words are due as soon as they are added, but a large overdue backlog
+sorts ahead of them. Until its first review a new word's
+``next_review_at`` only marks its place in the queue, so the build moves
+up to STUDY_SESSION_NEW_SHARE of each session's due rows' worth of new
+words forward, spread evenly among the overdue cards. Every page of the
+session then mixes both, and the live query, the plan cache and the
+cursor all keep one ``(next_review_at, id)`` order. The moves bump the
+user's queue version in the same transaction (so prefetch ETags change)
+and the session is recorded against the bumped version. API processes
+see the new order through a shared plan cache (PLAN_CACHE_BACKEND=redis);
+per-process local caches catch up within PLAN_CACHE_TTL_SECONDS, as they
+do for reviews made in another process.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, literal, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from .db import SessionLocal, dialect_insert
+from . import models
+from . import plan_cache
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+
+def touch(db: Session, user_ids: List[str]) -> None:
+    """Invalidate the stored sessions of ``user_ids`` in the caller's
+    transaction; does not commit."""
+    if not user_ids:
+        return
+    table = models.StudySession.__table__
+    stmt = dialect_insert(db, table).on_conflict_do_update(
+        index_elements=['user_id'], set_={'version': table.c.version + 1})
+    db.execute(stmt, [{'user_id': u, 'version': 1} for u in dict.fromkeys(user_ids)])
+
+
+def queue_version(db: Session, user_id: str) -> int:
+    """Counter bumped by every change to ``user_id``'s due queue (reviews,
+    new words, reschedules); 0 before the first one."""
+    table = models.StudySession.__table__
+    return db.execute(select(table.c.version).where(table.c.user_id == user_id)).scalar() or 0
+
+
+def active_users(db: Session, since: datetime) -> List[str]:
+    """Users who reviewed or added words since ``since``."""
+    uw = models.UserWord
+    q = (
+        select(uw.user_id).distinct()
+        .where(or_(uw.last_review_at >= since, uw.added_at >= since))
+        .order_by(uw.user_id)
+    )
+    return list(db.execute(q).scalars())
+
+
+def _new_word_moves(db: Session, user_id: str, items: List, quota: int, now: datetime) -> List[Dict]:
+    """``next_review_at`` updates that bring up to ``quota`` due new words
+    into the due part of ``items`` (one user's first rows), evenly spaced.
+    New words only ever move earlier."""
+    due = [it for it in items if it[0] <= now]
+    reviews = [it for it in due if it[4]]
+    news = [it for it in due if not it[4]]
+    if not reviews or len(news) >= quota:
+        return []
+    UW = models.UserWord
+    last = items[-1]
+    news += [
+        plan_cache._item(r) for r in
+        plan_cache._query(db, user_id)
+        .filter(or_(UW.review_count == 0, UW.review_count.is_(None)), UW.next_review_at <= now,
+                tuple_(UW.next_review_at, UW.id) > tuple_(
+                    literal(last[0], UW.next_review_at.type), literal(last[1], UW.id.type)))
+        .limit(quota - len(news))
+    ]
+    news = news[:quota]
+    reviews = reviews[:max(0, len(due) - len(news))]
+    if not reviews:
+        return []
+    moves = []
+    step = len(reviews) / len(news)
+    for j, item in enumerate(news):
+        # between the reviews around slot j * step, or after the last one
+        k = int(j * step + step / 2)
+        before = reviews[k - 1][0] if k > 0 else reviews[0][0] - timedelta(microseconds=1)
+        after = reviews[k][0] if k < len(reviews) else before
+        ts = min(before + (after - before) / 2, item[0])
+        if ts != item[0]:
+            moves.append({'_id': item[1], '_next_review_at': ts})
+    return moves
+
+
+def build_chunk(db: Session, user_ids: List[str], size: int, now: datetime, new_share: Optional[float] = None) -> int:
+    """Build and store the sessions of ``user_ids`` in one transaction."""
+    table = models.StudySession.__table__
+    uw = models.UserWord.__table__
+    if new_share is None:
+        new_share = _env_float('STUDY_SESSION_NEW_SHARE', 0.2)
+    quota = int(round(size * new_share))
+    # read versions first: any review after this point leaves them behind
+    versions = dict(db.execute(
+        select(table.c.user_id, table.c.version).where(table.c.user_id.in_(user_ids))
+    ).all())
+    rows, moved = [], []
+    for user_id in user_ids:
+        items = [plan_cache._item(r) for r in plan_cache._query(db, user_id).limit(size)]
+        moves = _new_word_moves(db, user_id, items, quota, now) if quota and items else []
+        if moves:
+            db.execute(uw.update().where(uw.c.id == bindparam('_id')).values(
+                next_review_at=bindparam('_next_review_at')), moves)
+            items = [plan_cache._item(r) for r in plan_cache._query(db, user_id).limit(size)]
+            moved.append(user_id)
+        rows.append({
+            'user_id': user_id, 'version': 0, 'built_version': versions.get(user_id, 0) + bool(moves),
+            'session_date': now.date(), 'built_at': now, 'card_count': len(items),
+            'complete': len(items) < size, 'items': plan_cache.pack_items(items),
+        })
+    # the schedule changed: move the version (and prefetch ETags) on, with
+    # the sessions built against it; a review racing the build still wins
+    touch(db, moved)
+    if rows:
+        stmt = dialect_insert(db, table)
+        db.execute(stmt.on_conflict_do_update(index_elements=['user_id'], set_={
+            c: stmt.excluded[c] for c in ('built_version', 'session_date', 'built_at', 'card_count', 'complete', 'items')
+        }), rows)
+    db.commit()
+    for user_id in moved:
+        # cached queues still hold the old order; reaches the API only
+        # through a shared cache backend
+        plan_cache.invalidate(user_id)
+    return len(rows)
+
+
+def build_all(workers: int = 4, chunk_size: int = 500, size: Optional[int] = None, active_days: int = 14,
+              now: Optional[datetime] = None, session_factory: Callable[[], Session] = SessionLocal,
+              new_share: Optional[float] = None) -> Dict:
+    """Build sessions for every active user, ``chunk_size`` users per
+    transaction on ``workers`` threads. Returns counts and the runtime."""
+    started = time.perf_counter()
+    now = now or datetime.utcnow()
+    size = size or _env_int('STUDY_SESSION_SIZE', _env_int('PLAN_CACHE_PER_USER', 200))
+    db = session_factory()
+    try:
+        user_ids = active_users(db, now - timedelta(days=active_days))
+    finally:
+        db.close()
+    chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+    def work(chunk):
+        s = session_factory()
+        try:
+            return build_chunk(s, chunk, size, now, new_share)
+        finally:
+            s.close()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        built = sum(pool.map(work, chunks))
+    return {'users': built, 'chunks': len(chunks), 'seconds': round(time.perf_counter() - started, 3)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Precompute daily study sessions')
+    sub = parser.add_subparsers(dest='command', required=True)
+    b = sub.add_parser('build', help='build today\'s sessions for active users')
+    b.add_argument('--workers', type=int, default=_env_int('STUDY_SESSION_WORKERS', 4))
+    b.add_argument('--chunk-size', type=int, default=500)
+    b.add_argument('--size', type=int, default=None, help='rows per session (default STUDY_SESSION_SIZE)')
+    b.add_argument('--active-days', type=int, default=_env_int('STUDY_SESSION_ACTIVE_DAYS', 14))
+    b.add_argument('--new-share', type=float, default=None,
+                   help='share of each session kept for due new words (default STUDY_SESSION_NEW_SHARE)')
+    args = parser.parse_args(argv)
+
+    stats = build_all(args.workers, args.chunk_size, args.size, args.active_days, new_share=args.new_share)
+    print(f"built {stats['users']} sessions in {stats['chunks']} chunks in {stats['seconds']:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import os
+import hashlib
+import tempfile
+from typing import Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+
+class BlobStore:
+    """Content-addressed file storage for uploads.
+
+    Files are streamed to disk in fixed-size chunks and hashed while they
+    arrive, then stored under their sha256 digest. Identical uploads share
+    a single blob on disk.
+    """
+
+    def __init__(self, root: str = None, chunk_size: int = None):
+        self.root = os.path.abspath(root or os.getenv('UPLOAD_DIR', 'uploads'))
+        try:
+            self.chunk_size = chunk_size or int(os.getenv('UPLOAD_CHUNK_SIZE', str(1024 * 1024)))
+        except Exception:
+            self.chunk_size = 1024 * 1024
+
+    def path_for(self, digest: str) -> str:
+        # Fan out into two levels of sub-directories so no single
+        # directory ends up holding every blob.
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def _tmp_dir(self) -> str:
+        tmp_dir = os.path.join(self.root, 'tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+        return tmp_dir
+
+    def _commit(self, tmp_path: str, digest: str) -> str:
+        final_path = self.path_for(digest)
+        if os.path.exists(final_path):
+            # Deduplicate: the blob is already stored, drop our copy.
+            os.remove(tmp_path)
+            return final_path
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        # os.replace is atomic on the same filesystem, so concurrent
+        # uploads of the same content simply race to write identical bytes.
+        os.replace(tmp_path, final_path)
+        return final_path
+
+    async def save_upload(self, upload_file) -> Tuple[str, str, int]:
+        """Stream a starlette ``UploadFile`` into the store.
+
+        Returns ``(digest, storage_path, size)``.
+        """
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir())
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = await upload_file.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    # keep disk writes off the event loop
+                    await run_in_threadpool(out.write, chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            return digest, self._commit(tmp_path, digest), size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def save_fileobj(self, fileobj) -> Tuple[str, str, int]:
+        """Synchronous variant of ``save_upload`` for plain file objects."""
+        hasher = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir())
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                while True:
+                    chunk = fileobj.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    hasher.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            digest = hasher.hexdigest()
+            return digest, self._commit(tmp_path, digest), size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,114 @@
+"""OCR job worker.
+
+Run one or more of these next to the API (``OCR_QUEUE_MODE=worker``)::
+
+    python -m backend.app.worker --concurrency 4 --mode thread
+
+Workers claim jobs from the ``ocr_jobs`` table with a lease, so several
+of them can share one database without processing a job twice. Jobs whose
+lease expired (crashed worker, restart) are put back on the queue.
+"""
+import argparse
+import logging
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .db import SessionLocal, engine
+from .schema import ensure_schema
+from . import jobs
+
+logger = logging.getLogger('wordmem.worker')
+
+
+def _init_process():
+    # Forked children must not reuse the parent's pooled connections.
+    engine.dispose(close=False)
+
+
+class Worker:
+    def __init__(self, concurrency: int = 4, mode: str = 'thread', poll_interval: float = 1.0, requeue_interval: float = 30.0, batch_size: int = None):
+        self.concurrency = max(1, concurrency)
+        # each pool task handles up to batch_size jobs in one Gemini request
+        self.batch_size = max(1, batch_size or jobs.BATCH_SIZE)
+        self.mode = mode
+        self.poll_interval = poll_interval
+        self.requeue_interval = requeue_interval
+        self.worker_id = jobs.new_worker_id()
+        self._stopping = False
+
+    def _make_pool(self):
+        if self.mode == 'process':
+            return ProcessPoolExecutor(max_workers=self.concurrency, initializer=_init_process)
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='ocr-worker')
+
+    def stop(self, *_):
+        self._stopping = True
+
+    def _claim(self, limit: int):
+        db = SessionLocal()
+        try:
+            return jobs.claim(db, self.worker_id, limit=limit)
+        finally:
+            db.close()
+
+    def _requeue(self):
+        db = SessionLocal()
+        try:
+            n = jobs.requeue_stale(db)
+            if n:
+                logger.info('requeued %d stale job(s)', n)
+        finally:
+            db.close()
+
+    def run(self):
+        logger.info('worker %s starting: mode=%s concurrency=%d', self.worker_id, self.mode, self.concurrency)
+        ensure_schema()
+        in_flight = set()
+        last_requeue = 0.0
+        with self._make_pool() as pool:
+            while not self._stopping:
+                if time.monotonic() - last_requeue >= self.requeue_interval:
+                    self._requeue()
+                    last_requeue = time.monotonic()
+                free = self.concurrency - len(in_flight)
+                claimed = self._claim(free * self.batch_size) if free > 0 else []
+                if self.batch_size == 1:
+                    for job_id in claimed:
+                        in_flight.add(pool.submit(jobs.execute_job, job_id, self.worker_id))
+                else:
+                    for i in range(0, len(claimed), self.batch_size):
+                        chunk = claimed[i:i + self.batch_size]
+                        in_flight.add(pool.submit(jobs.execute_batch, chunk, self.worker_id))
+                if in_flight:
+                    done, in_flight = wait(in_flight, timeout=self.poll_interval if not claimed else 0, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        exc = fut.exception()
+                        if exc is not None:
+                            logger.error('job crashed: %r', exc)
+                elif not claimed:
+                    time.sleep(self.poll_interval)
+            # let running jobs finish so their leases are released cleanly
+            wait(in_flight)
+        logger.info('worker %s stopped', self.worker_id)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the OCR job worker')
+    parser.add_argument('--concurrency', type=int, default=int(os.getenv('OCR_WORKER_CONCURRENCY', '4')))
+    parser.add_argument('--mode', choices=['thread', 'process'], default=os.getenv('OCR_WORKER_MODE', 'thread'))
+    parser.add_argument('--poll-interval', type=float, default=1.0)
+    parser.add_argument('--requeue-interval', type=float, default=30.0)
+    parser.add_argument('--batch-size', type=int, default=None, help='jobs per Gemini request (default OCR_BATCH_SIZE)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s [%(name)s] %(message)s')
+
+    worker = Worker(args.concurrency, args.mode, args.poll_interval, args.requeue_interval, args.batch_size)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Micro-benchmark: OCR word extraction, legacy walk+regex vs WordExtractor.
+
+    python -m benchmarks.extraction_bench --mb 1 --repeat 5
+
+Builds an OCR-like response holding ~N MB of text split across
+per-line prediction blocks (with the bounding boxes and confidences a real
+response carries) and times both implementations on it.
+"""
+import argparse
+import random
+import re
+import time
+
+from backend.app.extraction import WordExtractor
+
+VOCAB = '''
+the quick brown fox jumps over lazy dog students read textbooks carefully while teachers explain
+difficult vocabulary examples sentences running walked studies children apples libraries don't
+it's we'll they're memory review schedule interval performance chapter exercise answer question
+'''.split()
+
+
+def legacy_extract(resp):
+    texts = []
+
+    def walk(obj):
+        if isinstance(obj, str):
+            texts.append(obj)
+        elif isinstance(obj, dict):
+            for v in obj.values():
+                walk(v)
+        elif isinstance(obj, list):
+            for v in obj:
+                walk(v)
+
+    walk(resp)
+    raw_text = '\n'.join(texts)
+    words = re.findall(r"\b[A-Za-z]+\b", raw_text)
+    return list({w.lower() for w in words if len(w) > 2})
+
+
+def build_response(mb: float, seed: int = 7):
+    rnd = random.Random(seed)
+    target = int(mb * 1024 * 1024)
+    blocks, size = [], 0
+    while size < target:
+        line = ' '.join(rnd.choice(VOCAB) for _ in range(12))
+        if rnd.random() < 0.1:
+            line += ' exam-\nple'
+        blocks.append({
+            'text': line,
+            'confidence': round(rnd.random(), 3),
+            'bbox': [rnd.randint(0, 2000) for _ in range(4)],
+            'language': 'en',
+            'block_id': f'blk-{len(blocks):08d}',
+        })
+        size += len(line)
+    return {'predictions': blocks, 'model': 'gemini-image-1'}, size
+
+
+def best_of(fn, arg, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mb', type=float, default=1.0)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args(argv)
+
+    resp, size = build_response(args.mb)
+    legacy = best_of(legacy_extract, resp, args.repeat)
+    # a fresh extractor per run, so the token memo starts cold every time
+    new = best_of(lambda r: WordExtractor().extract_response(r), resp, args.repeat)
+    print(f'text: {size / 1024 / 1024:.2f} MB in {len(resp["predictions"])} blocks')
+    print(f'legacy walk+findall+set : {legacy * 1000:8.1f} ms')
+    print(f'WordExtractor           : {new * 1000:8.1f} ms  ({legacy / new:.1f}x faster)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark: random text uuid4 keys vs time-ordered 16-byte uuid7 keys.
+
+    python -m benchmarks.id_bench --rows 1000000
+    python -m benchmarks.id_bench --rows 10000000          # the sizing run
+    python -m benchmarks.id_bench --url postgresql://...   # native uuid on Postgres
+
+Inserts ``--rows`` user_words-shaped rows (id, user_id, next_review_at)
+into two otherwise identical tables, one keyed by ``str(uuid4())`` text
+and one by ``CompactUUID`` holding ``uuid7()``, and reports insert rate
+and table plus index size. The default database is a temporary SQLite
+file.
+"""
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, MetaData, String, Table, create_engine, text
+
+from backend.app.ids import CompactUUID, new_id
+
+BATCH = 50000
+
+
+def _tables(metadata):
+    legacy = Table('bench_ids_text', metadata,
+                   Column('id', String, primary_key=True),
+                   Column('user_id', String, nullable=False),
+                   Column('next_review_at', DateTime))
+    compact = Table('bench_ids_uuid7', metadata,
+                    Column('id', CompactUUID, primary_key=True),
+                    Column('user_id', String, nullable=False),
+                    Column('next_review_at', DateTime))
+    return legacy, compact
+
+
+def _fill(engine, table, make_id, rows, users):
+    now = datetime(2026, 1, 1)
+    started = time.perf_counter()
+    done = 0
+    while done < rows:
+        n = min(BATCH, rows - done)
+        batch = [
+            {'id': make_id(), 'user_id': users[(done + i) % len(users)],
+             'next_review_at': now + timedelta(minutes=done + i)}
+            for i in range(n)
+        ]
+        with engine.begin() as conn:
+            conn.execute(table.insert(), batch)
+        done += n
+    return time.perf_counter() - started
+
+
+def _size(engine, table_name):
+    with engine.connect() as conn:
+        if engine.dialect.name == 'postgresql':
+            return conn.execute(text('SELECT pg_total_relation_size(:t)'), {'t': table_name}).scalar()
+        # needs SQLITE_ENABLE_DBSTAT_VTAB, which the stock builds have
+        return conn.execute(text(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name = :t OR name IN "
+            "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :t)"
+        ), {'t': table_name}).scalar()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--url', default=None, help='database URL (default: a temporary SQLite file)')
+    args = parser.parse_args(argv)
+
+    users = [str(uuid.uuid4()) for _ in range(args.users)]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.url or f'sqlite:///{os.path.join(tmp, "ids.db")}', future=True)
+        metadata = MetaData()
+        legacy, compact = _tables(metadata)
+        metadata.drop_all(engine)
+        metadata.create_all(engine)
+        try:
+            print(f'{args.rows} rows on {engine.dialect.name}')
+            for name, table, make_id in (('text uuid4   ', legacy, lambda: str(uuid.uuid4())),
+                                         ('uuid7 compact', compact, new_id)):
+                seconds = _fill(engine, table, make_id, args.rows, users)
+                size = _size(engine, table.name) or 0
+                print(f'{name}: {args.rows / seconds:10.0f} rows/s  {size / 1024 / 1024:8.1f} MB table+indexes')
+        finally:
+            metadata.drop_all(engine)
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
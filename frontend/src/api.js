@@ -56,13 +56,53 @@ class ApiClient {
     return res.data
   }
 
-  async getLearningPlan() {
+  // Push-based alternative to polling getUploadStatus: the server sends a
+  // `status` snapshot, then `status` transitions and `words` batches.
+  // Returns a function that closes the stream.
+  subscribeUploadStatus(uploadId, { onStatus, onWords, onError } = {}) {
+    const source = new EventSource(`${API_BASE}/upload/${uploadId}/events`)
+    source.addEventListener('status', (e) => {
+      const data = JSON.parse(e.data)
+      if (data.status === 'done' || data.status === 'error') {
+        // stop EventSource from reconnecting after the final event
+        source.close()
+      }
+      if (onStatus) onStatus(data)
+    })
+    source.addEventListener('words', (e) => {
+      if (onWords) onWords(JSON.parse(e.data))
+    })
+    source.onerror = (err) => {
+      if (onError) onError(err, source)
+    }
+    return () => source.close()
+  }
+
+  // Returns { plans, next_cursor }; pass next_cursor back for the next page
+  async getLearningPlan(cursor = null, limit = 50) {
+    const params = { limit }
+    if (cursor) params.cursor = cursor
     const res = await axios.get(`${API_BASE}/learning/plan`, {
       headers: this.getHeaders(),
+      params,
     })
     return res.data
   }
 
+  // Next cards in queue order, due or not. Pass the etag of the previous
+  // result to get { notModified: true } while the queue is unchanged.
+  async getPrefetch(limit = 20, etag = null) {
+    const headers = this.getHeaders()
+    if (etag) headers['If-None-Match'] = etag
+    const res = await axios.get(`${API_BASE}/learning/prefetch`, {
+      headers,
+      params: { limit },
+      validateStatus: (s) => (s >= 200 && s < 300) || s === 304,
+    })
+    if (res.status === 304) return { notModified: true }
+    return { ...res.data, etag: res.headers.etag }
+  }
+
   async postProgress(wordId, performance) {
     const res = await axios.post(
       `${API_BASE}/learning/progress`,
@@ -76,6 +116,19 @@ class ApiClient {
     )
     return res.data
   }
+
+  // reviews: [{ review_id, word_id, performance, reviewed_at }]; review_id
+  // makes retries safe, the server skips ids it has already applied
+  async postProgressBatch(reviews) {
+    const res = await axios.post(
+      `${API_BASE}/learning/progress/batch`,
+      { reviews },
+      {
+        headers: this.getHeaders(),
+      }
+    )
+    return res.data
+  }
 }
 
 export default new ApiClient()
@@ -1,13 +1,17 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useRef } from 'react'
 import api from '../api'
 import '../styles/app.css'
 
+const PREFETCH_SIZE = 20
+
 export default function MainApp({ onLogout }) {
   const [activeTab, setActiveTab] = useState('upload')
   const [uploadFile, setUploadFile] = useState(null)
   const [uploadStatus, setUploadStatus] = useState(null)
   const [uploadId, setUploadId] = useState(null)
   const [learningPlan, setLearningPlan] = useState([])
+  // prefetched cards, shown once due; reviews are applied locally first
+  const queue = useRef({ cards: [], etag: null })
   const [error, setError] = useState('')
   const [loading, setLoading] = useState(false)
 
@@ -30,25 +34,25 @@ export default function MainApp({ onLogout }) {
       setUploadStatus('processing')
       setUploadFile(null)
 
-      // Poll for status every 500ms
-      const pollInterval = setInterval(async () => {
-        try {
-          const status = await api.getUploadStatus(result.upload_id)
+      // Status is pushed over Server-Sent Events instead of polled
+      const unsubscribe = api.subscribeUploadStatus(result.upload_id, {
+        onStatus: async (status) => {
           if (status.status === 'done') {
             setUploadStatus('done')
             setUploadId(null)
-            clearInterval(pollInterval)
             await loadLearningPlan()
           } else if (status.status === 'error') {
             setUploadStatus('error')
-            clearInterval(pollInterval)
           }
-        } catch (err) {
-          console.error('Error polling upload status:', err)
-        }
-      }, 500)
+        },
+        onError: (err, source) => {
+          if (source.readyState === EventSource.CLOSED) {
+            console.error('Upload status stream closed:', err)
+          }
+        },
+      })
 
-      setTimeout(() => clearInterval(pollInterval), 30000) // Stop polling after 30s
+      setTimeout(unsubscribe, 300000) // Stop listening after 5 minutes
     } catch (err) {
       setError(err.response?.data?.detail || 'Upload failed')
     } finally {
@@ -56,21 +60,39 @@ export default function MainApp({ onLogout }) {
     }
   }
 
+  const showDue = () => {
+    const now = Date.now()
+    setLearningPlan(
+      queue.current.cards.filter((c) => new Date(c.next_review + 'Z').getTime() <= now)
+    )
+  }
+
   const loadLearningPlan = async () => {
     try {
-      const result = await api.getLearningPlan()
-      setLearningPlan(result.plans || [])
+      const result = await api.getPrefetch(PREFETCH_SIZE, queue.current.etag)
+      if (!result.notModified) {
+        queue.current = { cards: result.cards || [], etag: result.etag }
+      }
+      showDue()
     } catch (err) {
       console.error('Error loading learning plan:', err)
     }
   }
 
   const handleProgress = async (wordId, performance) => {
+    queue.current.cards = queue.current.cards.filter((c) => c.word_id !== wordId)
+    showDue()
     try {
       await api.postProgress(wordId, performance)
-      await loadLearningPlan()
+      // refill only when the local queue runs low
+      if (queue.current.cards.length < PREFETCH_SIZE / 2) {
+        await loadLearningPlan()
+      }
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to update progress')
+      // the removed card may still be due; force a full reload
+      queue.current.etag = null
+      await loadLearningPlan()
     }
   }
 
@@ -140,7 +162,9 @@ export default function MainApp({ onLogout }) {
                 {learningPlan.map((item) => (
                   <div key={item.word_id} className="word-card">
                     <div className="word-info">
-                      <p>Word ID: {item.word_id}</p>
+                      <p><strong>{item.lemma || item.word_id}</strong>{item.pronunciation ? ` /${item.pronunciation}/` : ''}</p>
+                      {item.definition && <p>{item.definition}</p>}
+                      {item.example && <p><em>{item.example}</em></p>}
                       <p>Interval: {item.interval_hours?.toFixed(2) || 0} hours</p>
                       <p>Reviews: {item.review_count || 0}</p>
                     </div>
@@ -16,7 +16,8 @@ from pathlib import Path
 os.environ['DATABASE_URL'] = 'sqlite:///./test_integration.db'
 
 # Clean up any previous test DB
-Path('test_integration.db').unlink(missing_ok=True)
+for _p in ('test_integration.db', 'test_integration.db-wal', 'test_integration.db-shm'):
+    Path(_p).unlink(missing_ok=True)
 
 from backend.app.main import app
 from fastapi.testclient import TestClient
@@ -126,10 +127,13 @@ from backend.app.db import SessionLocal
 from backend.app import models
 
 db = SessionLocal()
-word = models.Word(lemma='hello')
-db.add(word)
-db.commit()
-db.refresh(word)
+# the upload above may already have added 'hello' to the words table
+word = db.query(models.Word).filter(models.Word.lemma == 'hello').first()
+if word is None:
+    word = models.Word(lemma='hello')
+    db.add(word)
+    db.commit()
+    db.refresh(word)
 db.close()
 
 progress_response = client.post(
@@ -201,7 +205,8 @@ except Exception as e:
 
 # Clean up
 Path(test_file_path).unlink(missing_ok=True)
-Path('test_integration.db').unlink(missing_ok=True)
+for _p in ('test_integration.db', 'test_integration.db-wal', 'test_integration.db-shm'):
+    Path(_p).unlink(missing_ok=True)
 
 print("\n" + "=" * 60)
 print("✓ All integration tests passed!")
@@ -1,12 +1,20 @@
+import json
 import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import pytest
 
 # Ensure tests use the local sqlite test DB
 os.environ.setdefault('DATABASE_URL', 'sqlite:///./test.db')
 
 from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
 from backend.app.main import app
-from backend.app.db import SessionLocal
+from backend.app.db import Base, SessionLocal
 
 
 @pytest.fixture(scope='function')
@@ -23,3 +31,110 @@ def db_session():
 def client():
     """Provide a shared FastAPI test client for all tests in a module."""
     return TestClient(app)
+
+
+@pytest.fixture()
+def mem_engine():
+    """An in-memory SQLite engine with every table created."""
+    engine = create_engine('sqlite://', future=True)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture()
+def session_factory(mem_engine):
+    """A sessionmaker bound to ``mem_engine``."""
+    return sessionmaker(bind=mem_engine, future=True)
+
+
+@pytest.fixture()
+def mem_db(session_factory):
+    """A session on ``mem_engine``, closed after the test."""
+    db = session_factory()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture()
+def file_engine(tmp_path):
+    """A SQLite file engine with every table created, for tests that need
+    separate connections or threads to see each other's commits."""
+    engine = create_engine(f'sqlite:///{tmp_path / "test.db"}', future=True)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture()
+def file_session_factory(file_engine):
+    """A sessionmaker bound to ``file_engine``."""
+    return sessionmaker(bind=file_engine, future=True)
+
+
+class PredictStub:
+    """Local stand-in for the Gemini predict endpoint.
+
+    ``respond(body, n)`` builds the JSON reply to the ``n``-th request
+    (echoing the body by default); ``statuses`` are used for the first
+    replies, then 200. ``calls`` holds every request body received.
+    """
+
+    def __init__(self, respond=None, statuses=(), delay=0.0):
+        self.respond = respond or (lambda body, n: {'predictions': [{'echo': body}]})
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with stub.lock:
+                    n = len(stub.calls)
+                    stub.calls.append(body)
+                    stub.active += 1
+                    stub.max_active = max(stub.max_active, stub.active)
+                    status = stub.statuses.pop(0) if stub.statuses else 200
+                time.sleep(stub.delay)
+                out = json.dumps(stub.respond(body, n)).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+                with stub.lock:
+                    stub.active -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_address[1]}/predict'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture()
+def predict_server():
+    """Start ``PredictStub`` servers on demand; all are shut down afterwards."""
+    stubs = []
+
+    def make(respond=None, statuses=(), delay=0.0):
+        stub = PredictStub(respond, statuses, delay)
+        stubs.append(stub)
+        return stub
+
+    yield make
+    for stub in stubs:
+        stub.close()
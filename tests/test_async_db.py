@@ -0,0 +1,111 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from backend.app import models, plan_cache
+from backend.app.api_async import build_router
+from backend.app.auth import Principal, get_current_user_async
+from backend.app.db_async import async_url, get_async_db, make_async_engine
+from backend.app.learning import MemoryService
+from backend.app.storage import BlobStore
+
+
+@pytest.fixture()
+def seeded(file_engine, file_session_factory):
+    db = file_session_factory()
+    user = models.User(email='as@example.com', password_hash='x')
+    word = models.Word(lemma='async', definition='not at once')
+    db.add_all([user, word])
+    db.commit()
+    ids = user.id, word.id
+    db.close()
+    return str(file_engine.url), ids
+
+
+def test_async_url_picks_async_drivers():
+    assert async_url('postgresql://u:p@h/db').drivername == 'postgresql+asyncpg'
+    assert async_url('sqlite:///./dev.db').drivername == 'sqlite+aiosqlite'
+
+
+def test_memory_service_async_variants(seeded):
+    url, (user_id, word_id) = seeded
+
+    async def run():
+        engine = make_async_engine(url)
+        Session = async_sessionmaker(engine, expire_on_commit=False)
+        ms = MemoryService()
+        async with Session() as db:
+            await ms.update_progress_async(db, user_id, word_id, 0.3)
+            plans, cursor = await ms.plan_page_async(db, user_id)
+            results = await ms.apply_reviews_async(db, user_id, [{'word_id': word_id, 'performance': 0.9}])
+        await engine.dispose()
+        return plans, cursor, results
+
+    plans, cursor, results = asyncio.run(run())
+    # a first review leaves the card due
+    assert [p['lemma'] for p in plans] == ['async']
+    assert cursor is None
+    assert results[0]['status'] == 'applied'
+
+
+def test_async_paths_keep_cache_calls_off_the_event_loop(seeded, monkeypatch):
+    url, (user_id, word_id) = seeded
+    cache = plan_cache.LocalPlanCache()
+    calls = []
+    for name in ('due', 'token', 'fill', 'update'):
+        def spy(*args, _orig=getattr(cache, name), _name=name):
+            # stands in for a blocking Redis round trip
+            calls.append((_name, threading.get_ident()))
+            return _orig(*args)
+        monkeypatch.setattr(cache, name, spy)
+    monkeypatch.setattr(plan_cache, '_cache', cache)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        engine = make_async_engine(url)
+        Session = async_sessionmaker(engine, expire_on_commit=False)
+        ms = MemoryService()
+        async with Session() as db:
+            await ms.plan_page_async(db, user_id)
+            await ms.update_progress_async(db, user_id, word_id, 0.3)
+            plans, _ = await ms.plan_page_async(db, user_id)
+            await ms.apply_reviews_async(db, user_id, [{'word_id': word_id, 'performance': 0.9}])
+        await engine.dispose()
+        return loop_thread, plans
+
+    loop_thread, plans = asyncio.run(run())
+    assert [p['lemma'] for p in plans] == ['async']
+    assert {name for name, _ in calls} == {'due', 'token', 'fill', 'update'}
+    assert all(thread != loop_thread for _, thread in calls)
+
+
+def test_async_router_serves_learning_endpoints(seeded, tmp_path):
+    url, (user_id, word_id) = seeded
+    engine = make_async_engine(url)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def override_db():
+        async with Session() as db:
+            yield db
+
+    app = FastAPI()
+    app.include_router(build_router(BlobStore(str(tmp_path / 'blobs')), 'worker', 200, 500))
+    app.dependency_overrides[get_async_db] = override_db
+    app.dependency_overrides[get_current_user_async] = lambda: Principal(user_id)
+    client = TestClient(app)
+
+    r = client.post('/api/v1/learning/progress', json={'word_id': word_id, 'performance': 0.9})
+    assert r.status_code == 200
+    assert r.json()['interval_hours'] == 0
+    r = client.get('/api/v1/learning/plan')
+    assert r.status_code == 200
+    assert [p['lemma'] for p in r.json()['plans']] == ['async']
+    r = client.post('/api/v1/upload', files={'file': ('a.txt', b'hello async world')})
+    assert r.status_code == 200
+    r = client.get(f"/api/v1/upload/{r.json()['upload_id']}")
+    assert r.json()['status'] == 'pending'
+    assert client.get('/api/v1/upload/missing').status_code == 404
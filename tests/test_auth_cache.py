@@ -0,0 +1,77 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from backend.app import auth, models
+from backend.app.cache import TTLCache
+
+
+@pytest.fixture(autouse=True)
+def principals(monkeypatch):
+    monkeypatch.setattr(auth, '_principals', TTLCache(ttl=60))
+
+
+def test_principal_is_cached_until_the_user_changes(mem_engine, session_factory):
+    db = session_factory()
+    user = models.User(email='c@example.com', password_hash='x', name='C')
+    db.add(user)
+    db.commit()
+    token = auth.create_access_token(auth.token_claims(user))
+    statements = []
+    event.listen(mem_engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+
+    first = auth.get_current_user(token, db)
+    assert (first.id, first.email) == (user.id, 'c@example.com')
+    n = len(statements)
+    assert auth.get_current_user(token, db) is first
+    assert len(statements) == n
+    assert auth.auth_cache_stats()['hits'] == 1
+
+    user.name = 'Renamed'
+    db.commit()
+    assert auth.get_current_user(token, db).name == 'Renamed'
+
+    db.delete(user)
+    db.commit()
+    with pytest.raises(HTTPException):
+        auth.get_current_user(token, db)
+    db.close()
+
+
+def test_principal_is_evicted_on_commit_not_flush(file_session_factory):
+    writer, reader = file_session_factory(), file_session_factory()
+    user = models.User(email='f@example.com', password_hash='x', name='Old')
+    writer.add(user)
+    writer.commit()
+    token = auth.create_access_token(auth.token_claims(user))
+
+    user.name = 'New'
+    writer.flush()
+    # a concurrent request between the flush and the commit sees the old row
+    assert auth.get_current_user(token, reader).name == 'Old'
+    reader.rollback()
+    writer.commit()
+    assert auth.get_current_user(token, reader).name == 'New'
+
+    # a rolled-back change leaves the cached principal alone
+    user.name = 'Discarded'
+    writer.flush()
+    writer.rollback()
+    hits = auth.auth_cache_stats()['hits']
+    assert auth.get_current_user(token, reader).name == 'New'
+    assert auth.auth_cache_stats()['hits'] == hits + 1
+    writer.close()
+    reader.close()
+
+
+def test_claims_mode_skips_the_lookup(mem_engine, session_factory, monkeypatch):
+    monkeypatch.setattr(auth, 'AUTH_CLAIMS_MODE', True)
+    user = models.User(id='u-claims', email='claims@example.com', name='Q')
+    token = auth.create_access_token(auth.token_claims(user))
+    db = session_factory()
+    statements = []
+    event.listen(mem_engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+    principal = auth.get_current_user(token, db)
+    assert (principal.id, principal.email, principal.name) == ('u-claims', 'claims@example.com', 'Q')
+    assert statements == []
+    db.close()
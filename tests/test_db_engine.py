@@ -0,0 +1,25 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+from backend.app.db import make_engine, pool_metrics
+
+
+def test_sqlite_file_gets_wal_profile_and_pool_metrics(tmp_path):
+    engine = make_engine(f'sqlite:///{tmp_path / "pool.db"}', pool_size=1, max_overflow=0, pool_timeout=0.05)
+    with engine.connect() as conn:
+        assert conn.execute(text('PRAGMA journal_mode')).scalar() == 'wal'
+        assert conn.execute(text('PRAGMA synchronous')).scalar() == 1  # NORMAL
+        assert conn.execute(text('PRAGMA busy_timeout')).scalar() == 5000
+        assert pool_metrics(engine)['saturation'] == 1.0
+        with pytest.raises(PoolTimeout):
+            engine.connect()
+    metrics = pool_metrics(engine)
+    assert metrics['pool'] == 'queue'
+    assert (metrics['checked_out'], metrics['checkouts'], metrics['timeouts']) == (0, 2, 1)
+    assert metrics['max_wait_ms'] >= 50
+    engine.dispose()
+
+
+def test_memory_sqlite_keeps_default_pool():
+    assert pool_metrics(make_engine('sqlite://'))['pool'] != 'queue'
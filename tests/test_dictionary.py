@@ -0,0 +1,131 @@
+import os
+from datetime import datetime, timedelta
+
+from backend.app import dictionary, models, plan_cache, sessions
+from backend.app.ingest import ingest_words
+
+ECDICT = (
+    'word,phonetic,definition,translation,pos,collins\n'
+    'apple,ˈæpl,"n. fruit with red or green skin\\nn. the tree",n. 苹果,n:100,5\n'
+    'Bank,bæŋk,n. sloping land beside water,n. 银行,n:90/v:10,4\n'
+    'zebra,ˈzebrə,,n. 斑马,n:100,2\n'
+    'apple,xx,duplicate,,,\n'
+)
+
+
+def _csv(tmp_path):
+    path = tmp_path / 'ecdict.csv'
+    path.write_text(ECDICT, encoding='utf-8')
+    return str(path)
+
+
+def test_index_lookup_matches_csv(tmp_path):
+    rows = list(dictionary.read_csv(_csv(tmp_path)))
+    assert [r['lemma'] for r in rows] == ['apple', 'bank', 'zebra']
+    assert rows[0]['definition'] == 'n. fruit with red or green skin\nn. the tree'
+    # no English definition: the Chinese translation only on request
+    assert rows[2]['definition'] is None
+    assert list(dictionary.read_csv(_csv(tmp_path), translation=True))[2]['definition'] == 'n. 斑马'
+
+    path = str(tmp_path / 'dict.idx')
+    assert dictionary.build_index(rows, path) == 3
+    index = dictionary.DictionaryIndex(path)
+    assert len(index) == 3
+    for row in rows:
+        assert index.get(row['lemma']) == {f: row[f] for f in dictionary.FIELDS}
+    assert index.get('banana') is None and index.get('') is None and index.get('zzz') is None
+    assert set(index.lookup(['zebra', 'nope', 'apple'])) == {'zebra', 'apple'}
+    index.close()
+
+
+def test_load_upserts_and_invalidates_affected_queues(tmp_path, monkeypatch, session_factory):
+    invalidated = []
+    monkeypatch.setattr(plan_cache, 'invalidate', invalidated.append)
+
+    db = session_factory()
+    learner, other = models.User(email='d1@example.com', password_hash='x'), models.User(email='d2@example.com', password_hash='x')
+    bank = models.Word(lemma='bank', example='kept')
+    unrelated = models.Word(lemma='river')
+    db.add_all([learner, other, bank, unrelated])
+    db.commit()
+    db.add_all([models.UserWord(user_id=learner.id, word_id=bank.id, next_review_at=datetime.utcnow() - timedelta(hours=1)),
+                models.UserWord(user_id=other.id, word_id=unrelated.id, next_review_at=datetime.utcnow())])
+    db.commit()
+    learner_id, other_id, bank_id = learner.id, other.id, bank.id
+    db.close()
+
+    stats = dictionary.load(dictionary.read_csv(_csv(tmp_path)), batch_size=2, session_factory=session_factory)
+    assert stats == {'rows': 3, 'inserted': 2, 'updated': 1, 'users_invalidated': 1}
+    assert invalidated == [learner_id]
+
+    db = session_factory()
+    bank = db.get(models.Word, bank_id)
+    assert bank.definition == 'n. sloping land beside water'
+    assert bank.pronunciation == 'bæŋk'
+    # an empty dictionary field never blanks a stored one
+    assert bank.example == 'kept'
+    assert sessions.queue_version(db, learner_id) == 1
+    assert sessions.queue_version(db, other_id) == 0
+    db.close()
+
+    # nothing changed the second time round
+    again = dictionary.load(dictionary.read_csv(_csv(tmp_path)), session_factory=session_factory)
+    assert again == {'rows': 3, 'inserted': 0, 'updated': 0, 'users_invalidated': 0}
+
+
+def test_ingest_and_enrich_use_the_index(tmp_path, monkeypatch, session_factory):
+    path = str(tmp_path / 'dict.idx')
+    dictionary.build_index(dictionary.read_csv(_csv(tmp_path)), path)
+    monkeypatch.setattr(plan_cache, '_cache', False)
+
+    db = session_factory()
+    user = models.User(email='d3@example.com', password_hash='x')
+    db.add_all([user, models.Word(lemma='bank')])
+    db.commit()
+
+    monkeypatch.setenv('DICT_INDEX_PATH', path)
+    monkeypatch.setattr(dictionary, '_index', None)
+    monkeypatch.setattr(dictionary, '_index_key', None)
+    ingest_words(db, user.id, ['apple', 'cherry', 'bank'])
+    db.commit()
+    words = {w.lemma: w for w in db.query(models.Word)}
+    assert words['apple'].pronunciation == 'ˈæpl' and words['apple'].pos == 'n:100'
+    assert words['cherry'].definition is None
+    # existing words are left to `enrich`
+    assert words['bank'].definition is None
+    db.close()
+
+    index = dictionary.get_index()
+    stats = dictionary.enrich(index, session_factory=session_factory)
+    index.close()
+    assert stats == {'scanned': 2, 'updated': 1, 'users_invalidated': 1}
+    db = session_factory()
+    assert db.query(models.Word).filter_by(lemma='bank').one().definition == 'n. sloping land beside water'
+    db.close()
+
+
+def test_get_index_picks_up_an_index_built_after_startup(tmp_path, monkeypatch, caplog):
+    path = tmp_path / 'late.idx'
+    monkeypatch.setenv('DICT_INDEX_PATH', str(path))
+    monkeypatch.setattr(dictionary, '_index', None)
+    monkeypatch.setattr(dictionary, '_index_key', None)
+    monkeypatch.setattr(dictionary, '_missing_logged', set())
+
+    assert dictionary.get_index() is None
+    assert dictionary.get_index() is None
+    # logged once, not on every ingest
+    assert sum('does not exist' in r.message for r in caplog.records) == 1
+
+    rows = list(dictionary.read_csv(_csv(tmp_path)))
+    dictionary.build_index(rows[:1], str(path))
+    first = dictionary.get_index()
+    assert first is not None and len(first) == 1
+    assert dictionary.get_index() is first
+
+    # rebuilt in place: reopened on the next call
+    dictionary.build_index(rows, str(path))
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10 ** 9))
+    second = dictionary.get_index()
+    assert second is not first and len(second) == 3
+    first.close()
+    second.close()
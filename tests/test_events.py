@@ -0,0 +1,40 @@
+import asyncio
+import threading
+
+from backend.app import events, jobs, models
+
+
+def test_local_broker_delivers_across_threads():
+    broker = events.LocalBroker()
+
+    async def scenario():
+        sub = await broker.subscribe('upload:1')
+        t = threading.Thread(target=broker.publish, args=('upload:1', {'event': 'status', 'status': 'done'}))
+        t.start()
+        msg = await sub.get(timeout=2)
+        t.join()
+        # other channels are not delivered
+        broker.publish('upload:2', {'event': 'status'})
+        assert await sub.get(timeout=0.05) is None
+        await sub.close()
+        return msg
+
+    assert asyncio.run(scenario()) == {'event': 'status', 'status': 'done'}
+    assert broker._subs == {}
+
+
+def test_claim_and_completion_publish_status(mem_db, monkeypatch):
+    published = []
+    monkeypatch.setattr(jobs, 'publish_upload', lambda upload_id, event, **data: published.append((upload_id, event, data)))
+    up = models.Upload(filename='p.png', storage_path='/nonexistent', status='pending')
+    mem_db.add(up)
+    mem_db.commit()
+    job = jobs.enqueue(mem_db, up.id)
+
+    jobs.claim(mem_db, 'worker-a')
+    jobs._complete(mem_db, job, up, 'worker-a', {'words': ['alpha', 'beta'], 'count': 2})
+
+    assert published == [
+        (up.id, 'status', {'status': 'processing'}),
+        (up.id, 'status', {'status': 'done', 'words': ['alpha', 'beta'], 'count': 2}),
+    ]
@@ -0,0 +1,57 @@
+from backend.app.extraction import WordExtractor, iter_text_fields, lemmatize, load_stopwords
+
+
+def test_only_text_fields_are_read():
+    resp = {
+        'predictions': [
+            {'text': 'Orange juice', 'confidence': 0.9, 'bbox': [1, 2, 3, 4], 'language': 'english'},
+            {'text': 'Banana bread', 'image': {'image_bytes': 'QUJDREVGR0g='}},
+        ],
+        'model': 'gemini-image-1',
+    }
+    assert list(iter_text_fields(resp)) == ['Orange juice', 'Banana bread']
+
+
+def test_counts_are_ordered_by_first_appearance():
+    resp = {'predictions': [{'text': 'Zebras eat grass. The zebra runs; apples fall.'}]}
+    counts = WordExtractor().extract_response(resp)
+    assert list(counts) == ['zebra', 'eat', 'grass', 'run', 'apple', 'fall']
+    assert counts['zebra'] == 2
+
+
+def test_hyphenation_contractions_and_stopwords():
+    texts = ["We didn't finish the exam-", "ple because it's children’s homework"]
+    counts = WordExtractor().extract(texts)
+    assert 'example' in counts
+    assert 'exam' not in counts
+    assert 'child' in counts
+    # "didn't" -> "did" -> stopword; "it's" -> "it" -> stopword
+    assert not {'didn', 'did', 'it', 'the', 'because'} & set(counts)
+
+
+def test_small_chunks_count_like_one_chunk():
+    texts = [
+        'Page one talks about rivers\nand moun-', 'tains near the exam-\n', 'ple village',
+        'a line split mid-\nword then more text\nand a trailing half of a sen', 'tence about forests',
+        'no newline here at all ', 'trans-\r\n  lation notes\nending with a hyphen-',
+    ]
+    whole = WordExtractor().extract(texts, chunk_chars=10 ** 9)
+    for size in (1, 8, 30, 60):
+        assert WordExtractor().extract(texts, chunk_chars=size) == whole
+    assert {'mountain', 'midword', 'translation'} <= set(whole)
+
+
+def test_lemmatize_common_forms():
+    pairs = {
+        'studies': 'study', 'watches': 'watch', 'running': 'run', 'making': 'make',
+        'played': 'play', 'agreed': 'agree', 'children': 'child', 'went': 'go', 'news': 'news',
+    }
+    assert {w: lemmatize(w) for w in pairs} == pairs
+
+
+def test_custom_stopword_file(tmp_path):
+    path = tmp_path / 'stop.txt'
+    path.write_text('# classroom noise\npage\nexercise\n')
+    extractor = WordExtractor(stopwords=load_stopwords(str(path)))
+    counts = extractor.extract(['Page 12 exercise: the answer'])
+    assert list(counts) == ['the', 'answer']
@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from backend.app import forecast, models
+
+
+def _card(user, word, due):
+    return models.UserWord(user_id=user.id, word_id=word.id, next_review_at=due)
+
+
+def test_forecast_buckets_in_one_query(mem_engine, monkeypatch, session_factory):
+    db = session_factory()
+    alice = models.User(email='a@example.com', password_hash='x')
+    bob = models.User(email='b@example.com', password_hash='x')
+    words = [models.Word(lemma=f'f{i}') for i in range(5)]
+    db.add_all([alice, bob, *words])
+    db.commit()
+    now = datetime(2024, 3, 10, 15, 30)
+    db.add_all([
+        _card(alice, words[0], now - timedelta(days=2)),
+        _card(alice, words[1], now + timedelta(hours=2)),
+        _card(alice, words[2], now + timedelta(days=1, hours=1)),
+        _card(alice, words[3], now + timedelta(days=30)),
+        _card(bob, words[0], now + timedelta(hours=3)),
+    ])
+    db.commit()
+    alice_id = alice.id
+
+    statements = []
+    event.listen(mem_engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+    result = forecast.compute(db, alice_id, days=3, bucket='day', now=now)
+    assert len(statements) == 1
+    assert result['overdue'] == 1
+    assert result['buckets'] == [
+        {'start': '2024-03-10', 'count': 1},
+        {'start': '2024-03-11', 'count': 1},
+        {'start': '2024-03-12', 'count': 0},
+        {'start': '2024-03-13', 'count': 0},
+    ]
+    assert result['total'] == 3
+
+    hourly = forecast.compute(db, None, days=1, bucket='hour', now=now)
+    assert len(hourly['buckets']) == 25
+    assert hourly['buckets'][0]['start'] == '2024-03-10T15:00'
+    counts = {b['start']: b['count'] for b in hourly['buckets'] if b['count']}
+    assert counts == {'2024-03-10T17:00': 1, '2024-03-10T18:00': 1}
+
+    # cached per user for a short while
+    monkeypatch.setattr(forecast, '_cache', forecast.TTLCache(ttl=60))
+    first = forecast.forecast(db, alice_id, days=3)
+    n = len(statements)
+    assert forecast.forecast(db, alice_id, days=3) is first
+    assert len(statements) == n
+    with pytest.raises(ValueError):
+        forecast.compute(db, alice_id, bucket='week')
+    db.close()
@@ -0,0 +1,62 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.app.gemini_client import GeminiClient, GeminiError
+
+
+def _run(client, coro):
+    async def go():
+        try:
+            return await coro
+        finally:
+            await client.aclose()
+    return asyncio.run(go())
+
+
+def test_retries_transient_errors_then_succeeds(predict_server):
+    stub = predict_server(statuses=[503, 429])
+    client = GeminiClient('k', stub.url, max_attempts=3, backoff_base=0.01, backoff_cap=0.02)
+    resp = _run(client, client.predict({'instances': [1]}))
+    assert resp['predictions'][0]['echo'] == {'instances': [1]}
+    assert len(stub.calls) == 3
+
+
+def test_bad_request_is_not_retried(predict_server):
+    stub = predict_server(statuses=[400])
+    client = GeminiClient('k', stub.url, max_attempts=3, backoff_base=0.01)
+    with pytest.raises(GeminiError):
+        _run(client, client.predict({}))
+    assert len(stub.calls) == 1
+
+
+def test_in_flight_cap(predict_server):
+    stub = predict_server(delay=0.05)
+    client = GeminiClient('k', stub.url, max_in_flight=3)
+
+    async def burst():
+        return await asyncio.gather(*(client.predict({'i': i}) for i in range(12)))
+
+    results = _run(client, burst())
+    assert len(results) == 12
+    assert stub.max_active <= 3
+
+
+def test_deadline_covers_waiting_for_a_slot(predict_server):
+    stub = predict_server(delay=0.5)
+    client = GeminiClient('k', stub.url, max_in_flight=1, max_attempts=1)
+
+    async def queued():
+        slow = asyncio.ensure_future(client.predict({'i': 0}, deadline=5))
+        await asyncio.sleep(0.05)
+        started = time.monotonic()
+        with pytest.raises(GeminiError):
+            await client.predict({'i': 1}, deadline=0.1)
+        elapsed = time.monotonic() - started
+        await slow
+        return elapsed
+
+    # gives up while the slow call still holds the only slot
+    assert _run(client, queued()) < 0.3
+    assert len(stub.calls) == 1
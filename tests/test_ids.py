@@ -0,0 +1,29 @@
+import uuid
+
+from sqlalchemy import text
+
+from backend.app import models
+from backend.app.ids import new_id, uuid7
+
+
+def test_uuid7_is_versioned_and_time_ordered():
+    ids = [uuid7() for _ in range(5000)]
+    assert all(u.version == 7 and u.variant == uuid.RFC_4122 for u in ids)
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_user_word_ids_are_stored_as_16_bytes(mem_db):
+    user = models.User(email='id@example.com', password_hash='x')
+    word = models.Word(lemma='compact')
+    mem_db.add_all([user, word])
+    mem_db.commit()
+    legacy = str(uuid.uuid4())
+    mem_db.add_all([models.UserWord(user_id=user.id, word_id=word.id), models.UserWord(id=legacy, user_id=user.id)])
+    mem_db.commit()
+
+    assert mem_db.execute(text('SELECT DISTINCT typeof(id), length(id) FROM user_words')).all() == [('blob', 16)]
+    ids = {uw.id for uw in mem_db.query(models.UserWord)}
+    assert legacy in ids and all(len(i) == 36 for i in ids)
+    assert mem_db.query(models.UserWord).filter(models.UserWord.id == legacy).one().word_id is None
+    assert uuid.UUID(new_id()).version == 7
@@ -0,0 +1,71 @@
+from sqlalchemy import event, false
+
+from backend.app import models, sessions
+from backend.app.ingest import ingest_words
+
+
+def _count_statements(engine):
+    counter = {'n': 0}
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _count(*args):
+        counter['n'] += 1
+
+    return counter
+
+
+def test_bulk_ingest_uses_few_statements(mem_engine, session_factory):
+    db = session_factory()
+    user = models.User(email='bulk@example.com', password_hash='x')
+    existing = models.Word(lemma='word00007')
+    db.add_all([user, existing])
+    db.commit()
+
+    lemmas = [f'word{i:05d}' for i in range(2000)]
+    counter = _count_statements(mem_engine)
+    stats = ingest_words(db, user.id, lemmas)
+    db.commit()
+
+    assert stats == {'words': 2000, 'user_words_created': 2000}
+    # ~5 statements per 500-word chunk, not one round trip per word
+    assert counter['n'] <= 25
+    assert db.query(models.Word).count() == 2000
+    assert db.query(models.Word).filter(models.Word.lemma == 'word00007').one().id == existing.id
+
+    # idempotent: a second upload of the same words creates nothing
+    again = ingest_words(db, user.id, lemmas[:10])
+    db.commit()
+    assert again['user_words_created'] == 0
+    assert db.query(models.UserWord).count() == 2000
+    db.close()
+
+
+def test_concurrent_ingest_counts_only_rows_it_created(session_factory):
+    db = session_factory()
+    user = models.User(email='race@example.com', password_hash='x')
+    db.add(user)
+    db.commit()
+    ingest_words(db, user.id, ['alpha', 'beta'])
+    db.commit()
+    version = sessions.queue_version(db, user.id)
+
+    # the other ingest committed after our check for existing user_words
+    hidden = []
+
+    @event.listens_for(db, 'do_orm_execute')
+    def _stale_read(state):
+        if not hidden and state.is_select and 'user_words.word_id' in str(state.statement):
+            hidden.append(state.statement)
+            return state.invoke_statement(statement=state.statement.where(false()))
+
+    stats = ingest_words(db, user.id, ['alpha', 'beta', 'gamma'])
+    db.commit()
+    assert stats['user_words_created'] == 1
+    assert db.query(models.UserWord).count() == 3
+
+    again = ingest_words(db, user.id, ['alpha'])
+    db.commit()
+    assert again['user_words_created'] == 0
+    # one bump for the row that landed, none for the no-op
+    assert sessions.queue_version(db, user.id) == version + 1
+    db.close()
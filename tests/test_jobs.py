@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta
+
+from backend.app import jobs, models
+
+
+def _make_upload(db):
+    up = models.Upload(filename='p.png', storage_path='/nonexistent', status='pending')
+    db.add(up)
+    db.commit()
+    return up
+
+
+def test_job_is_claimed_only_once(mem_db):
+    up = _make_upload(mem_db)
+    job = jobs.enqueue(mem_db, up.id)
+
+    assert jobs.claim(mem_db, 'worker-a') == [job.id]
+    assert jobs.claim(mem_db, 'worker-b') == []
+    mem_db.refresh(up)
+    assert up.status == 'processing'
+
+
+def test_stale_processing_job_is_requeued(mem_db):
+    up = _make_upload(mem_db)
+    job = jobs.enqueue(mem_db, up.id)
+    jobs.claim(mem_db, 'worker-a')
+    job.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    mem_db.commit()
+
+    assert jobs.requeue_stale(mem_db) == 1
+    mem_db.refresh(job)
+    mem_db.refresh(up)
+    assert job.status == 'queued'
+    assert up.status == 'pending'
+    # the original worker lost its lease and cannot finish the job
+    assert jobs.claim(mem_db, 'worker-b') == [job.id]
+    assert not jobs.renew_lease(mem_db, job.id, 'worker-a')
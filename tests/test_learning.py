@@ -10,18 +10,21 @@ from fastapi.testclient import TestClient
 from backend.app.main import app
 
 
+def _remove_db():
+    # with the SQLite WAL profile the database comes with -wal/-shm files
+    for path in ('test.db', 'test.db-wal', 'test.db-shm'):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
 def setup_module(module):
-    try:
-        os.remove('test.db')
-    except FileNotFoundError:
-        pass
+    _remove_db()
 
 
 def teardown_module(module):
-    try:
-        os.remove('test.db')
-    except FileNotFoundError:
-        pass
+    _remove_db()
 
 
 def get_client_and_headers():
@@ -153,3 +156,48 @@ def test_integration_full_flow(monkeypatch):
     r = client.get('/api/v1/learning/plan', headers=headers)
     assert r.status_code == 200
 
+
+
+def test_batch_progress_endpoint():
+    client, headers = get_client_and_headers()
+    w = ensure_word('pear')
+    body = {'reviews': [{'review_id': 'batch-1', 'word_id': w.id, 'performance': 0.9}]}
+    r = client.post('/api/v1/learning/progress/batch', json=body, headers=headers)
+    assert r.status_code == 200
+    assert r.json()['results'][0]['status'] == 'applied'
+    # a retried request is not applied twice
+    r = client.post('/api/v1/learning/progress/batch', json=body, headers=headers)
+    assert r.json()['results'][0]['status'] == 'duplicate'
+
+
+def test_forecast_endpoint_counts_due_cards():
+    client, headers = get_client_and_headers()
+    word_id = ensure_word('forecast').id
+    r = client.post('/api/v1/learning/progress', json={'word_id': word_id, 'performance': 0.9}, headers=headers)
+    assert r.status_code == 200
+    r = client.get('/api/v1/learning/forecast?days=3', headers=headers)
+    assert r.status_code == 200
+    body = r.json()
+    assert body['bucket'] == 'day' and len(body['buckets']) == 4
+    assert body['total'] >= 1
+    r = client.get('/api/v1/learning/forecast?days=30&bucket=hour', headers=headers)
+    assert r.status_code == 400
+
+
+def test_prefetch_is_not_modified_until_a_review():
+    client, headers = get_client_and_headers()
+    word_id = ensure_word('prefetch').id
+    r = client.post('/api/v1/learning/progress', json={'word_id': word_id, 'performance': 0.9}, headers=headers)
+    assert r.status_code == 200
+    r = client.get('/api/v1/learning/prefetch?limit=50', headers=headers)
+    assert r.status_code == 200
+    etag = r.headers['etag']
+    # upcoming cards are included, not only due ones
+    assert word_id in [c['word_id'] for c in r.json()['cards']]
+
+    r = client.get('/api/v1/learning/prefetch?limit=50', headers={**headers, 'If-None-Match': etag})
+    assert r.status_code == 304
+    client.post('/api/v1/learning/progress', json={'word_id': word_id, 'performance': 0.4}, headers=headers)
+    r = client.get('/api/v1/learning/prefetch?limit=50', headers={**headers, 'If-None-Match': etag})
+    assert r.status_code == 200
+    assert r.headers['etag'] != etag
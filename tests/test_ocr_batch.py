@@ -0,0 +1,32 @@
+import base64
+
+from backend.app.gemini_client import GeminiClient
+from backend.app.ocr_service import OCRService
+
+
+def _read_pages(body, n):
+    """Echo each instance back as a prediction; images containing 'bad'
+    come back as a per-item error."""
+    preds = []
+    for inst in body['instances']:
+        text = base64.b64decode(inst['image']['image_bytes']).decode()
+        preds.append({'error': 'unreadable'} if 'bad' in text else {'text': text})
+    return {'predictions': preds}
+
+
+def test_batch_is_one_request_and_isolates_bad_pages(tmp_path, predict_server):
+    stub = predict_server(_read_pages)
+    paths = []
+    for name, text in [('a', 'apple orchard'), ('b', 'bad page'), ('c', 'cherry blossom')]:
+        p = tmp_path / name
+        p.write_text(text)
+        paths.append(str(p))
+
+    svc = OCRService(api_key='test-key')
+    svc._client = GeminiClient('test-key', stub.url)
+    results = svc.process_batch(paths)
+
+    assert [len(body['instances']) for body in stub.calls] == [3]
+    assert set(results[0]['words']) == {'apple', 'orchard'}
+    assert isinstance(results[1], Exception)
+    assert set(results[2]['words']) == {'cherry', 'blossom'}
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+
+from backend.app import models
+from backend.app.ocr_cache import OCRCache
+
+
+def test_cache_hit_after_put(mem_db):
+    cache = OCRCache()
+    assert cache.get(mem_db, 'abc', 'gemini-image-1') is None
+    raw = {'pages_total': 2, 'pages_failed': 0, 'note': None}
+    cache.put(mem_db, 'abc', 'gemini-image-1', {'words': ['apple', 'banana'], 'count': 2, 'raw_result': raw})
+
+    entry = cache.get(mem_db, 'abc', 'gemini-image-1')
+    assert entry is not None
+    assert entry.words.split(',') == ['apple', 'banana']
+    assert entry.hits == 1
+    assert cache.result(entry) == {'words': ['apple', 'banana'], 'count': 2, 'raw_result': raw}
+    # a different model is a different cache key
+    assert cache.get(mem_db, 'abc', 'other-model') is None
+
+
+def test_cache_ttl_and_size_eviction(mem_db):
+    cache = OCRCache(ttl_hours=1, max_entries=2)
+    for h in ('h1', 'h2', 'h3'):
+        cache.put(mem_db, h, 'm', {'words': [h], 'count': 1})
+    old = mem_db.query(models.OCRCacheEntry).filter(models.OCRCacheEntry.content_hash == 'h1').one()
+    old.created_at = datetime.utcnow() - timedelta(hours=2)
+    mem_db.commit()
+
+    assert cache.get(mem_db, 'h1', 'm') is None
+    cache.evict(mem_db)
+    remaining = {e.content_hash for e in mem_db.query(models.OCRCacheEntry)}
+    assert remaining == {'h2', 'h3'}
@@ -0,0 +1,86 @@
+import pytest
+
+from backend.app import jobs, models, pdf
+from backend.app.db import get_db
+from backend.app.gemini_client import GeminiClient
+from backend.app.main import app
+from backend.app.ocr_service import OCRService
+
+pymupdf = pytest.importorskip('pymupdf')
+
+WORDS = ['alpha', 'bravo', 'charlie', 'delta', 'echo']
+
+
+def _page_words(body, n):
+    return {'predictions': [{'text': WORDS[n % len(WORDS)]}]}
+
+
+def _make_pdf(path, pages):
+    doc = pymupdf.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f'page {i}')
+    doc.save(str(path))
+    doc.close()
+
+
+def test_pdf_pages_are_ocred_individually(tmp_path, predict_server):
+    stub = predict_server(_page_words)
+    path = tmp_path / 'book.pdf'
+    _make_pdf(path, 5)
+    assert pdf.is_pdf(str(path))
+    assert pdf.page_count(str(path)) == 5
+
+    svc = OCRService(api_key='test-key')
+    svc._client = GeminiClient('test-key', stub.url)
+    results = list(svc.process_pdf(str(path), concurrency=2))
+
+    assert len(stub.calls) == 5
+    assert sorted(i for i, _ in results) == [0, 1, 2, 3, 4]
+    words = {w for _, r in results for w in r['words']}
+    assert words == set(WORDS)
+
+
+def test_partly_failed_pdf_is_not_cached(tmp_path, predict_server, file_session_factory, client, monkeypatch):
+    # the first page request is rejected outright; the other two pages read fine
+    stub = predict_server(_page_words, statuses=[400])
+
+    def make_service():
+        svc = OCRService(api_key='test-key')
+        svc._client = GeminiClient('test-key', stub.url)
+        return svc
+
+    monkeypatch.setattr(jobs.ocr_service, 'OCRService', make_service)
+    path = tmp_path / 'partial.pdf'
+    _make_pdf(path, 3)
+    db = file_session_factory()
+    up = models.Upload(filename='partial.pdf', storage_path=str(path), content_hash='partial', status='pending')
+    db.add(up)
+    db.commit()
+    job = jobs.enqueue(db, up.id)
+    jobs.claim(db, 'worker-a')
+
+    result = jobs.process_upload(db, up, 'worker-a', job.id)
+    assert result['raw_result'] == {'pages_total': 3, 'pages_failed': 1}
+    assert jobs._complete(db, job, up, 'worker-a', result) == 'done'
+    assert db.query(models.OCRCacheEntry).count() == 0
+
+    def override_db():
+        session = file_session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_db
+    try:
+        body = client.get(f'/api/v1/upload/{up.id}').json()
+    finally:
+        app.dependency_overrides.pop(get_db)
+    assert body['status'] == 'done'
+    assert (body['pages_done'], body['pages_total']) == (3, 3)
+    assert body['count'] == 2 and set(body['words']) == {'bravo', 'charlie'}
+
+    # the same file again: OCR runs again instead of serving the partial list
+    jobs.process_upload(db, up)
+    assert len(stub.calls) == 6
+    db.close()
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from backend.app import models, plan_cache
+from backend.app.learning import MemoryService
+
+
+@pytest.fixture()
+def cache(monkeypatch):
+    c = plan_cache.LocalPlanCache(max_users=10, ttl_seconds=60, per_user=3)
+    monkeypatch.setattr(plan_cache, '_cache', c)
+    return c
+
+
+def _setup(db, n):
+    user = models.User(email='p@example.com', password_hash='x')
+    words = [models.Word(lemma=f'w{i}') for i in range(n)]
+    db.add_all([user, *words])
+    db.commit()
+    base = datetime.utcnow() - timedelta(hours=n)
+    for i, w in enumerate(words):
+        db.add(models.UserWord(user_id=user.id, word_id=w.id, review_count=1, interval_hours=1.0,
+                               next_review_at=base + timedelta(hours=i)))
+    db.commit()
+    return user.id, [w.id for w in words]
+
+
+def _count_statements(engine):
+    counter = {'n': 0}
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _count(*args):
+        counter['n'] += 1
+
+    return counter
+
+
+def test_warm_plan_needs_no_query_and_sees_reviews(mem_engine, cache, session_factory):
+    db = session_factory()
+    user_id, word_ids = _setup(db, 2)
+    ms = MemoryService()
+    assert [p['word_id'] for p in ms.due_plans(db, user_id)] == word_ids
+
+    counter = _count_statements(mem_engine)
+    assert [p['word_id'] for p in ms.due_plans(db, user_id)] == word_ids
+    assert counter['n'] == 0
+
+    ms.update_progress(db, user_id, word_ids[0], 0.9)
+    n = counter['n']
+    assert [p['word_id'] for p in ms.due_plans(db, user_id)] == word_ids[1:]
+    assert counter['n'] == n
+    assert cache.info()['hits'] == 2
+    db.close()
+
+
+def test_partial_queue_falls_back_to_db(cache, session_factory):
+    db = session_factory()
+    user_id, word_ids = _setup(db, 5)
+    ms = MemoryService()
+    # only 3 rows per user are cached; asking for 4 due cards must not
+    # stop at what the cache holds
+    assert len(plan_cache.due_plans(db, user_id, limit=4)) == 4
+    assert plan_cache.due_plans(db, user_id, limit=2) == plan_cache.due_plans(db, user_id, limit=4)[:2]
+
+    # rescheduling past the cached horizon drops the card from the queue
+    ms.update_progress(db, user_id, word_ids[0], 0.9)
+    plans = plan_cache.due_plans(db, user_id, limit=5)
+    assert [p['word_id'] for p in plans] == word_ids[1:]
+    db.close()
+
+
+def test_fill_racing_a_write_is_dropped(cache):
+    token = cache.token('u1')
+    cache.update('u1', [(datetime.utcnow(), 'uw1', 'w1', 1.0, 1, None)])
+    cache.fill('u1', [], True, token)
+    assert cache.due('u1', datetime.utcnow(), 10) is None
+
+
+def test_keyset_pages_cover_ties_in_stable_order(mem_engine, cache, session_factory):
+    db = session_factory()
+    user = models.User(email='k@example.com', password_hash='x')
+    words = [models.Word(lemma=f'k{i}', definition=f'def {i}') for i in range(7)]
+    db.add_all([user, *words])
+    db.commit()
+    # one upload's worth of cards: all due at the same instant
+    due = datetime.utcnow() - timedelta(days=1)
+    db.add_all([models.UserWord(user_id=user.id, word_id=w.id, next_review_at=due) for w in words])
+    db.commit()
+    user_id = user.id
+
+    seen, cursor, pages = [], None, 0
+    counter = _count_statements(mem_engine)
+    while True:
+        plans, cursor = plan_cache.plan_page(db, user_id, limit=3, cursor=cursor)
+        seen.extend(plans)
+        pages += 1
+        if cursor is None:
+            break
+    assert pages == 3
+    assert sorted(p['lemma'] for p in seen) == [f'k{i}' for i in range(7)]
+    assert len({p['word_id'] for p in seen}) == 7
+    assert all(p['definition'] == 'def ' + p['lemma'][1:] for p in seen)
+    # first page looks for a study session then fills the cache, each later
+    # page is one keyset query
+    assert counter['n'] == 4
+
+    with pytest.raises(ValueError):
+        plan_cache.plan_page(db, user_id, cursor='not-a-cursor')
+    db.close()
+
+
+def test_redis_scores_round_trip_microseconds():
+    start = datetime(2026, 10, 17, 8, 30, 15, 123457)
+    for i in range(1000):
+        ts = start + timedelta(days=i * 37, microseconds=i * 7919)
+        score = plan_cache._score(ts)
+        assert isinstance(score, int) and float(score) == score
+        # what Redis stores and hands back is a double
+        assert plan_cache._from_score(float(score)) == ts
+        assert plan_cache.encode_cursor((plan_cache._from_score(float(score)), 'x')) == plan_cache.encode_cursor((ts, 'x'))
@@ -0,0 +1,49 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+from backend.app import preprocess
+
+
+def _collect(make_iter):
+    async def go():
+        return b''.join([chunk async for chunk in make_iter()])
+    return asyncio.run(go())
+
+
+def test_streamed_body_matches_json_payload():
+    import base64
+    images = [b'\x00' * 100001, b'abc', b'']
+    make_iter, length = preprocess.stream_instances(images, 'Extract "text"')
+    body = _collect(make_iter)
+
+    assert len(body) == length
+    payload = json.loads(body)
+    assert [base64.b64decode(i['image']['image_bytes']) for i in payload['instances']] == images
+    assert payload['instances'][0]['instructions'] == 'Extract "text"'
+
+
+def test_prepare_image_shrinks_and_strips_metadata():
+    Image = pytest.importorskip('PIL.Image')
+    img = Image.new('RGB', (3000, 2000), (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'
+    buf = io.BytesIO()
+    img.save(buf, format='PNG', exif=exif)
+    data = buf.getvalue()
+
+    out, info = preprocess.prepare_image(data, max_side=1000)
+    assert info['preprocessed'] is True
+    assert info['bytes_out'] == len(out) < len(data)
+    with Image.open(io.BytesIO(out)) as small:
+        assert max(small.size) == 1000
+        assert small.mode == 'L'
+        assert not small.getexif()
+
+
+def test_prepare_image_passes_through_non_images():
+    out, info = preprocess.prepare_image(b'plain text, not an image')
+    assert out == b'plain text, not an image'
+    assert info['preprocessed'] is False
@@ -0,0 +1,104 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from backend.app import models, reschedule
+from backend.app.learning import MemoryService
+
+NEW_BASE = [0.1, 1.0, 10, 20, 50, 100, 200, 400]
+
+
+def _random_rows(n, now):
+    ms = MemoryService()
+    rng = random.Random(7)
+    rows = []
+    for i in range(n):
+        rc = rng.randint(0, 10)
+        perf = rng.choice([None, 0.1, 0.6, 0.7, 0.8, 0.95])
+        last = None if rng.random() < 0.1 else now - timedelta(hours=rng.uniform(0, 2000), microseconds=rng.randint(0, 10 ** 6))
+        if rng.random() < 0.1:
+            interval = 0.0
+        else:
+            bucket = rng.choice([0.9, 0.7, 0.1])
+            interval = ms._adjust_interval(ms.base_intervals[min(rc, 7)], bucket)
+        nxt = None if last is None else last + timedelta(hours=interval)
+        rows.append(models.UserWord(id=str(uuid.UUID(int=i)), user_id='u', word_id=f'w{i}', review_count=rc,
+                                    interval_hours=interval, last_review_at=last, next_review_at=nxt,
+                                    last_performance=perf))
+    return rows
+
+
+@pytest.mark.parametrize('penalty', [0.0, 0.05])
+def test_vectorized_matches_scalar(penalty):
+    now = datetime(2026, 10, 17, 12, 0, 0)
+    rows = _random_rows(2000, now)
+    ms = MemoryService()
+    mask, intervals, nexts, perfs = reschedule.compute(
+        [r.review_count for r in rows], [r.interval_hours for r in rows],
+        np.array([r.last_review_at for r in rows], dtype='datetime64[us]'),
+        [r.last_performance for r in rows], NEW_BASE, ms.base_intervals, penalty, now,
+    )
+    nexts = nexts.astype(object)
+    for i, r in enumerate(rows):
+        expected = ms.reschedule(r, NEW_BASE, penalty, now)
+        assert bool(mask[i]) == (expected is not None)
+        if expected is None:
+            continue
+        assert intervals[i] == expected['interval_hours']
+        assert perfs[i] == expected['performance']
+        # timedelta(hours=x) and the vectorized path may round differently
+        assert abs(nexts[i] - expected['next_review']) <= timedelta(microseconds=1)
+
+
+def test_run_updates_in_chunks(session_factory):
+    now = datetime(2026, 10, 17, 12, 0, 0)
+    ms = MemoryService()
+    rows = _random_rows(250, now)
+    expected = {r.id: ms.reschedule(r, NEW_BASE, 0.0, now) for r in rows}
+    db = session_factory()
+    db.add_all(rows)
+    db.commit()
+    db.close()
+
+    seen = []
+    stats = reschedule.run(NEW_BASE, chunk_size=100, now=now, session_factory=session_factory, progress=seen.append)
+    assert stats['scanned'] == 250 and [s['scanned'] for s in seen] == [100, 200, 250]
+    assert stats['updated'] > 0
+
+    db = session_factory()
+    for r in db.query(models.UserWord):
+        if expected[r.id] is not None:
+            assert r.interval_hours == expected[r.id]['interval_hours']
+            assert abs(r.next_review_at - expected[r.id]['next_review']) <= timedelta(microseconds=1)
+    db.close()
+    # a second run has nothing left to change
+    assert reschedule.run(NEW_BASE, chunk_size=100, now=now, session_factory=session_factory)['updated'] == 0
+
+
+def test_overdue_penalty_is_applied_once(session_factory):
+    now = datetime(2026, 10, 17, 12, 0, 0)
+    ms = MemoryService()
+    # a 24h card two days overdue
+    card = models.UserWord(id=str(uuid.UUID(int=1)), user_id='u', word_id='w', review_count=3, interval_hours=24.0,
+                           last_review_at=now - timedelta(days=3), next_review_at=now - timedelta(days=2),
+                           last_performance=0.6)
+    db = session_factory()
+    db.add(card)
+    db.commit()
+    db.close()
+
+    base = ms.base_intervals
+    assert reschedule.run(base, overdue_penalty=0.05, now=now, session_factory=session_factory)['updated'] == 1
+    db = session_factory()
+    first = db.query(models.UserWord.interval_hours, models.UserWord.next_review_at).one()
+    db.close()
+    assert first.interval_hours == pytest.approx(24.0 * 0.9)
+
+    # a restart (or a second run) leaves the card alone
+    assert reschedule.run(base, overdue_penalty=0.05, now=now, session_factory=session_factory)['updated'] == 0
+    db = session_factory()
+    assert tuple(db.query(models.UserWord.interval_hours, models.UserWord.next_review_at).one()) == tuple(first)
+    db.close()
@@ -0,0 +1,130 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.exc import IntegrityError
+
+from backend.app import models
+from backend.app.learning import MemoryService
+
+
+def _setup(db, n=3):
+    user = models.User(email='r@example.com', password_hash='x')
+    words = [models.Word(lemma=f'w{i}') for i in range(n)]
+    db.add_all([user, *words])
+    db.commit()
+    return user, words
+
+
+def test_batch_matches_single_updates_and_is_idempotent(session_factory):
+    db = session_factory()
+    user, words = _setup(db)
+    ms = MemoryService()
+    # w0 is already being reviewed, w1 is new to the user
+    ms.update_progress(db, user.id, words[0].id, 0.9)
+
+    # after the single review, or the batch would be stale for w0
+    at = datetime.utcnow()
+    reviews = [
+        {'review_id': 'r1', 'word_id': words[0].id, 'performance': 0.9, 'reviewed_at': at},
+        {'review_id': 'r2', 'word_id': words[1].id, 'performance': 0.5, 'reviewed_at': at},
+        {'review_id': 'r3', 'word_id': 'missing', 'performance': 0.5},
+    ]
+    results = ms.apply_reviews(db, user.id, reviews)
+    assert [r['status'] for r in results] == ['applied', 'applied', 'error']
+
+    uw0 = db.query(models.UserWord).filter_by(user_id=user.id, word_id=words[0].id).one()
+    assert uw0.review_count == 2
+    # second review: base interval 12h, good performance -> x1.3
+    assert results[0]['interval_hours'] == pytest.approx(15.6)
+    assert uw0.next_review_at == at + timedelta(hours=15.6)
+    uw1 = db.query(models.UserWord).filter_by(user_id=user.id, word_id=words[1].id).one()
+    assert uw1.review_count == 1 and uw1.next_review_at < at
+
+    again = ms.apply_reviews(db, user.id, reviews[:2])
+    assert [r['status'] for r in again] == ['duplicate', 'duplicate']
+    assert again[0]['next_review'] == results[0]['next_review']
+    db.refresh(uw0)
+    assert uw0.review_count == 2
+    db.close()
+
+
+def test_older_review_arriving_late_does_not_move_schedule_back(session_factory):
+    db = session_factory()
+    user, words = _setup(db, n=1)
+    ms = MemoryService()
+    now = datetime.utcnow()
+    newer = ms.apply_reviews(db, user.id, [
+        {'review_id': 'new1', 'word_id': words[0].id, 'performance': 0.9, 'reviewed_at': now - timedelta(hours=1)},
+        {'review_id': 'new2', 'word_id': words[0].id, 'performance': 0.9, 'reviewed_at': now},
+    ])
+    uw = db.query(models.UserWord).one()
+    before = (uw.review_count, uw.last_review_at, uw.next_review_at, uw.interval_hours)
+
+    # an offline client syncs a review it made before both of those
+    late = {'review_id': 'old', 'word_id': words[0].id, 'performance': 0.1, 'reviewed_at': now - timedelta(days=2)}
+    result = ms.apply_reviews(db, user.id, [late])[0]
+    assert result['status'] == 'stale'
+    assert result['next_review'] == newer[1]['next_review']
+    db.refresh(uw)
+    assert (uw.review_count, uw.last_review_at, uw.next_review_at, uw.interval_hours) == before
+    # still part of the review history
+    assert db.query(models.ReviewEvent).filter_by(reviewed_at=late['reviewed_at']).count() == 1
+
+    assert ms.apply_reviews(db, user.id, [late])[0]['status'] == 'duplicate'
+    db.close()
+
+
+def test_single_review_and_batch_both_count(session_factory):
+    db, other = session_factory(), session_factory()
+    user, words = _setup(db, n=1)
+    ms = MemoryService()
+    ms.update_progress(db, user.id, words[0].id, 0.8)
+    ms.apply_reviews(other, user.id, [{'review_id': 'b1', 'word_id': words[0].id, 'performance': 0.6}])
+    uw = db.query(models.UserWord).one()
+    db.refresh(uw)
+    assert uw.review_count == 2
+    assert db.query(models.ReviewEvent).count() == 2
+    other.close()
+    db.close()
+
+
+def test_batch_uses_constant_statements(mem_engine, session_factory):
+    db = session_factory()
+    user, words = _setup(db, n=100)
+    ms = MemoryService()
+    user_id, word_ids = user.id, [w.id for w in words]
+    counter = {'n': 0}
+
+    @event.listens_for(mem_engine, 'before_cursor_execute')
+    def _count(*args):
+        counter['n'] += 1
+
+    reviews = [{'review_id': f'r{i}', 'word_id': wid, 'performance': 0.7} for i, wid in enumerate(word_ids)]
+    results = ms.apply_reviews(db, user_id, reviews)
+    assert all(r['status'] == 'applied' for r in results)
+    # receipts, user_words, words, then insert user_words + receipts
+    assert counter['n'] <= 8
+    db.close()
+
+
+def test_user_word_is_unique_and_due_query_uses_index(session_factory):
+    db = session_factory()
+    user, words = _setup(db, n=1)
+    ms = MemoryService()
+    ms.update_progress(db, user.id, words[0].id, 0.9)
+    ms.update_progress(db, user.id, words[0].id, 0.9)
+    rows = db.query(models.UserWord).filter_by(user_id=user.id, word_id=words[0].id).all()
+    assert len(rows) == 1 and rows[0].review_count == 2
+
+    db.add(models.UserWord(user_id=user.id, word_id=words[0].id))
+    with pytest.raises(IntegrityError):
+        db.commit()
+    db.rollback()
+
+    plan = db.execute(text(
+        'EXPLAIN QUERY PLAN SELECT * FROM user_words WHERE user_id = :u AND next_review_at <= :n '
+        'ORDER BY next_review_at LIMIT 50'
+    ), {'u': user.id, 'n': datetime.utcnow()}).all()
+    assert 'ix_user_words_user_next_review_id' in ' '.join(str(r) for r in plan)
+    db.close()
@@ -0,0 +1,41 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.app import models, review_log
+from backend.app.learning import MemoryService
+
+
+def test_reviews_append_events_and_compaction_folds_them(mem_db):
+    user = models.User(email='e@example.com', password_hash='x')
+    word = models.Word(lemma='event')
+    mem_db.add_all([user, word])
+    mem_db.commit()
+    ms = MemoryService()
+    ms.update_progress(mem_db, user.id, word.id, 0.9)
+    ms.update_progress(mem_db, user.id, word.id, 0.4)
+    old = datetime.utcnow() - timedelta(days=3)
+    ms.apply_reviews(mem_db, user.id, [{'word_id': word.id, 'performance': 0.7, 'reviewed_at': old}])
+
+    events = mem_db.query(models.ReviewEvent).order_by(models.ReviewEvent.reviewed_at).all()
+    # the back-dated review is logged but, being older than the last one,
+    # does not count as a new step in the schedule
+    assert [e.review_count for e in events] == [2, 1, 2]
+    assert events[0].reviewed_at == old
+    assert events[0].interval_before == events[0].interval_after == events[2].interval_after
+    assert events[1].interval_before is None
+    assert events[2].interval_before == events[1].interval_after
+
+    stats = review_log.compact(mem_db, datetime.utcnow() - timedelta(days=1))
+    assert stats == {'events': 1, 'words': 1, 'partitions_dropped': []}
+    uw = mem_db.query(models.UserWord).one()
+    mem_db.refresh(uw)
+    assert (uw.history_reviews, uw.history_lapses, uw.history_performance_sum) == (1, 0, 0.7)
+    assert mem_db.query(models.ReviewEvent).count() == 2
+
+    # compacting everything adds to the summary instead of overwriting it
+    review_log.compact(mem_db, datetime.utcnow() + timedelta(seconds=1))
+    mem_db.refresh(uw)
+    assert (uw.history_reviews, uw.history_lapses) == (3, 1)
+    assert uw.history_performance_sum == pytest.approx(2.0)
+    assert mem_db.query(models.ReviewEvent).count() == 0
@@ -0,0 +1,49 @@
+import pytest
+from sqlalchemy import create_engine, event, inspect
+
+from backend.app import schema
+from backend.app.schema import SchemaError, SchemaManager
+
+
+def test_create_runs_once(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "create.db"}', future=True)
+    manager = SchemaManager(engine, mode='create')
+    manager.ensure()
+    assert 'user_words' in inspect(engine).get_table_names()
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+    manager.ensure()
+    assert statements == []
+
+
+def test_check_fails_fast_until_upgraded(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path / "check.db"}', future=True)
+    with pytest.raises(SchemaError):
+        SchemaManager(engine, mode='check').ensure()
+
+    upgraded = SchemaManager(engine, mode='upgrade')
+    upgraded.ensure()
+    assert upgraded.current == upgraded.head is not None
+    checked = SchemaManager(engine, mode='check')
+    checked.ensure()
+    assert checked.status()['ready']
+
+
+class _NoLock:
+    def __enter__(self):
+        raise AssertionError('lock taken after the schema was settled')
+
+    def __exit__(self, *exc):
+        return False
+
+
+def test_settled_schema_takes_no_locks(tmp_path, monkeypatch):
+    engine = create_engine(f'sqlite:///{tmp_path / "fast.db"}', future=True)
+    manager = SchemaManager(engine, mode='create')
+    monkeypatch.setattr(schema, '_manager', manager)
+    schema.ensure_schema()
+    assert manager.ready
+    monkeypatch.setattr(schema, '_manager_lock', _NoLock())
+    monkeypatch.setattr(manager, '_lock', _NoLock())
+    schema.ensure_schema()
+    assert schema.get_schema_manager() is manager
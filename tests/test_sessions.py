@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+
+from backend.app import models, plan_cache, sessions
+from backend.app.learning import MemoryService
+
+
+def test_nightly_sessions_serve_first_page_until_a_review(file_engine, file_session_factory, monkeypatch):
+    monkeypatch.setattr(plan_cache, '_cache', False)
+
+    db = file_session_factory()
+    users = [models.User(email=f's{i}@example.com', password_hash='x') for i in range(3)]
+    words = [models.Word(lemma=f's{i}', definition=f'def {i}') for i in range(4)]
+    db.add_all([*users, *words])
+    db.commit()
+    user_ids, word_ids = [u.id for u in users], [w.id for w in words]
+    now = datetime.utcnow()
+    for i, uid in enumerate(user_ids):
+        # the last user has not been active for a month
+        added = now - timedelta(days=30 if i == 2 else 1)
+        db.add_all([
+            models.UserWord(user_id=uid, word_id=wid, added_at=added, next_review_at=added + timedelta(minutes=j))
+            for j, wid in enumerate(word_ids)
+        ])
+    db.commit()
+    live = plan_cache.due_plans(db, user_ids[0])
+
+    stats = sessions.build_all(workers=2, chunk_size=1, size=10, session_factory=file_session_factory)
+    assert (stats['users'], stats['chunks']) == (2, 2)
+    assert db.get(models.StudySession, user_ids[2]) is None
+
+    statements = []
+    event.listen(file_engine, 'before_cursor_execute', lambda *a: statements.append(a[2]))
+    assert plan_cache.due_plans(db, user_ids[0]) == live
+    assert len(statements) == 1 and 'study_sessions' in statements[0]
+
+    MemoryService().update_progress(db, user_ids[0], word_ids[0], 0.9)
+    plans = plan_cache.due_plans(db, user_ids[0])
+    assert [p['word_id'] for p in plans] == word_ids[1:]
+    assert plans[0]['definition'] == 'def 1'
+    db.close()
+
+
+def test_sessions_keep_a_share_of_new_words_behind_a_backlog(file_session_factory, monkeypatch):
+    monkeypatch.setattr(plan_cache, '_cache', False)
+
+    db = file_session_factory()
+    user = models.User(email='mix@example.com', password_hash='x')
+    words = [models.Word(lemma=f'mix{i}') for i in range(60)]
+    db.add_all([user, *words])
+    db.commit()
+    user_id = user.id
+    now = datetime.utcnow()
+    # 50 reviewed cards overdue for weeks, then 10 words added today
+    db.add_all([
+        models.UserWord(user_id=user_id, word_id=w.id, review_count=3, last_review_at=now - timedelta(days=40),
+                        added_at=now - timedelta(days=60), next_review_at=now - timedelta(days=30, minutes=-i))
+        for i, w in enumerate(words[:50])
+    ])
+    db.add_all([
+        models.UserWord(user_id=user_id, word_id=w.id, review_count=0, added_at=now,
+                        next_review_at=now - timedelta(days=1))
+        for w in words[50:]
+    ])
+    db.commit()
+    new_ids = {w.id for w in words[50:]}
+    assert not new_ids & {p['word_id'] for p in plan_cache.due_plans(db, user_id, 20)}
+
+    version = sessions.queue_version(db, user_id)
+    sessions.build_all(workers=1, size=20, session_factory=file_session_factory, now=now, new_share=0.25)
+    # the schedule moved, so prefetch ETags must too
+    assert sessions.queue_version(db, user_id) == version + 1
+    first, cursor = plan_cache.plan_page(db, user_id, 10, now=now)
+    second, _ = plan_cache.plan_page(db, user_id, 10, cursor, now=now)
+    # 5 of the session's 20 rows, spread over both pages
+    assert sum(p['word_id'] in new_ids for p in first) >= 2
+    assert sum(p['word_id'] in new_ids for p in second) >= 2
+    assert sum(p['word_id'] in new_ids for p in first + second) == 5
+    # the stored session is still exactly the live queue's first rows
+    stored = db.get(models.StudySession, user_id)
+    assert stored.built_version == stored.version
+    live = [r[1] for r in plan_cache._query(db, user_id).limit(20)]
+    assert [item[1] for item in plan_cache.unpack_items(stored.items)] == live
+    # moved words stay due and every card is still in the queue once
+    assert len(plan_cache.due_plans(db, user_id, 100, now=now)) == 60
+    db.close()
@@ -0,0 +1,28 @@
+import io
+import hashlib
+
+from backend.app.storage import BlobStore
+
+
+def test_blob_store_hashes_and_deduplicates(tmp_path):
+    store = BlobStore(root=str(tmp_path), chunk_size=4)
+    data = b'the same textbook page'
+
+    digest1, path1, size1 = store.save_fileobj(io.BytesIO(data))
+    digest2, path2, size2 = store.save_fileobj(io.BytesIO(data))
+
+    assert digest1 == hashlib.sha256(data).hexdigest()
+    assert digest1 == digest2
+    assert path1 == path2 == store.path_for(digest1)
+    assert size1 == size2 == len(data)
+    with open(path1, 'rb') as f:
+        assert f.read() == data
+    # no temporary files are left behind
+    assert list((tmp_path / 'tmp').iterdir()) == []
+
+
+def test_blob_store_distinct_content_gets_distinct_blobs(tmp_path):
+    store = BlobStore(root=str(tmp_path))
+    _, path1, _ = store.save_fileobj(io.BytesIO(b'page one'))
+    _, path2, _ = store.save_fileobj(io.BytesIO(b'page two'))
+    assert path1 != path2